@@ -1,54 +1,178 @@
 import pandas as pd
+import numpy as np
 import logging
+import os
 import sys
-from data_loader import load_data
-from stat_engine import calc_all_stats
+from concurrent.futures import CancelledError
+from data_loader import COLOR_MAP, enrich_data, load_data
+from stat_engine import (STAT_DIMENSIONS, calc_all_stats, calc_cumulative_counts, calc_omission_matrices,
+                         calc_streaks, category_column, window_counts)
+from simulator import simulate, simulate_batch_totals, extend_simulation, ENTRY_LEAD, MODE_CODES, MODE_FIXED
+from sim_cache import SimulationCache, config_key
+from column_store import ColumnStore, append_rows
+from stats_cache import file_fingerprint, load_stats_cache, save_stats_cache
+from entry_plan import compile_entry, evaluate_plans
+from risk import distribution, first_bust, histogram, longest_runs, max_drawdown
+from profiling import phase
+from dataset import count_history, load_range
+
+# Bins of the per-trade profit histogram in backtest summaries
+PROFIT_BINS = 20
+# Most periods returned by one get_replay_states call
+MAX_REPLAY_BLOCK = 1000
+# Wave color of each ball number (index = number)
+NUMBER_COLORS = np.array([0] + [COLOR_MAP[n] for n in range(1, 50)], dtype=np.int64)
 
 class BacktestSystem:
-    def __init__(self, data_path: str):
+    def __init__(self, data_path: str, use_cache: bool = True, start_date=None, end_date=None):
         # 1. Load Data
         logging.info(f"正在加载数据: {data_path}")
+        # 区间加载 (start_date / end_date 为 'YYYY-MM-DD' 或年份)：只读取相交的年份分区，见 dataset.py
+        self.source = None
+        if start_date or end_date:
+            self._load_range(data_path, use_cache, start_date, end_date)
+            return
         
-        # 优化：Load -> Sort -> Check if stats exist -> Calc Stats if needed
-        self.raw_df = load_data(data_path)
-        self.raw_df = self.raw_df.sort_values(by='date', ascending=True).reset_index(drop=True)
-        
-        # 检查是否已经包含统计列（避免重复计算）
-        # 检查关键的统计列是否存在 (Check for ALL dimensions to ensure completeness)
-        required_stat_cols = [
-            'om_color_0', 'om_zodiac_0', 
-            'om_size_0', 'om_parity_0', 'om_tail_0'
-        ]
-        # Only check existence, assuming if one exists, the group exists
-        has_stats = all(col in self.raw_df.columns for col in required_stat_cols)
-        
-        if has_stats:
-            logging.info("检测到数据中已包含所有统计列，跳过重新计算")
-            # 分离原始数据和统计数据
-            stat_cols = [col for col in self.raw_df.columns if col.startswith('om_') or col.startswith('freq_')]
-            self.stats_df = self.raw_df[stat_cols]
-            # 保留原始列
-            base_cols = [col for col in self.raw_df.columns if not col.startswith('om_') and not col.startswith('freq_')]
-            self.raw_df = self.raw_df[base_cols]
-            self.full_df = pd.concat([self.raw_df, self.stats_df], axis=1)
+        # 优化：命中磁盘缓存 (按数据文件指纹) 时直接映射增强后的数据和统计数组，否则 Load -> Sort -> Calc Stats
+        cached = None
+        fingerprint = None
+        if use_cache:
+            fingerprint = file_fingerprint(data_path)
+            with phase("stats_cache"):
+                cached = load_stats_cache(data_path, fingerprint)
+        self.cache_hit = cached is not None
+
+        if cached:
+            logging.info("命中统计缓存，跳过数据增强和统计计算")
+            arrays, meta = cached
+            self.store = ColumnStore({k[4:]: v for k, v in arrays.items() if k.startswith("col:")})
         else:
-            logging.info("数据中缺少部分统计列 (可能是旧缓存)，开始重新计算...")
-            self.stats_df = calc_all_stats(self.raw_df)
-            self.full_df = pd.concat([self.raw_df, self.stats_df], axis=1)
-            logging.info("统计列计算完成")
-        
-        self.period_map = {str(p): i for i, p in enumerate(self.raw_df['period'])}
+            with phase("load"):
+                df = load_data(data_path)
+                df = df.sort_values(by='date', ascending=True).reset_index(drop=True)
+
+            # History as one typed array per field; the DataFrame is dropped after the stats pass
+            self.store = ColumnStore.from_frame(df)
+            with phase("stats"):
+                arrays, meta = self._compute_stats(df)
+            logging.info("统计矩阵计算完成")
+            if use_cache:
+                columns = {f"col:{k}": v for k, v in self.store.columns.items()}
+                with phase("stats_cache"):
+                    save_stats_cache(data_path, {**columns, **arrays}, meta, fingerprint)
+        self._attach_stats(arrays, meta)
         
-        # Optimization: Convert to records for fast iteration
-        self.records = self.full_df.to_dict('records')
+        self.n = self.store.n
+        # Column arrays for the vectorized simulation kernel (the store's own arrays, not copies)
+        self.columns = self.store.columns
+        self.periods = self.store['period']
         
-        logging.info(f"数据加载完成，共 {len(self.raw_df)} 条记录")
+        logging.info(f"数据加载完成，共 {self.n} 条记录 ({self.store.nbytes / 1e6:.1f} MB)")
         
+        self._init_caches()
+
+    def _load_range(self, data_path, use_cache, start_date, end_date):
+        """
+        Load only the periods dated within [start_date, end_date] from the year partitions next to data_path
+        (or in it, when it is a directory). Stats continue from the partition-boundary checkpoint, so they
+        match a full load; the stats cache is not used (the checkpoints are cached instead).
+        """
+        history_dir = data_path if os.path.isdir(data_path) else os.path.dirname(os.path.abspath(data_path))
+        with phase("load"):
+            df, warm, self.source = load_range(history_dir, start_date, end_date, use_cache)
+        self.cache_hit = False
+        self.store = ColumnStore.from_frame(df)
+        with phase("stats"):
+            arrays, meta = self._compute_stats(df, warm)
+        self._attach_stats(arrays, meta)
+        self.n = self.store.n
+        self.columns = self.store.columns
+        self.periods = self.store['period']
+        logging.info(f"区间数据加载完成，共 {self.n} 条记录")
+        self._init_caches()
+
+    @staticmethod
+    def _compute_stats(df, warm=None):
+        """
+        All per-period stats arrays of an enriched history, in the export_arrays layout.
+        warm: checkpoint state before df's first period (see dataset.advance_state) when df starts mid-history;
+        its count history becomes count_lead, all cumulative-count rows before the range (window stats).
+        """
+        if warm is None:
+            # Omission per dimension: {dim: (periods x categories) uint16 matrix}, one pass over the history
+            arrays = {f"om:{dim}": m for dim, m in calc_all_stats(df).items()}
+            # Cumulative hit counts per category: any window frequency is a difference of two rows
+            count_index, arrays["count_matrix"] = calc_cumulative_counts(df)
+            # Run lengths of consecutive hits per category (streak conditions; a miss run is the omission)
+            streak_index, arrays["streak_hits"] = calc_streaks(df)
+            return arrays, {"count_index": count_index, "streak_index": streak_index}
+
+        omissions = calc_omission_matrices(df, {k[3:]: v for k, v in warm.items() if k.startswith("om:")})
+        arrays = {f"om:{dim}": m for dim, m in omissions.items()}
+        history = count_history(warm)
+        count_index, counts = calc_cumulative_counts(df, history[-1])
+        arrays["count_matrix"] = np.asfortranarray(np.vstack((history[-1:], counts)))
+        arrays["count_lead"] = history[:-1]
+        streak_index, arrays["streak_hits"] = calc_streaks(df, warm["streak"])
+        return arrays, {"count_index": count_index, "streak_index": streak_index}
+
+    def _attach_stats(self, arrays, meta):
+        # Growable buffers behind the stats views (see append_draws)
+        self._stat_buffers = {k: v for k, v in arrays.items() if not k.startswith("col:") and k != "count_lead"}
+        self.omissions = {k[3:]: v for k, v in arrays.items() if k.startswith("om:")}
+        self.count_matrix = arrays.get("count_matrix")
+        # Cumulative-count rows before the first loaded period (range loads only), read by window stats
+        self.count_lead = arrays.get("count_lead")
+        self.count_index = meta.get("count_index", {})
+        self.streak_hits = arrays.get("streak_hits")
+        self.streak_index = meta.get("streak_index", {})
+
+    def _init_caches(self):
         # Cache for strategy execution
+        # LRU of simulation results keyed by the canonical config hash; the cached_* fields
+        # below point at the entry of the most recently requested strategy.
+        self.sim_cache = SimulationCache()
+        self.plan_cache = SimulationCache(max_entries=64)
+        # Window-count columns by name, shared by every plan that uses the same window
+        self.window_columns = {}
         self.cached_config = None
-        self.cached_states = {} # period -> detailed_state
+        self.cached_result = None # SimulationResult (per-period arrays)
+        self.cached_target = None # (dimension, value) of the betting target
         self.cached_summary = None
 
+    # Numeric columns needed to simulate a strategy (see export_arrays / from_arrays)
+    KERNEL_COLUMNS = ('special', 'sp_color', 'sp_zodiac', 'sp_size', 'sp_parity', 'sp_tail', 'sp_wuxing', 'zodiac_year')
+
+    def export_arrays(self):
+        """
+        The arrays a simulation needs, without any pandas objects.
+        Used to share the loaded history with sweep worker processes.
+        """
+        arrays = {f"col:{c}": self.columns[c] for c in self.KERNEL_COLUMNS if c in self.columns}
+        arrays.update({f"om:{dim}": m for dim, m in self.omissions.items()})
+        if self.count_matrix is not None:
+            arrays["count_matrix"] = self.count_matrix
+        if self.count_lead is not None:
+            arrays["count_lead"] = self.count_lead
+        if self.streak_hits is not None:
+            arrays["streak_hits"] = self.streak_hits
+        return arrays, {"n": self.n, "count_index": self.count_index, "streak_index": self.streak_index}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """
+        Lightweight instance over already-computed arrays (inverse of export_arrays).
+        It can compile entry rules and simulate strategies, but has no DataFrames or period labels.
+        """
+        self = cls.__new__(cls)
+        self._attach_stats(arrays, meta)
+        self.store = ColumnStore({k[4:]: v for k, v in arrays.items() if k.startswith("col:")})
+        self.columns = self.store.columns
+        self.n = meta["n"]
+        self.periods = self.store.get('period', np.empty(0, dtype=np.str_))
+        self._init_caches()
+        return self
+
     def _determine_target_condition(self, conditions):
         """
         From a list of triggering conditions, determine which one defines the betting target.
@@ -77,299 +201,561 @@ class BacktestSystem:
                 
         return best_cond
 
-    def _run_full_simulation(self, config):
+    def _run_full_simulation(self, config, progress=None, cancel=None):
         """
-        Runs the full simulation for the given config and caches the state for EVERY period.
+        Runs the full simulation for the given config on the array kernel (see simulator.py).
+        Per-period state is kept as arrays and materialized on demand by _replay_block().
+        Results are cached per strategy, so replay steps only re-simulate on a config change.
+        cancel: threading.Event; raises CancelledError between kernel chunks once set (nothing is cached).
+        Returns the (result, target, summary) entry, so concurrent callers never read another
+        strategy's cached_* fields.
         """
         import time
         start_time = time.time()
-        
-        # if self.cached_config == config and self.cached_states:
-        #      return # Already cached
-             
-        entry_config = config.get('entry', {})
+
+        key = config_key(config)
+        cached = self.sim_cache.get(key)
+        if cached is not None:
+            self.cached_config = config
+            self.cached_result, self.cached_target, self.cached_summary, _ = cached
+            return cached[:3]
+
         money_config = config.get('money', {})
-        odds_config = config.get('odds', None)  # 赔率配置（可选）
-        
         logging.info(f"--- Starting Simulation ---")
         logging.info(f"Money Mode: {money_config.get('mode')}")
         logging.info(f"Money Params: {money_config.get('params')}")
-        logging.info(f"Odds Config: {odds_config}")
-        
-        logging.info(f"[Backtest Config] Odds: {odds_config}")
-        
-        initial_capital = 10000.0
-        capital = initial_capital
-        trades = []
-        equity_curve = []
-        
-        current_bet = None 
-        mar_step = 0
-        current_bet = None 
-        mar_step = 0
-        accumulated_loss = 0
-        
-        # New Metrics
-        max_single_bet = 0
-        max_streak_cost = 0
-        current_streak_cost = 0
-        
-        # We will store state keyed by period string
-        # State includes: capital_before, capital_after, current_bet_info, last_trade_result
-        states = {}
-        
-        win_count = 0
-        loss_count = 0
-        
-        # Initialize state for the very first period (no betting possible yet)
-        if not self.records:
-            return
+        logging.info(f"Odds Config: {config.get('odds', None)}")
 
-        first_period = str(self.records[0]['period'])
-        states[first_period] = {
-            "capital": capital,
-            "accumulated_profit": 0,
-            "win_rate": 0,
-            "total_trades": 0,
-            "betting": None, # {target: "...", amount: 10}
-            "result": None   # {profit: 10, is_hit: True}
+        if self.n == 0:
+            return None, None, None
+        with phase("simulate"):
+            result, target = self._simulate(config, progress, cancel=cancel)
+
+        elapsed = time.time() - start_time
+        logging.info(f"Backtest simulation completed in {elapsed:.4f}s")
+
+        with phase("summary"):
+            summary = self._build_summary(result)
+        self.sim_cache.put(key, (result, target, summary, config), result.nbytes)
+        self.cached_config = config
+        self.cached_result, self.cached_target, self.cached_summary = result, target, summary
+        return result, target, summary
+
+    def _run_range_simulation(self, config, lo, hi, progress=None, cancel=None):
+        """
+        Simulate a strategy over periods lo..hi-1 only, as a slice of the full-history stats (no reload).
+        The kernel starts ENTRY_LEAD rows early (it never reads the signal of its row 0), so the entry decision
+        at lo - 1 can already bet on lo; the lead rows themselves are never bet on. Cached under
+        (config key, lo, hi); returns (result, target, summary).
+        """
+        key = (config_key(config), lo, hi)
+        cached = self.sim_cache.get(key)
+        if cached is not None:
+            return cached[:3]
+        a = max(lo - ENTRY_LEAD, 0)
+        with phase("simulate"):
+            result, target = self._simulate(config, progress, rows=slice(a, hi), cancel=cancel)
+        periods = self.periods[a:hi]
+        with phase("summary"):
+            summary = self._build_summary(result, periods)
+        dates = self.store['date']
+        summary["range"] = {
+            "start_index": lo, "end_index": hi - 1,
+            "start_period": str(self.periods[lo]), "end_period": str(self.periods[hi - 1]),
+            "start_date": str(np.datetime_as_string(dates[lo], unit='D')),
+            "end_date": str(np.datetime_as_string(dates[hi - 1], unit='D')),
         }
+        self.sim_cache.put(key, (result, target, summary, config), result.nbytes)
+        return result, target, summary
 
-        # Optimization: Iterate over pre-converted records
-        for i in range(1, len(self.records)):
-            row = self.records[i]
-            prev_row = self.records[i-1]
-            period = str(row['period'])
-            
-            # Info for this period
-            period_bet_info = None
-            period_bet_info = None
-            period_trade_result = None
-            
-            # --- New: Track Metrics BEFORE processing result (so we count Winning bets too) ---
-            if current_bet:
-                amount = float(current_bet.get('amount', 0))
-                max_single_bet = max(max_single_bet, amount)
-                max_streak_cost = max(max_streak_cost, current_streak_cost + amount)
-            # ----------------------------------------------------------------------------------
-            
-            # 1. Check active bet result
-            if current_bet:
-                actual_val = row.get(f"sp_{current_bet['target_dim']}")
-                # Ensure type match if needed, but dict values should be correct types from to_dict
-                is_hit = (actual_val == current_bet['target_val'])
-                
-                profit = 0
-                if is_hit:
-                    odds = self._get_odds(current_bet['target_dim'], odds_config)
-                    profit = current_bet['amount'] * (odds - 1)
-                    capital += profit
-                    
-                    period_trade_result = {
-                        "period": period,
-                        "is_hit": True,
-                        "profit": round(profit, 2),
-                        "amount": current_bet['amount']
-                    }
-                    trades.append(period_trade_result)
-                    win_count += 1
-                    
-                    current_bet = None # Stop Profit
-                    mar_step = 0
-                    current_bet = None # Stop Profit
-                    mar_step = 0
-                    accumulated_loss = 0
-                    current_streak_cost = 0
+    def _simulate(self, config, progress=None, rows=None, cancel=None):
+        """
+        Run the kernel for one strategy config (uncached). Returns (SimulationResult, target).
+        rows: optional slice of consecutive periods to simulate (result row 0 = rows.start); all periods by default.
+        progress(done, total, detail): optional callback; detail() builds the current period and the
+        partial equity curve, and is only called when the caller actually emits a message.
+        cancel: optional threading.Event, checked by the kernel between chunks (raises CancelledError).
+        """
+        entry_config = config.get('entry', {})
+        offset = 0 if rows is None else rows.start
+
+        # 1. Entry signal for all periods at once (row i decides the bet for i+1)
+        signal = self._compile_entry(entry_config).evaluate(rows)
+        n = len(signal)
+
+        # 2. Target & hit vector. The target only depends on the config, never on the row.
+        target = None
+        hit = np.zeros(n, dtype=np.bool_)
+        odds = 2.0
+        if signal.any():
+            target, odds = self._target_and_odds(config)
+            hit = self._hit_vector(*target) if rows is None else self._hit_vector(*target, rows=rows)
+
+        # 3. Money management state machine
+        kernel_progress = None
+        if progress is not None:
+            kernel_progress = lambda done, total, res: progress(
+                done, total, lambda: self._partial_progress(res, done, offset))
+        result = simulate(signal, hit, odds=odds, initial_capital=10000.0, progress=kernel_progress,
+                          cancel=cancel, **self._money_kwargs(config))
+        return result, target
+
+    def _partial_progress(self, res, done, offset=0, points=100):
+        """
+        Progress detail of a running simulation: last simulated period and ~points of the equity curve.
+        offset: history row of the result's row 0 (range simulations).
+        """
+        with np.errstate(over='ignore', invalid='ignore'):
+            capital = res.initial_capital + np.cumsum(res.pnl[:done])
+        idx = np.unique(np.linspace(0, done - 1, min(done, points)).astype(np.int64))
+        periods = self.periods[offset:offset + done]
+        return {
+            "period": str(periods[done - 1]),
+            "curve": [{"period": p, "capital": round(c, 2)}
+                      for p, c in zip(periods[idx].tolist(), capital[idx].tolist())]
+        }
+
+    def _target_and_odds(self, config):
+        """Betting target (dimension, value index) and its odds for a strategy config."""
+        entry_config = config.get('entry', {})
+        cond = self._determine_target_condition(entry_config.get('conditions', []))
+        dim = cond['dimension']
+        target = (dim, self._get_target_info(dim, cond['value']))
+        return target, self._get_odds(dim, config.get('odds', None))
+
+    def _money_kwargs(self, config):
+        """Money management parameters of a strategy config, as keyword arguments of simulate()."""
+        money_config = config.get('money', {})
+        params = money_config.get('params', {})
+        try:
+            target_profit = float(params.get('baseBet', 10))
+        except:
+            target_profit = 10.0
+        max_bet = None
+        if params.get('maxBet'):
+            try:
+                max_bet = float(params.get('maxBet'))
+            except:
+                pass # Ignore bad max_bet
+
+        return {
+            "mode": MODE_CODES.get(money_config.get('mode'), MODE_FIXED),
+            "base_bet": params.get('baseBet', 10),
+            "multipliers": params.get('multipliers', []) if money_config.get('mode') == 'martingale' else [],
+            "target_profit": target_profit,
+            "max_bet": max_bet,
+        }
+
+    def evaluate(self, config):
+        """Summary metrics of one strategy without trades/curve and without touching the caches."""
+        result, _ = self._simulate(config)
+        return self._summary_metrics(result)
+
+    def _batch_inputs(self, configs):
+        """
+        Shared simulation inputs of many strategies: (signals, hits, money, targets, errors).
+        signals / hits are (N x M) F-order matrices whose column m belongs to configs[m], money[m] holds
+        its simulate() keyword arguments (odds included) and targets[m] its betting target.
+        errors maps m to the message of a config that fails; its signal column stays all False.
+        """
+        plans, errors = [], {}
+        for m, config in enumerate(configs):
+            try:
+                plans.append(self._compile_entry(config.get('entry', {})))
+            except Exception as e:
+                plans.append(None)
+                errors[m] = str(e)
+
+        signals = evaluate_plans(plans, self.n)
+        hits = np.zeros(signals.shape, dtype=np.bool_, order='F')
+        hit_columns, money, targets = {}, [], []
+        for m, config in enumerate(configs):
+            target, odds = None, 2.0
+            if signals[:, m].any():
+                try:
+                    target, odds = self._target_and_odds(config)
+                except Exception as e:
+                    errors[m] = str(e)
+                    signals[:, m] = False
                 else:
-                    profit = -current_bet['amount']
-                    capital += profit
-                    
-                    period_trade_result = {
-                        "period": period,
-                        "is_hit": False,
-                        "profit": round(profit, 2),
-                        "amount": current_bet['amount']
-                    }
-                    trades.append(period_trade_result)
-                    loss_count += 1
-                    
-                    # Update streak cost (for this loss)
-                    # Note: accumulated_loss for Loss Recovery mode logic handles sum of previous losses.
-                    # But generically for all modes, 'current_streak_cost' tracks money sunk in current losing streak.
-                    # It should include the bet just lost.
-                    current_streak_cost += current_bet['amount']
-                    max_streak_cost = max(max_streak_cost, current_streak_cost)
-                    
-                    # Martingale
-                    if money_config.get('mode') == 'martingale':
-                        multipliers = money_config.get('params', {}).get('multipliers', [])
-                        mar_step += 1
-                        if mar_step < len(multipliers):
-                            next_amount = money_config['params']['baseBet'] * multipliers[mar_step]
-                            current_bet['amount'] = next_amount
-                        else:
-                            current_bet = None # Stop Loss (Max Level)
-                            mar_step = 0
-                            
-                    # Loss Recovery (Smart Chase)
-                    elif money_config.get('mode') == 'loss_recovery':
-                        accumulated_loss += float(current_bet['amount'])
-                        
-                        # Calculate required bet to recover loss + target profit (baseBet)
-                        # Formula: Bet = (Loss + Profit) / (Odds - 1)
-                        next_odds = self._get_odds(current_bet['target_dim'], odds_config)
-                        try:
-                            target_profit = float(money_config.get('params', {}).get('baseBet', 10))
-                        except:
-                            target_profit = 10.0
-                        
-                        if next_odds > 1:
-                            raw_next = (accumulated_loss + target_profit) / (next_odds - 1)
-                            # Round to integer or 1 decimal? Usually money is 2 decimals?
-                            # Mark Six usually integers? Let's keep 2 decimals for accuracy then maybe UI floors it.
-                            next_amount = round(raw_next, 2)
-                            
-                            # Ensure minimum bet (at least 1 or baseBet?)
-                            # Strategy: Should we floor at 1?
-                            if next_amount < 1: next_amount = 1.0
-
-                            # Max Bet Check
-                            max_bet = money_config.get('params', {}).get('maxBet')
-                            if max_bet:
-                                try:
-                                    max_bet = float(max_bet)
-                                    if next_amount > max_bet:
-                                        logging.info(f"Loss Recovery Stop Loss: Required {next_amount} > Max {max_bet}")
-                                        current_bet = None # Stop Loss
-                                        accumulated_loss = 0
-                                        next_amount = 0 # for safety
-                                except:
-                                    pass # Ignore bad max_bet
-
-                            if current_bet:
-                                current_bet['amount'] = next_amount
-                                logging.info(f"Loss Recalc: Loss={accumulated_loss}, Tgt={target_profit}, Odds={next_odds} -> Next={next_amount}")
-                        else:
-                            # Should not happen with valid odds, but safety break
-                            current_bet = None
-                            accumulated_loss = 0
+                    if target not in hit_columns:
+                        hit_columns[target] = self._hit_vector(*target)
+                    hits[:, m] = hit_columns[target]
+            money.append(dict(self._money_kwargs(config), odds=odds))
+            targets.append(target)
+        return signals, hits, money, targets, errors
 
-            
-            # 2. If no active bet, check entry (for NEXT period)
-            # We check the CURRENT period stats (row) to see if we should bet on the NEXT period.
-            if current_bet is None:
-                if self._check_entry(row, entry_config):
-                    # Smartly determine the target condition
-                    cond = self._determine_target_condition(entry_config.get('conditions', []))
-                    if cond:
-                        dim = cond['dimension']
-                        val = self._get_target_info(dim, cond['value'])
-                        amount = money_config.get('params', {}).get('baseBet', 10)
-                        
-                        current_bet = {
-                            "target_dim": dim,
-                            "target_val": val,
-                            "amount": amount
-                        }
-                        # If starting fresh streak
-                        if current_streak_cost == 0:
-                            current_streak_cost = 0 # Just to be explicit, it's 0 until first loss. 
-                            # Wait, max_streak_cost exposure includes the current bet.
-                            pass
-                            
-                        mar_step = 0
-            
-            # Metrics moved to start of loop to capture all bets
-            pass
-
-            # Record state currently
-            # Note: 'current_bet' now represents what is active for the NEXT period (or carried over).
-            # But for display, if we are at period T, users want to know:
-            # - Did we win/lose locally at T? (period_trade_result)
-            # - What is our accumulated status at T?
-            # - What are we betting for T+1? (current_bet)
-            
-            total_trades = win_count + loss_count
-            win_rate = win_count / total_trades if total_trades > 0 else 0
-            
-            bet_display = None
-            if current_bet:
-                 # Translate internal val back to display? Or just keep simple
-                 # We can store raw for now
-                 next_p_str = "Unknown"
-                 if i + 1 < len(self.records):
-                     next_p_str = str(self.records[i+1]['period'])
-                 
-                 # Debug logging
-                 if i < 10: # Only log for first few to avoid spam, or specific period
-                     logging.info(f"DEBUG: Period={period}, NextPeriod={next_p_str}, Idx={i}, Total={len(self.records)}")
-
-                 bet_display = {
-                     "period": next_p_str,
-                     "target": f"{current_bet['target_dim']}:{current_bet['target_val']}", 
-                     "amount": current_bet['amount'],
-                     "step": mar_step
-                 }
-
-            states[period] = {
-                "capital": round(capital, 2),
-                "accumulated_profit": round(capital - initial_capital, 2),
-                "win_rate": round(win_rate, 4),
-                "total_trades": total_trades,
-                "betting": bet_display,
-                "result": period_trade_result
-            }
-            
-            if i % 10 == 0 or i == len(self.records) - 1:
-                equity_curve.append({"period": period, "capital": round(capital, 2)})
-        
-        elapsed = time.time() - start_time
+    def run_backtest_batch(self, configs, progress=None, cancel=None, metrics_only=False):
+        """
+        Backtest many strategies together. Entry conditions shared between strategies are compared
+        once (evaluate_plans) and hit vectors are shared per target.
+        Returns one summary per config, in order ({"error": ...} for a config that fails).
+        metrics_only: return the summary metrics without trades / curve (as evaluate() does). All money
+        state machines then run in one kernel call (simulate_batch_totals) and the caches are left untouched;
+        this is the cheap mode for ranking many strategies. It saves the per-run overhead of evaluate()
+        (hit vectors, capital curve, summary), not the state machine itself: each strategy still steps
+        through every period, so 50 strategies at 200k periods cost about ten single evaluate() calls.
+        Otherwise each strategy keeps its per-period arrays and goes into the simulation cache, so later
+        run_backtest / replay calls hit it.
+        """
+        summaries = [None] * len(configs)
+        if self.n == 0:
+            return summaries
 
-        logging.info(f"Backtest simulation completed in {elapsed:.4f}s")
-        
-        self.cached_config = config
-        self.cached_states = states
-        self.cached_summary = {
+        pending = {}  # config key -> (config, [positions in configs])
+        for i, config in enumerate(configs):
+            key = config_key(config)
+            cached = None if metrics_only else self.sim_cache.get(key)
+            if cached is not None:
+                summaries[i] = cached[2]
+            else:
+                pending.setdefault(key, (config, []))[1].append(i)
+
+        jobs = [(key, config, positions) for key, (config, positions) in pending.items()]
+        signals, hits, money, targets, errors = self._batch_inputs([config for _, config, _ in jobs])
+        for m, message in errors.items():
+            for i in jobs[m][2]:
+                summaries[i] = {"error": message}
+
+        if cancel is not None and cancel.is_set():
+            raise CancelledError()
+        if metrics_only:
+            totals = simulate_batch_totals(signals, hits, money, initial_capital=10000.0)
+        for m, (key, config, positions) in enumerate(jobs):
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+            if m in errors:
+                continue
+            if metrics_only:
+                summary = self._metrics(10000.0, *(float(totals[name][m]) for name in (
+                    'final_capital', 'total_trades', 'wins', 'max_single_bet', 'max_streak_cost')))
+            else:
+                result = simulate(signals[:, m], hits[:, m], initial_capital=10000.0, **money[m])
+                summary = self._build_summary(result)
+                self.sim_cache.put(key, (result, targets[m], summary, config), result.nbytes)
+            for i in positions:
+                summaries[i] = summary
+            if progress:
+                progress(m + 1, len(jobs))
+        return summaries
+
+    def get_cache_stats(self):
+        """Hit/miss counters and memory usage of the simulation cache."""
+        return self.sim_cache.stats()
+
+    def append_draws(self, draws):
+        """
+        Append newly drawn periods (those dated after the last loaded one) without reloading.
+        Enrichment, omissions, window counts and streaks continue from the last row in O(k) for k
+        new draws, and every cached simulation is advanced from its final state instead of re-run.
+        draws: raw draw records (same fields as the feather files) as a list of dicts or a DataFrame.
+        A range load that ends before the last period of its history cannot be appended to (the new draws
+        would follow the range end directly); reload it instead.
+        """
+        if self.source is not None and not self.source.get("to_last", True):
+            raise ValueError(f"区间加载在 {self.source.get('end_date')} 结束，不是数据集的最后一期，不能直接追加新开奖，请重新加载")
+        df = draws if isinstance(draws, pd.DataFrame) else pd.DataFrame(list(draws))
+        if df.empty:
+            return {"appended": 0, "count": self.n, "extended": 0}
+        df = enrich_data(df.copy()).sort_values(by='date', ascending=True).reset_index(drop=True)
+        if self.n:
+            df = df[df['date'].to_numpy() > self.store['date'][self.n - 1]].reset_index(drop=True)
+        k = len(df)
+        if k == 0:
+            return {"appended": 0, "count": self.n, "extended": 0}
+
+        n_old = self.n
+        if n_old:
+            new_arrays = {f"om:{dim}": m for dim, m in
+                          calc_omission_matrices(df, {dim: m[-1] for dim, m in self.omissions.items()}).items()}
+            new_arrays["count_matrix"] = calc_cumulative_counts(df, self.count_matrix[-1])[1]
+            new_arrays["streak_hits"] = calc_streaks(df, self.streak_hits[-1])[1]
+        else:
+            new_arrays, _ = self._compute_stats(df)
+            new_arrays["count_matrix"] = new_arrays["count_matrix"][1:]
+
+        # Stats rows go into the growable buffers; the count matrix carries one extra leading row
+        arrays = {}
+        for key, buf in self._stat_buffers.items():
+            used = n_old + 1 if key == "count_matrix" else n_old
+            self._stat_buffers[key], arrays[key] = append_rows(buf, used, new_arrays[key])
+        stat_buffers = self._stat_buffers
+        if self.count_lead is not None:
+            arrays["count_lead"] = self.count_lead  # Range loads: the rows before the range do not change
+        self._attach_stats(arrays, {"count_index": self.count_index, "streak_index": self.streak_index})
+        self._stat_buffers = stat_buffers
+
+        self.store.append(ColumnStore.from_frame(df).columns)
+        self.n = self.store.n
+        self.periods = self.store['period']
+        # Compiled plans hold views of the old length
+        self.plan_cache.clear()
+        self.window_columns = {}
+
+        extended = 0
+        for key, (result, target, _, config) in self.sim_cache.items():
+            if isinstance(key, tuple):
+                continue  # Range results (see _run_range_simulation) end before the appended periods
+            result, target = self._extend_simulation(config, result, target, n_old)
+            summary = self._build_summary(result)
+            self.sim_cache.put(key, (result, target, summary, config), result.nbytes)
+            if self.cached_config is not None and config_key(self.cached_config) == key:
+                self.cached_result, self.cached_target, self.cached_summary = result, target, summary
+            extended += 1
+
+        logging.info(f"追加 {k} 期 (共 {self.n} 期)，续算 {extended} 个缓存的回测结果")
+        return {"appended": k, "count": self.n, "extended": extended}
+
+    def _extend_simulation(self, config, result, target, n_old):
+        """Advance a cached SimulationResult over periods n_old..n-1 from its final state."""
+        signal = self._compile_entry(config.get('entry', {})).evaluate(slice(n_old, self.n))
+        hit = np.zeros(self.n - n_old, dtype=np.bool_)
+        odds = 2.0
+        if target is not None or signal.any():
+            target, odds = self._target_and_odds(config)
+            hit = self._hit_vector(*target, rows=slice(n_old, self.n))
+        return extend_simulation(result, signal, hit, odds=odds, **self._money_kwargs(config)), target
+
+    def _compile_entry(self, entry_config):
+        """Compile (or fetch the cached) EntryPlan of an entry rule config."""
+        key = config_key({'entry': entry_config})
+        plan = self.plan_cache.get(key)
+        if plan is None:
+            plan = compile_entry(entry_config, self.n, self._get_target_info, self._resolve_stat_column)
+            if plan.errors:
+                logging.warning(f"Entry rule compile errors: {plan.errors}")
+            self.plan_cache.put(key, plan)
+        return plan
+
+    def _resolve_stat_column(self, cond, target_idx):
+        """
+        Map a condition to its stats column:
+        (column name, view of the column over all periods, (stat kind, category index, window)).
+        """
+        ctype = cond.get('type')
+        dim = cond.get('dimension')
+        if ctype == 'omission':
+            return f"om_{dim}_{target_idx}", self._omission_column(dim, target_idx), ('omission', target_idx, 1)
+        elif ctype == 'window_stat':
+            window = self._window_size(cond)
+            val_name = f"freq_{dim}_{target_idx}_{window}"
+            stat = ('freq', target_idx, window)
+            j = self.count_index.get(f"{dim}_{target_idx}")
+            if j is None:
+                return val_name, None, stat
+            column = self.window_columns.get(val_name)
+            if column is None:
+                lead = self.count_lead[:, j] if self.count_lead is not None else None
+                column = self.window_columns[val_name] = window_counts(self.count_matrix[:, j], window, lead=lead)
+            return val_name, column, stat
+        elif ctype == 'streak':
+            # streak: 'hit' = 连中期数, 'miss' = 连挂期数
+            if cond.get('streak') == 'miss':
+                # 连挂期数即遗漏值
+                return (f"streak_miss_{dim}_{target_idx}", self._omission_column(dim, target_idx),
+                        ('omission', target_idx, 1))
+            val_name = f"streak_hit_{dim}_{target_idx}"
+            stat = ('streak_hit', target_idx, 1)
+            j = self.streak_index.get(f"{dim}_{target_idx}")
+            if j is None:
+                return val_name, None, stat
+            return val_name, self.streak_hits[:, j], stat
+        else:
+            return None, None, None
+
+    def _omission_column(self, dim, target_idx):
+        """View of one category's omission over all periods, or None if it is not tracked."""
+        matrix = self.omissions.get(dim)
+        j = category_column(dim, target_idx)
+        if matrix is None or j is None:
+            return None
+        return matrix[:, j]
+
+    @staticmethod
+    def _window_size(cond):
+        # window_stat 条件的窗口期数，未填写或非法时沿用默认的 100 期
+        try:
+            return max(int(cond.get('window') or 100), 1)
+        except (TypeError, ValueError):
+            return 100
+
+    def _entry_signal(self, entry_config):
+        """Boolean vector: entry conditions satisfied at each period."""
+        return self._compile_entry(entry_config).evaluate()
+
+    def _hit_vector(self, dim, target_val, rows=slice(None)):
+        """Boolean vector: the special number hit `dim == target_val` at each period (or at `rows`)."""
+        column = self.columns.get(STAT_DIMENSIONS[dim][0]) if dim in STAT_DIMENSIONS else None
+        if column is None or not isinstance(target_val, (int, np.integer)):
+            return np.zeros(len(range(self.n)[rows]), dtype=np.bool_)
+        return column[rows] == target_val
+
+    def _summary_metrics(self, result):
+        return self._metrics(result.initial_capital,
+                             float(result.capital[-1]) if result.n > 1 else result.initial_capital,
+                             result.trade_count[-1] if result.n else 0,
+                             result.win_count[-1] if result.n else 0,
+                             result.max_single_bet, result.max_streak_cost)
+
+    @staticmethod
+    def _metrics(initial_capital, final_capital, total_trades, wins, max_single_bet, max_streak_cost):
+        total_trades, wins = int(total_trades), int(wins)
+        return {
             "initial_capital": initial_capital,
-            "final_capital": round(capital, 2),
-            "total_profit": round(capital - initial_capital, 2),
-            "total_trades": len(trades),
-            "win_rate": round(sum(1 for t in trades if t['is_hit']) / len(trades), 4) if trades else 0,
+            "final_capital": round(final_capital, 2),
+            "total_profit": round(final_capital - initial_capital, 2),
+            "total_trades": total_trades,
+            "win_rate": round(wins / total_trades, 4) if total_trades else 0,
             "max_single_bet": round(max_single_bet, 2),
             "max_streak_cost": round(max_streak_cost, 2),
-            "trades": trades[-50:],
-            "curve": equity_curve
         }
 
-    def _get_signal_evaluation(self, config, current_idx):
-        # View stats of THIS period to see if it triggers entry for next
-        row = self.full_df.iloc[current_idx]
-        entry_config = config.get('entry', {})
-        triggered, details = self._check_entry_detailed(row, entry_config)
+    def _build_summary(self, result, periods=None):
+        """Summary of a finished simulation. periods: labels of the result rows (all periods by default)."""
+        periods = self.periods if periods is None else periods
+        n = result.n
+        capital = result.capital
+        trade_idx = np.flatnonzero(result.placed)
+        trades = [self._trade_at(result, i, periods) for i in trade_idx[-50:]]
+
+        # Equity curve sampled every 10 periods plus the last one
+        curve_idx = list(range(10, n, 10))
+        if n > 1 and (n - 1) % 10 != 0:
+            curve_idx.append(n - 1)
+        equity_curve = [{"period": p, "capital": round(c, 2)}
+                        for p, c in zip(periods[curve_idx].tolist(), capital[curve_idx].tolist())]
+
+        summary = self._summary_metrics(result)
+        summary.update(self._risk_metrics(result, trade_idx, periods))
+        summary["trades"] = trades
+        summary["curve"] = equity_curve
+        # The complete trade log stays in the result arrays and is served by query_trades(columns=True)
+        return summary
+
+    def _risk_metrics(self, result, trade_idx, periods=None):
+        """PRD 6.9 / 6.11 risk metrics, reduced from the per-period arrays of a finished simulation."""
+        pnl = result.pnl[trade_idx]
+        won = result.won[trade_idx]
+        # Capital only changes at trades, so the drawdown over the trade rows is the drawdown over all periods
+        max_dd, max_dd_pct = max_drawdown(result.capital[trade_idx], result.initial_capital)
+        max_wins, max_losses = longest_runs(won)
+        total_staked = float(result.stake[trade_idx].sum())
+        total_profit = float(pnl.sum())
+        bust = first_bust(result.capital, result.next_amount, result.has_next)
         return {
-            "triggered": bool(triggered),
-            "conditions": details
+            "max_drawdown": round(max_dd, 2),
+            "max_drawdown_pct": round(max_dd_pct, 4),
+            "max_winning_streak": max_wins,
+            "max_losing_streak": max_losses,
+            "ev_per_bet": round(total_profit / len(pnl), 2) if len(pnl) else 0,
+            "total_staked": round(total_staked, 2),
+            "roi": round(total_profit / total_staked, 4) if total_staked else 0,
+            "busted": bust is not None,
+            "bust_period": None if bust is None else str((self.periods if periods is None else periods)[bust]),
+            "profit_distribution": dict(distribution(pnl), histogram=histogram(pnl, PROFIT_BINS)),
         }
-    
-    def get_data_stats(self):
+
+    def _trade_at(self, result, i, periods=None):
+        return {
+            "period": str((self.periods if periods is None else periods)[i]),
+            "is_hit": bool(result.won[i]),
+            "profit": round(float(result.pnl[i]), 2),
+            "amount": float(result.stake[i])
+        }
+
+    def get_data_stats(self, include_periods=True):
         """
-        返回已加载数据的元数据。
+        返回已加载数据的元数据。include_periods=False 时不附带全部期号 / 日期 (改用 query_periods 分页获取)。
         """
-        periods = self.raw_df['period'].astype(str).tolist()
-        if not periods:
+        periods = self.periods
+        if not len(periods):
             return {"count": 0, "min_period": None, "max_period": None}
-            
-        return {
+
+        dates = self.store['date']
+        stats = {
             "count": len(periods),
-            "min_period": periods[0],
-            "max_period": periods[-1],
-            "periods": periods,
-            "dates": self.raw_df['date'].dt.strftime('%Y-%m-%d').tolist() 
+            "min_period": str(periods[0]),
+            "max_period": str(periods[-1]),
+            "min_date": np.datetime_as_string(dates[0], unit='D'),
+            "max_date": np.datetime_as_string(dates[-1], unit='D'),
         }
+        if include_periods:
+            # 数组原样返回：JSON 响应由 NumpyEncoder 转为列表，Arrow 响应整列写入 (见 wire.py)
+            stats["periods"] = periods
+            stats["dates"] = np.datetime_as_string(dates, unit='D')
+        return stats
 
         # Configure logging to ensure it goes to stderr and doesn't break JSON protocol
         logging.basicConfig(level=logging.INFO, stream=sys.stderr, format='[Backtester] %(message)s')
 
+    def _date_range(self, start_date=None, end_date=None):
+        """[lo, hi) row range of the periods dated within [start_date, end_date] ('YYYY-MM-DD', inclusive)."""
+        dates = self.store['date'][:self.n] if self.n else np.empty(0, dtype='datetime64[ns]')
+        lo = 0 if not start_date else int(np.searchsorted(dates, np.datetime64(start_date, 'D'), 'left'))
+        hi = self.n if not end_date else int(np.searchsorted(dates, np.datetime64(end_date, 'D') + 1, 'left'))
+        return lo, max(lo, hi)
+
+    def query_periods(self, start_date=None, end_date=None, offset=0, limit=None):
+        """
+        期号 / 日期的分页查询：日期在 [start_date, end_date] 内的各期，从第 offset 条起取 limit 条。
+        next_offset 为下一页的 offset (已到末尾时为 None)。
+        """
+        lo, hi = self._date_range(start_date, end_date)
+        a = lo + min(max(int(offset or 0), 0), hi - lo)
+        b = hi if limit is None else min(hi, a + max(int(limit), 0))
+        return {
+            "total": hi - lo,
+            "offset": a - lo,
+            "start_index": a,
+            "periods": self.periods[a:b],
+            "dates": np.datetime_as_string(self.store['date'][a:b], unit='D'),
+            "next_offset": b - lo if b < hi else None
+        }
+
+    def query_trades(self, config, start=0, end=None, columns=False):
+        """
+        某策略完整交易记录中第 [start, end) 笔 (按时间顺序，支持负数下标)，直接从模拟结果数组切片。
+        columns=True 时以列数组 (trade_log: period / amount / profit / is_hit / step / capital，金额不四舍五入)
+        代替逐笔的字典列表，大数组随 Arrow 句柄传递；资金只在交易时变化，capital 即完整精度的资金曲线。
+        """
+        result = self._run_full_simulation(config)[0]
+        trade_idx = np.flatnonzero(result.placed) if result is not None else np.empty(0, dtype=np.int64)
+        a, b, _ = slice(start, end).indices(len(trade_idx))
+        b = max(a, b)
+        page = {"total": len(trade_idx), "start": a, "end": b}
+        rows = trade_idx[a:b]
+        if not columns:
+            page["trades"] = [self._trade_at(result, i) for i in rows]
+            return page
+        page["trade_log"] = {
+            "period": self.periods[rows],
+            "amount": result.stake[rows],
+            "profit": result.pnl[rows],
+            "is_hit": result.won[rows],
+            "step": result.step[rows],
+            "capital": result.capital[rows],
+        }
+        return page
+
+    def query_equity_curve(self, config, start_date=None, end_date=None, points=500):
+        """
+        日期范围内的资金曲线，等间隔抽样为约 points 个点 (总是包含范围内的最后一期)。
+        """
+        result = self._run_full_simulation(config)[0]
+        lo, hi = self._date_range(start_date, end_date)
+        if result is None or hi <= lo:
+            return {"total": 0, "step": 1, "curve": []}
+        step = max(1, -(-(hi - lo) // max(int(points or 1), 1)))
+        idx = np.arange(lo, hi, step)
+        if idx[-1] != hi - 1:
+            idx = np.append(idx, hi - 1)
+        return {
+            "total": hi - lo,
+            "step": step,
+            "curve": [{"period": p, "capital": round(c, 2)}
+                      for p, c in zip(self.periods[idx].tolist(), result.capital[idx].tolist())]
+        }
+
     def _get_target_info(self, dim, val):
         # Robust mapping of frontend values to backend indices
         # Ensure val is stripped if string
@@ -397,100 +783,19 @@ class BacktestSystem:
                 if val.endswith('尾'): val = val.replace('尾', '')
                 return int(val)
             return int(val)
+        if dim == 'number':
+            if isinstance(val, str) and val.isdigit():
+                return int(val)
+            return val
+        if dim == 'wuxing':
+            # 与 data_loader.WUXING_MAP 的编码一致
+            names = ["金", "木", "水", "火", "土"]
+            if val in names:
+                return names.index(val)
+            if isinstance(val, str) and val.isdigit():
+                return int(val)
         return val
 
-    def _check_condition(self, row, cond):
-        ctype = cond.get('type')
-        dim = cond.get('dimension')
-        val = cond.get('value')
-        
-        # Determine actual value column name
-        val_name = None
-        target_idx = None
-        
-        try:
-            target_idx = self._get_target_info(dim, val)
-        except Exception as e:
-            return False, {"desc": f"Map Error: {dim}={val}", "passed": False}
-
-        if ctype == 'omission':
-            val_name = f"om_{dim}_{target_idx}"
-        elif ctype == 'window_stat':
-            val_name = f"freq_{dim}_{target_idx}_100" # Simplified to 100 window
-            
-        if val_name:
-            if val_name in row:
-                actual = row[val_name]
-                op = cond.get('operator')
-                threshold = cond.get('threshold')
-                
-                # Robust type conversion
-                try:
-                    actual = float(actual)
-                    threshold = float(threshold)
-                except:
-                    pass
-
-                passed = False
-                if op == '>=': passed = actual >= threshold
-                elif op == '<=': passed = actual <= threshold
-                elif op == '==': passed = actual == threshold
-                elif op == '>': passed = actual > threshold
-                elif op == '<': passed = actual < threshold
-                
-                return bool(passed), {
-                    "desc": f"{dim} {ctype}",
-                    "actual": actual,
-                    "threshold": threshold,
-                    "operator": op,
-                    "passed": bool(passed)
-                }
-            else:
-                # Column missing - critical debug info. 
-                # Row can be Series or Dict. keys() works for both Series and Dict (in recent pandas)
-                # But to be safe, use logic.
-                
-                keys = []
-                if hasattr(row, 'keys'):
-                    keys = row.keys()
-                elif hasattr(row, 'index'):
-                    keys = row.index
-                elif isinstance(row, dict):
-                     keys = row.keys()
-                     
-                available_cols = [c for c in keys if c.startswith(f"om_{dim}")]
-                return False, {
-                    "desc": f"Missing Col: {val_name}",
-                    "passed": False,
-                    "actual": "N/A",  # Show N/A so it appears in UI
-                    "operator": "?",
-                    "threshold": "?"
-                }
-                
-        return False, {"desc": f"Unknown Type: {ctype}", "passed": False}
-
-    def _check_entry(self, row, config):
-        # Legacy support for backtest run (returns boolean)
-        triggered, _ = self._check_entry_detailed(row, config)
-        return triggered
-
-    def _check_entry_detailed(self, row, config):
-        conditions = config.get('conditions', [])
-        if not conditions: return False, []
-        
-        op = config.get('logicOperator', 'AND')
-        results = [self._check_condition(row, c) for c in conditions]
-        # results is list of (bool, dict)
-        
-        passed_list = [r[0] for r in results]
-        details_list = [r[1] for r in results]
-        
-        triggered = False
-        if op == 'AND': triggered = all(passed_list)
-        if op == 'OR': triggered = any(passed_list)
-        
-        return triggered, details_list
-
     def _get_odds(self, dim, odds_config=None):
         """
         获取赔率。如果有配置则使用配置值，否则使用默认值。
@@ -524,132 +829,251 @@ class BacktestSystem:
         if dim == 'tail': return 9.8 # 默认尾数赔率
         return 2.0
 
-    def get_replay_state(self, period: str, strategy_config: dict = None):
+    def _replay_index(self, period, index=None):
+        """
+        History row of a replay request. Period labels repeat every year (a label maps to its last
+        occurrence), so callers that walk the history pass the row index instead.
+        """
+        if index is not None:
+            idx = int(index)
+            if not 0 <= idx < self.n:
+                raise ValueError(f"下标 {index} 超出范围 (共 {self.n} 期)。")
+            return idx
+        idx = self.store.index_of(period)
+        if idx is None:
+            raise ValueError(f"期数 {period} 未找到。")
+        return idx
+
+    def get_replay_state(self, period: str, strategy_config: dict = None, orders_limit: int = None, index=None):
         """
         Get state for replay. 
         If strategy_config is provided, we ensure the simulation is run/cached for that strategy,
         then pull the specific state for the period.
+        orders_limit: when given, history_orders holds the last `orders_limit` trades settled up to
+        this period (sliced from the result arrays) instead of the summary's last trades.
+        index: history row of the period, instead of its label (labels repeat every year).
         """
 
-        logging.info(f"获取回放状态: period={period}")
-        
-        if period not in self.period_map:
-            raise ValueError(f"期数 {period} 未找到。")
-            
-        idx = self.period_map[period]
-        row = self.full_df.iloc[idx]
-        
-        # 1. Base Data
-        # Map for colors to avoid frontend needing to know fixed colors
-        COLOR_LOOKUP = {n: (0 if n in {1, 2, 7, 8, 12, 13, 18, 19, 23, 24, 29, 30, 34, 35, 40, 45, 46} else 
-                        1 if n in {3, 4, 9, 10, 14, 15, 20, 25, 26, 31, 36, 37, 41, 42, 47, 48} else 2) 
-                        for n in range(1, 50)}
-
-        result = {
-            "period": row['period'],
-            "date": row['date'].strftime('%Y-%m-%d'),
-            "special": int(row['special']),
-            "color": int(row['sp_color']),
-            "zodiac": int(row['sp_zodiac']),
-            "size": int(row['sp_size']),
-            "parity": int(row['sp_parity']),
-            "numbers": [int(row[f'n{i}']) for i in range(1, 7)],
-            "numbers_colors": [COLOR_LOOKUP[int(row[f'n{i}'])] for i in range(1, 7)]
-        }
-        
-        stats = {
-            "omission": {},
-            "freq_100": {}
-        }
-        
-        # 安全地访问统计列，如果不存在则使用默认值
-        try:
-            for c in [0, 1, 2]:
-                stats["omission"][f"color_{c}"] = int(row.get(f"om_color_{c}", 0))
-                stats["freq_100"][f"color_{c}"] = int(row.get(f"freq_color_{c}_100", 0))
-            for z in range(12):
-                stats["omission"][f"zodiac_{z}"] = int(row.get(f"om_zodiac_{z}", 0))
-                stats["freq_100"][f"zodiac_{z}"] = int(row.get(f"freq_zodiac_{z}_100", 0))
-                
-            # Add new stats: Size, Parity, Tail
-            for s in [0, 1]:
-                stats["omission"][f"size_{s}"] = int(row.get(f"om_size_{s}", 0))
-                stats["freq_100"][f"size_{s}"] = int(row.get(f"freq_size_{s}_100", 0))
-                
-            for p in [0, 1]:
-                stats["omission"][f"parity_{p}"] = int(row.get(f"om_parity_{p}", 0))
-                stats["freq_100"][f"parity_{p}"] = int(row.get(f"freq_parity_{p}_100", 0))
-
-            for t in range(10):
-                stats["omission"][f"tail_{t}"] = int(row.get(f"om_tail_{t}", 0))
-                stats["freq_100"][f"tail_{t}"] = int(row.get(f"freq_tail_{t}_100", 0))
-        except Exception as e:
-            logging.error(f"读取统计列时出错: {e}")
-            logging.error(f"可用列: {list(row.keys()) if hasattr(row,'keys') else 'NoKeys'}")
-            # 继续执行，使用空的统计数据
-
-        # 2. Strategy Data
-        accumulated_stats = None
-        betting_status = None
-        signal_evaluation = None
+        logging.info(f"获取回放状态: period={period} index={index}")
         
+        idx = self._replay_index(period, index)
+        period = str(self.periods[idx])
+
+        sim = None
+        sim_result, summary = None, self.cached_summary
         if strategy_config:
             # Ensure simulation is run
-            self._run_full_simulation(strategy_config)
-            
-            # Fetch state from cache
-            state_data = self.cached_states.get(str(period))
-            
-            if state_data:
-                accumulated_stats = {
-                    "capital": state_data['capital'],
-                    "profit": state_data['accumulated_profit'],
-                    "win_rate": state_data['win_rate'],
-                    "total_trades": state_data['total_trades'],
-                    "max_single_bet": self.cached_summary.get('max_single_bet', 0) if self.cached_summary else 0,
-                    "max_streak_cost": self.cached_summary.get('max_streak_cost', 0) if self.cached_summary else 0
-                }
-                
-                # Check previous period's betting to see what we did THIS period (result)
-                # state_data['result'] is the result of the bet placed in PREV period, resolved in THIS period.
-                last_result = state_data['result']
-                
-                # state_data['betting'] is the bet placed in THIS period for the NEXT period.
-                next_bet = state_data['betting']
-                
-                # Robustness: Ensure period is set
-                if next_bet:
-                    if 'period' not in next_bet or next_bet['period'] == 'Unknown':
-                        if idx + 1 < len(self.full_df):
-                            try:
-                                next_bet['period'] = str(self.full_df.iloc[idx+1]['period'])
-                            except:
-                                pass
-
-                betting_status = {
-                    "last_result": last_result, # {is_hit, profit, amount}
-                    "next_bet": next_bet        # {target, amount, step}
-                }
-                
-            # Signal Evaluation (Condition Details)
-            # This logic mimics whether we WOULD enter if we were starting fresh, 
-            # or simply explains the entry conditions for the next bet.
-            if idx >= 0:
-                 signal_evaluation = self._get_signal_evaluation(strategy_config, idx)
+            sim = self._run_full_simulation(strategy_config)
+            sim_result, _, summary = sim
+
+        state = self._replay_block(idx, idx + 1, strategy_config, sim)[0]
+        state["period"] = period
+        state["history_orders"] = self._history_orders(idx, sim_result, summary, strategy_config, orders_limit)
+        return state
+
+    def get_replay_states(self, period: str = None, count: int = MAX_REPLAY_BLOCK, strategy_config: dict = None,
+                          orders_limit: int = None, start_index=None):
+        """
+        Replay states of `count` consecutive periods starting at `period` (or at history row start_index,
+        since labels repeat every year), for prefetching auto-play.
+        Each state equals get_replay_state() of its row without history_orders; history_orders is
+        given once, as of the first period (later orders are the states' betting_status.last_result).
+        start_index is the row of states[0]; next_period / next_index address the period following the
+        block (None at the end of history).
+        """
+        start = self._replay_index(period, start_index)
+        stop = min(start + max(min(int(count), MAX_REPLAY_BLOCK), 1), self.n)
 
+        sim = None
+        sim_result, summary = None, self.cached_summary
+        if strategy_config:
+            sim = self._run_full_simulation(strategy_config)
+            sim_result, _, summary = sim
         return {
-            "period": period,
-            "result": result,
-            "stats": stats,
-            "accumulated_stats": accumulated_stats,
-            "betting_status": betting_status,
-            "signal_evaluation": signal_evaluation,
-            "history_orders": self.cached_summary.get('trades', [])[-100:] if self.cached_summary else []
+            "states": self._replay_block(start, stop, strategy_config, sim),
+            "history_orders": self._history_orders(start, sim_result, summary, strategy_config, orders_limit),
+            "start_index": start,
+            "next_period": str(self.periods[stop]) if stop < self.n else None,
+            "next_index": stop if stop < self.n else None,
         }
 
-    def run_backtest(self, config: dict):
-        self._run_full_simulation(config)
-        return self.cached_summary
+    def _history_orders(self, idx, sim_result, summary, strategy_config, orders_limit):
+        if orders_limit is not None and strategy_config and sim_result is not None:
+            trade_idx = np.flatnonzero(sim_result.placed[:idx + 1])
+            limit = max(int(orders_limit), 0)
+            return [self._trade_at(sim_result, i) for i in trade_idx[max(len(trade_idx) - limit, 0):]]
+        return summary.get('trades', [])[-100:] if summary else []
+
+    def _cum_counts(self, idx, c):
+        """
+        count_matrix[idx, c] for an index array. Negative indices (windows reaching before the first loaded
+        period) read count_lead on range loads (it reaches back to the start of the history) and clamp to
+        row 0 otherwise.
+        """
+        values = self.count_matrix[np.maximum(idx, 0), c].astype(np.int64)
+        lead = self.count_lead
+        if lead is not None and len(lead):
+            before = idx < 0
+            if before.any():
+                values[before] = lead[np.maximum(idx[before] + len(lead), 0), c]
+        return values
+
+    def _replay_block(self, start, stop, strategy_config=None, sim=None):
+        """
+        Replay states of periods [start, stop), sliced column-wise from the stored arrays:
+        draws, omission / 100-period frequency stats and, with a strategy, the betting state
+        (from sim, the strategy's (result, target, summary)) and the per-condition signal evaluation.
+        """
+        rows = slice(start, stop)
+        k = stop - start
+        periods = self.periods[rows].tolist()
+        dates = np.datetime_as_string(self.columns['date'][rows], unit='D').tolist()
+        numbers = np.column_stack([self.columns[f'n{i}'][rows] for i in range(1, 7)]).astype(np.int64)
+        numbers_colors = NUMBER_COLORS[numbers].tolist()
+        numbers = numbers.tolist()
+        draw_columns = {name: self.columns[col][rows].astype(np.int64).tolist() for name, col in (
+            ("special", 'special'), ("color", 'sp_color'), ("zodiac", 'sp_zodiac'), ("size", 'sp_size'),
+            ("parity", 'sp_parity'))}
+
+        # Stats: omission rows and 100-period window counts (two rows of the cumulative counts)
+        stat_keys, omission_rows, freq_columns = [], [], []
+        lo = np.arange(start, stop) + 1 - 100
+        for dim, matrix in self.omissions.items():
+            for j, val in enumerate(STAT_DIMENSIONS[dim][1]):
+                key = f"{dim}_{val}"
+                stat_keys.append(key)
+                c = self.count_index.get(key)
+                freq_columns.append(np.zeros(k, dtype=np.int64) if c is None else
+                                    self.count_matrix[start + 1:stop + 1, c].astype(np.int64) -
+                                    self._cum_counts(lo, c))
+            omission_rows.append(matrix[rows])
+        omissions = (np.hstack(omission_rows) if omission_rows else np.zeros((k, 0))).tolist()
+        freqs = (np.column_stack(freq_columns) if freq_columns else np.zeros((k, 0))).tolist()
+
+        strategy = self._replay_strategy_block(start, stop, strategy_config, sim) if strategy_config else None
+
+        states = []
+        for i in range(k):
+            state = {
+                "period": periods[i],
+                "result": {
+                    "period": periods[i],
+                    "date": dates[i],
+                    **{name: values[i] for name, values in draw_columns.items()},
+                    "numbers": numbers[i],
+                    "numbers_colors": numbers_colors[i]
+                },
+                "stats": {
+                    "omission": dict(zip(stat_keys, omissions[i])),
+                    "freq_100": dict(zip(stat_keys, freqs[i]))
+                },
+                "accumulated_stats": None,
+                "betting_status": None,
+                "signal_evaluation": None
+            }
+            if strategy is not None:
+                state.update(strategy(i))
+            states.append(state)
+        return states
+
+    def _replay_strategy_block(self, start, stop, config, sim):
+        """
+        Per-period strategy part of the replay states of [start, stop): returns state(i) -> dict with
+        accumulated_stats, betting_status and signal_evaluation of period start + i, from array slices:
+        - last_result: the bet resolved AT this period (placed in the previous one)
+        - next_bet:    the bet placed at this period for the NEXT period
+        - signal_evaluation: EntryPlan.explain_block() of the block, each condition compared once
+        """
+        rows = slice(start, stop)
+        result, target, summary = sim
+        signals = self._compile_entry(config.get('entry', {})).explain_block(rows)
+
+        if result is not None:
+            capital = result.capital[rows].tolist()
+            trade_count = result.trade_count[rows].tolist()
+            win_count = result.win_count[rows].tolist()
+            has_next = result.has_next[rows].tolist()
+            next_amount = result.next_amount[rows].tolist()
+            step = result.step[rows].tolist()
+            placed = result.placed[rows].tolist()
+            won = result.won[rows].tolist()
+            pnl = result.pnl[rows].tolist()
+            stake = result.stake[rows].tolist()
+            periods = self.periods[start:min(stop + 1, self.n)].tolist()
+            bet_target = f"{target[0]}:{target[1]}" if target is not None else None
+            max_single_bet = summary.get('max_single_bet', 0) if summary else 0
+            max_streak_cost = summary.get('max_streak_cost', 0) if summary else 0
+
+        def state(i):
+            idx = start + i
+            triggered, conditions = signals[i]
+            out = {"signal_evaluation": {"triggered": triggered, "conditions": conditions}}
+            if result is None:
+                return out
+
+            if idx == 0:
+                cap, total_trades, win_rate = result.initial_capital, 0, 0
+            else:
+                cap, total_trades = capital[i], trade_count[i]
+                win_rate = round(win_count[i] / total_trades, 4) if total_trades > 0 else 0
+            next_bet = None
+            if idx > 0 and has_next[i]:
+                next_bet = {
+                    "period": periods[i + 1] if idx + 1 < result.n else "Unknown",
+                    "target": bet_target,
+                    "amount": next_amount[i],
+                    "step": step[i]
+                }
+            last_result = None
+            if placed[i]:
+                last_result = {"period": periods[i], "is_hit": won[i], "profit": round(pnl[i], 2),
+                               "amount": stake[i]}
+            out["accumulated_stats"] = {
+                "capital": round(cap, 2),
+                "profit": round(cap - result.initial_capital, 2),
+                "win_rate": win_rate,
+                "total_trades": total_trades,
+                "max_single_bet": max_single_bet,
+                "max_streak_cost": max_streak_cost
+            }
+            out["betting_status"] = {"last_result": last_result, "next_bet": next_bet}
+            return out
+
+        return state
+
+    def _row_bounds(self, start_date=None, end_date=None, start_period=None, end_period=None):
+        """
+        [lo, hi) rows of a backtest range: the periods dated within [start_date, end_date], narrowed to
+        start_period..end_period (inclusive). Period labels repeat every year, so a start period matches its
+        first occurrence inside the date range and an end period its last.
+        """
+        lo, hi = self._date_range(start_date, end_date)
+        if start_period not in (None, ""):
+            found = np.flatnonzero(self.periods[lo:hi] == str(start_period))
+            if not found.size:
+                raise ValueError(f"期数 {start_period} 未找到。")
+            lo += int(found[0])
+        if end_period not in (None, ""):
+            found = np.flatnonzero(self.periods[lo:hi] == str(end_period))
+            if not found.size:
+                raise ValueError(f"期数 {end_period} 未找到。")
+            hi = lo + int(found[-1]) + 1
+        if hi <= lo:
+            raise ValueError("回测区间内没有开奖记录")
+        return lo, hi
+
+    def run_backtest(self, config: dict, progress=None, start_date=None, end_date=None, start_period=None,
+                     end_period=None, cancel=None):
+        """
+        Backtest summary of a strategy. With date / period bounds only that range is simulated, over the
+        already computed full-history stats, so omissions at the range start account for earlier draws.
+        cancel: threading.Event; the simulation stops with CancelledError once it is set.
+        """
+        if any(b not in (None, "") for b in (start_date, end_date, start_period, end_period)):
+            lo, hi = self._row_bounds(start_date, end_date, start_period, end_period)
+            if lo > 0 or hi < self.n:
+                return self._run_range_simulation(config, lo, hi, progress, cancel)[2]
+        return self._run_full_simulation(config, progress, cancel)[2]
 
 if __name__ == "__main__":
     import sys
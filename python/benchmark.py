@@ -0,0 +1,264 @@
+"""
+性能基准：生成与 data/history/*.feather 列结构相同的合成开奖历史 (默认 4k ~ 1M 期)，
+按阶段分别计时，结果写成 JSON，便于比较不同版本的扩展曲线并发现性能回退。
+
+    python benchmark.py                                   # 默认全部规模
+    python benchmark.py --sizes 4000 64000 --repeat 5 --output bench.json
+    python benchmark.py --compare baseline.json           # 与上次的结果比较，有回退时退出码为 1
+
+阶段 (stage):
+    load_data        data_loader.load_data (读取 feather + 数据增强)
+    calc_all_stats   stat_engine.calc_all_stats (遗漏值矩阵)
+    init_cold        BacktestSystem.__init__，不使用统计缓存
+    init_cached      BacktestSystem.__init__，命中统计缓存
+    run_backtest     各代表性策略的首次回测 (模拟缓存未命中)，config 字段为策略名
+    replay_step      逐期调用 get_replay_state (per_item 为单步耗时)
+    replay_block     get_replay_states 一次取回同样多期
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtester import BacktestSystem
+from data_loader import COLOR_MAP
+from simulator import HAS_NUMBA
+from stat_engine import calc_all_stats
+import data_loader
+
+BENCH_FORMAT = 1
+DEFAULT_SIZES = (4000, 16000, 64000, 256000, 1000000)
+# 回放循环的期数
+REPLAY_STEPS = 100
+# 比较时的默认阈值：中位数变慢超过 25% 且超过 5ms 才算回退 (更小的差异是计时噪声)
+REGRESSION_RATIO = 0.25
+REGRESSION_FLOOR = 0.005
+
+ZODIAC_NAMES = ['鼠', '牛', '虎', '兔', '龙', '蛇', '马', '羊', '猴', '鸡', '狗', '猪']
+COLOR_NAMES = ['red', 'blue', 'green']
+
+# 代表性策略：单条件 / 窗口热度 / 连中 / 多条件 OR，覆盖三种资金管理模式
+CONFIGS = {
+    "omission_fixed": {
+        "entry": {"conditions": [{"type": "omission", "dimension": "color", "value": "red", "operator": ">=",
+                                  "threshold": 3}], "logicOperator": "AND"},
+        "money": {"mode": "fixed", "params": {"baseBet": 10}}
+    },
+    "window_martingale": {
+        "entry": {"conditions": [{"type": "window_stat", "dimension": "zodiac", "value": "龙", "window": 50,
+                                  "operator": "<=", "threshold": 2}], "logicOperator": "AND"},
+        "money": {"mode": "martingale", "params": {"baseBet": 10, "multipliers": [1, 2, 4, 8, 16]}}
+    },
+    "streak_and_martingale": {
+        "entry": {"conditions": [
+            {"type": "streak", "dimension": "parity", "value": "odd", "streak": "miss", "operator": ">=",
+             "threshold": 3},
+            {"type": "omission", "dimension": "size", "value": "big", "operator": ">=", "threshold": 2},
+        ], "logicOperator": "AND"},
+        "money": {"mode": "martingale", "params": {"baseBet": 5, "multipliers": [1, 3, 9], "maxBet": 200}}
+    },
+    "multi_or_recovery": {
+        "entry": {"conditions": [
+            {"type": "omission", "dimension": "number", "value": 7, "operator": ">=", "threshold": 40},
+            {"type": "omission", "dimension": "tail", "value": 3, "operator": ">=", "threshold": 12},
+            {"type": "window_stat", "dimension": "wuxing", "value": "金", "window": 20, "operator": "<",
+             "threshold": 3},
+        ], "logicOperator": "OR"},
+        "money": {"mode": "loss_recovery", "params": {"baseBet": 10, "maxBet": 500}}
+    },
+}
+
+
+def synthetic_history(n, seed=0):
+    """
+    n 期随机开奖 (每期 7 个不重复的号码)，列与 data/history/*.feather 相同，期号在每年内从 001 编起。
+    日期以约每 2.3 天一期的真实频率排到 2025 年底；1900 年以来容纳不下时每天多期。
+    """
+    rng = np.random.default_rng(seed)
+    draws = np.argsort(rng.random((n, 49)), axis=1)[:, :7].astype(np.int32) + 1
+    end = np.datetime64('2025-12-31')
+    span = min(n * 7 / 3, (end - np.datetime64('1900-01-01')).astype(np.int64))
+    dates = end - (span * (n - 1 - np.arange(n)) / max(n, 1)).astype(np.int64)
+    years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(years)) + 1))
+    seq = np.arange(n) - np.repeat(starts, np.diff(np.append(starts, n))) + 1
+
+    df = pd.DataFrame({
+        "period": np.char.zfill(seq.astype(str), 3),
+        "date": np.datetime_as_string(dates, unit='D'),
+        "year": years.astype(str),
+    })
+    base_zodiac = (years - 2008) % 12
+    colors = np.array(COLOR_NAMES)[[COLOR_MAP[k] for k in range(1, 50)]]
+    for i, name in enumerate([f"n{k}" for k in range(1, 7)] + ["special"]):
+        numbers = draws[:, i]
+        df[name] = numbers
+        df[f"{name}_zodiac"] = np.array(ZODIAC_NAMES)[(base_zodiac - (numbers - 1)) % 12]
+        df[f"{name}_color"] = colors[numbers - 1]
+        df[f"{name}_odd"] = numbers % 2 == 1
+    return df
+
+
+def _timed(fn, repeat):
+    """运行 repeat 次，返回 (每次耗时列表, 最后一次的返回值)。"""
+    times, value = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    return times, value
+
+
+def _record(size, stage, times, config=None, items=None):
+    median = statistics.median(times)
+    return {
+        "size": size,
+        "stage": stage,
+        "config": config,
+        "repeat": len(times),
+        "min": round(min(times), 6),
+        "median": round(median, 6),
+        "per_item": round(median / items, 6) if items else None,
+    }
+
+
+def bench_size(path, size, repeat, log=print):
+    """对一个合成历史文件分阶段计时，返回记录列表。"""
+    records = []
+
+    times, df = _timed(lambda: data_loader.load_data(path), repeat)
+    records.append(_record(size, "load_data", times))
+    df = df.sort_values(by='date', ascending=True).reset_index(drop=True)
+    times, _ = _timed(lambda: calc_all_stats(df), repeat)
+    records.append(_record(size, "calc_all_stats", times))
+    del df
+
+    times, _ = _timed(lambda: BacktestSystem(path, use_cache=False), repeat)
+    records.append(_record(size, "init_cold", times))
+    BacktestSystem(path)  # 写入统计缓存
+    times, system = _timed(lambda: BacktestSystem(path), repeat)
+    records.append(_record(size, "init_cached", times))
+
+    for name, config in CONFIGS.items():
+        def first_run():
+            system.sim_cache.clear()
+            return system.run_backtest(config)
+        first_run()  # 预热 numba 编译和窗口列缓存
+        times, _ = _timed(first_run, repeat)
+        records.append(_record(size, "run_backtest", times, config=name))
+
+    config = CONFIGS["window_martingale"]
+    system.run_backtest(config)
+    periods = system.periods[-REPLAY_STEPS:].tolist()
+    times, _ = _timed(lambda: [system.get_replay_state(p, config) for p in periods], repeat)
+    records.append(_record(size, "replay_step", times, config="window_martingale", items=len(periods)))
+    times, _ = _timed(lambda: system.get_replay_states(periods[0], len(periods), config), repeat)
+    records.append(_record(size, "replay_block", times, config="window_martingale", items=len(periods)))
+
+    for r in records:
+        log(f"  {r['stage']:<15} {r['config'] or '':<24} median {r['median'] * 1000:10.2f} ms")
+    return records
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "numba": HAS_NUMBA,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeat=3, workdir=None, seed=0, log=print):
+    """生成各规模的合成历史 (workdir 中已有同名文件时复用) 并计时，返回可直接写成 JSON 的结果。"""
+    logging.disable(logging.CRITICAL)
+    own_dir = workdir is None
+    workdir = workdir or tempfile.mkdtemp(prefix="mark-six-bench-")
+    records = []
+    try:
+        for size in sizes:
+            path = os.path.join(workdir, f"synthetic-{size}-{seed}.feather")
+            if not os.path.exists(path):
+                synthetic_history(size, seed).to_feather(path)
+            log(f"{size} periods")
+            records.extend(bench_size(path, size, repeat, log))
+    finally:
+        logging.disable(logging.NOTSET)
+        if own_dir:
+            import shutil
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {"format": BENCH_FORMAT, "environment": environment(), "results": records}
+
+
+def compare(current, baseline, ratio=REGRESSION_RATIO, floor=REGRESSION_FLOOR):
+    """
+    按 (size, stage, config) 对齐两次结果，返回 (对比行, 回退行)。
+    中位数变慢超过 ratio 且绝对差超过 floor 秒的记为回退。
+    """
+    key = lambda r: (r["size"], r["stage"], r["config"])
+    old = {key(r): r for r in baseline["results"]}
+    rows, regressions = [], []
+    for r in current["results"]:
+        base = old.get(key(r))
+        if base is None:
+            continue
+        row = {"size": r["size"], "stage": r["stage"], "config": r["config"], "baseline": base["median"],
+               "current": r["median"], "ratio": round(r["median"] / base["median"], 3) if base["median"] else None}
+        rows.append(row)
+        if r["median"] > base["median"] * (1 + ratio) and r["median"] - base["median"] > floor:
+            regressions.append(row)
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mark Six 引擎性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="合成历史的存放目录 (默认临时目录，结束后删除)")
+    parser.add_argument("--output", help="结果 JSON 的路径 (默认输出到 stdout)")
+    parser.add_argument("--compare", help="作为基线的历史结果 JSON")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_RATIO)
+    args = parser.parse_args(argv)
+
+    log = lambda msg: print(msg, file=sys.stderr)
+    result = run_benchmarks(args.sizes, args.repeat, args.workdir, args.seed, log)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressions = compare(result, baseline, args.threshold)
+        for row in rows:
+            flag = "  REGRESSION" if row in regressions else ""
+            log(f"{row['size']:>8} {row['stage']:<15} {row['config'] or '':<24} "
+                f"{row['baseline'] * 1000:10.2f} -> {row['current'] * 1000:10.2f} ms{flag}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+
+
+def append_rows(buf, n, rows):
+    """
+    把 rows 写到 buf[n:] 并返回 (缓冲区, 长度 n + k 的视图)。
+    容量不足、类型放不下 (更长的字符串) 或 buf 只读 (内存映射的缓存) 时按两倍扩容后复制，
+    因此连续追加的均摊成本为 O(k)。已经取出的旧视图仍然有效。
+    """
+    rows = np.asarray(rows)
+    k = len(rows)
+    dtype = buf.dtype
+    if dtype.kind == 'U' and rows.dtype.kind == 'U':
+        dtype = np.promote_types(dtype, rows.dtype)
+    if not (buf.flags.writeable and dtype == buf.dtype and n + k <= len(buf)):
+        order = 'F' if buf.ndim > 1 and buf.flags.f_contiguous else 'C'
+        grown = np.empty((max(2 * (n + k), 64),) + buf.shape[1:], dtype=dtype, order=order)
+        grown[:n] = buf[:n]
+        buf = grown
+    buf[n:n + k] = rows
+    return buf, buf[:n + k]
+
+
+class RowView:
+    """
+    第 i 期的只读行视图：按字段名直接读取各列数组的第 i 个元素，不复制整行。
+    """
+    __slots__ = ('_columns', '_i')
+
+    def __init__(self, columns, i):
+        self._columns = columns
+        self._i = i
+
+    def __getitem__(self, name):
+        return self._columns[name][self._i]
+
+    def get(self, name, default=None):
+        col = self._columns.get(name)
+        return default if col is None else col[self._i]
+
+    def keys(self):
+        return self._columns.keys()
+
+    def __contains__(self, name):
+        return name in self._columns
+
+
+class ColumnStore:
+    """
+    按列存放的开奖历史 (struct-of-arrays)：每个字段一个定长类型的 NumPy 数组。
+    - 字符串列转为定长 Unicode 数组，日期列为 datetime64[ns]，因此整份数据可以直接写成 .npy 并内存映射
+    - index_of(period) 按期号查下标，row(i) 返回零拷贝的行视图
+    """
+
+    def __init__(self, columns):
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns have different lengths: {sorted(lengths)}")
+        self.columns = dict(columns)
+        self.n = lengths.pop() if lengths else 0
+        self._buffers = dict(self.columns)  # 追加时的底层缓冲区 (columns 中是它们的前 n 行视图)
+        self._period_index = None
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame):
+        columns = {}
+        for name in df.columns:
+            s = df[name]
+            if pd.api.types.is_datetime64_any_dtype(s):
+                arr = s.to_numpy(dtype='datetime64[ns]')
+            elif s.dtype == object:
+                arr = s.astype(str).to_numpy().astype(np.str_)
+            else:
+                arr = s.to_numpy()
+                # read_history 的零复制数值列指向 feather 文件的内存映射；Rust 导入器会原地截断重写该文件，
+                # 因此长期持有的列复制一份 (只有几个整数列)
+                if not arr.flags.writeable:
+                    arr = arr.copy()
+            columns[str(name)] = np.ascontiguousarray(arr)
+        return cls(columns)
+
+    def __len__(self):
+        return self.n
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def get(self, name, default=None):
+        return self.columns.get(name, default)
+
+    def row(self, i):
+        return RowView(self.columns, i)
+
+    def index_of(self, period):
+        """期号 -> 下标 (期号重复时取最后一期)，未找到时返回 None。"""
+        if self._period_index is None:
+            periods = self.columns.get('period', ())
+            self._period_index = {p: i for i, p in enumerate(periods.tolist() if len(periods) else [])}
+        return self._period_index.get(str(period))
+
+    def append(self, columns):
+        """
+        在末尾追加 k 期。columns 中缺少的字段以 0 / 空串填充，多余的字段忽略。
+        columns 字典本身原地更新，持有 store.columns 引用的调用方会看到新的视图。
+        """
+        k = len(next(iter(columns.values()))) if columns else 0
+        for name, buf in self._buffers.items():
+            rows = columns.get(name)
+            if rows is None:
+                rows = np.zeros(k, dtype=buf.dtype)
+            elif buf.dtype.kind != 'U':
+                rows = np.asarray(rows).astype(buf.dtype)
+            self._buffers[name], self.columns[name] = append_rows(buf, self.n, rows)
+        if self._period_index is not None:
+            for i, p in enumerate(self.columns['period'][self.n:].tolist(), self.n):
+                self._period_index[p] = i
+        self.n += k
+
+    @property
+    def nbytes(self):
+        return sum(arr.nbytes for arr in self.columns.values())
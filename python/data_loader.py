@@ -1,8 +1,15 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+from pyarrow import feather
 
 # --- 常量定义 ---
 
+# 引擎用到的原始列；Rust 导入器另外写出的 n1_zodiac ... special_odd 等字符串列不读取
+ENGINE_COLUMNS = ('period', 'date', 'year', 'n1', 'n2', 'n3', 'n4', 'n5', 'n6', 'special')
+# Arrow 字符串类型 (Rust 端写出 string_view)
+TEXT_TYPES = ('string', 'large_string', 'string_view')
+
 RED_WAVE = {1, 2, 7, 8, 12, 13, 18, 19, 23, 24, 29, 30, 34, 35, 40, 45, 46}
 BLUE_WAVE = {3, 4, 9, 10, 14, 15, 20, 25, 26, 31, 36, 37, 41, 42, 47, 48}
 GREEN_WAVE = {5, 6, 11, 16, 17, 21, 22, 27, 28, 32, 33, 38, 39, 43, 44, 49}
@@ -25,19 +32,31 @@ WUXING_MAP = {
 # 01 -> 龙(4)
 # 02 -> 兔(3)
 # ...
-# 计算公式：zodiac_idx = (year_zodiac_idx - (number - 1)) % 12
+# 计算公式：zodiac_idx = (year_zodiac_idx - (number - 1)) % 12，year_zodiac_idx = (生肖年 - 2008) % 12
 # 验证：
 # 01 -> (4 - 0) % 12 = 4 (龙) 正确。
 # 02 -> (4 - 1) % 12 = 3 (兔) 正确。
 # 13 -> (4 - 12) % 12 = -8 % 12 = 4 (龙) 正确。
 
-# 近年年份对应的 01 号生肖索引 (鼠=0, ..., 龙=4, 蛇=5, 马=6)
-YEAR_ZODIAC_MAP = {
-    2023: 3, # 兔
-    2024: 4, # 龙
-    2025: 5, # 蛇
-    2026: 6, # 马
+# 农历新年 (春节) 日期：生肖年在这一天切换，1、2 月春节前的开奖仍属上一生肖年
+LUNAR_NEW_YEAR = {
+    1990: '1990-01-27', 1991: '1991-02-15', 1992: '1992-02-04', 1993: '1993-01-23', 1994: '1994-02-10',
+    1995: '1995-01-31', 1996: '1996-02-19', 1997: '1997-02-07', 1998: '1998-01-28', 1999: '1999-02-16',
+    2000: '2000-02-05', 2001: '2001-01-24', 2002: '2002-02-12', 2003: '2003-02-01', 2004: '2004-01-22',
+    2005: '2005-02-09', 2006: '2006-01-29', 2007: '2007-02-18', 2008: '2008-02-07', 2009: '2009-01-26',
+    2010: '2010-02-14', 2011: '2011-02-03', 2012: '2012-01-23', 2013: '2013-02-10', 2014: '2014-01-31',
+    2015: '2015-02-19', 2016: '2016-02-08', 2017: '2017-01-28', 2018: '2018-02-16', 2019: '2019-02-05',
+    2020: '2020-01-25', 2021: '2021-02-12', 2022: '2022-02-01', 2023: '2023-01-22', 2024: '2024-02-10',
+    2025: '2025-01-29', 2026: '2026-02-17', 2027: '2027-02-06', 2028: '2028-01-26', 2029: '2029-02-13',
+    2030: '2030-02-03', 2031: '2031-01-23', 2032: '2032-02-11', 2033: '2033-01-31', 2034: '2034-02-19',
+    2035: '2035-02-08', 2036: '2036-01-28', 2037: '2037-02-15', 2038: '2038-02-04', 2039: '2039-01-24',
+    2040: '2040-02-12', 2041: '2041-02-01', 2042: '2042-01-22', 2043: '2043-02-10', 2044: '2044-01-30',
+    2045: '2045-02-17', 2046: '2046-02-06', 2047: '2047-01-26', 2048: '2048-02-14', 2049: '2049-02-02',
+    2050: '2050-01-23',
 }
+# searchsorted 用的边界表 (按日期升序)
+LNY_YEARS = np.array(sorted(LUNAR_NEW_YEAR), dtype=np.int64)
+LNY_DATES = np.array([LUNAR_NEW_YEAR[y] for y in LNY_YEARS], dtype='datetime64[ns]')
 
 def get_color_map():
     # 0=红, 1=蓝, 2=绿
@@ -58,13 +77,49 @@ def get_wuxing_map():
 COLOR_MAP = get_color_map()
 WX_MAP = get_wuxing_map()
 
-def load_data(file_path: str) -> pd.DataFrame:
-    """加载 feather 数据并注入静态属性"""
+def zodiac_years(dates: np.ndarray) -> np.ndarray:
+    """
+    开奖日期 -> 生肖年 (以春节为界)。
+    超出 LUNAR_NEW_YEAR 覆盖范围的日期退回按公历年份计算。
+    """
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    idx = np.searchsorted(LNY_DATES, dates, side='right') - 1
+    years = LNY_YEARS[np.clip(idx, 0, len(LNY_YEARS) - 1)]
+    calendar = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    outside = (idx < 0) | (calendar > LNY_YEARS[-1])
+    return np.where(outside, calendar, years)
+
+def zodiac_index(base_zodiac: np.ndarray, numbers: np.ndarray) -> np.ndarray:
+    """n 号对应 (base_zodiac - (n - 1)) % 12，01 号对应当年生肖。"""
+    return ((base_zodiac - (numbers.astype(np.int64) - 1)) % 12).astype('uint8')
+
+def read_history(file_path: str, columns=ENGINE_COLUMNS) -> pd.DataFrame:
+    """
+    以内存映射读取 feather 文件中引擎需要的列 (文件中没有的列跳过)。
+    未压缩的数值列直接是映射区域上的只读视图 (零复制)，生肖 / 波色等字符串列完全不读；
+    日期和年份字符串在 Arrow 中转换 (比 pandas 逐个解析快一个数量级)，格式不标准时留给 enrich_data 用 pandas 解析。
+    """
     try:
-        df = pd.read_feather(file_path)
+        with pa.memory_map(file_path) as source:
+            names = pa.ipc.open_file(source).schema.names
+        table = feather.read_table(file_path, columns=[c for c in columns if c in names], memory_map=True)
     except Exception as e:
         raise FileNotFoundError(f"无法读取 feather 文件: {e}")
+    for name, target in (('date', pa.timestamp('ns')), ('year', pa.int64())):
+        if name not in table.column_names or str(table.schema.field(name).type) not in TEXT_TYPES:
+            continue
+        try:
+            table = table.set_column(table.column_names.index(name), name, table[name].cast(pa.string()).cast(target))
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            pass
+    return table.to_pandas(split_blocks=True)
 
+def load_data(file_path: str, columns=ENGINE_COLUMNS) -> pd.DataFrame:
+    """加载 feather 数据 (只读 columns 中的列，见 read_history) 并注入静态属性"""
+    return enrich_data(read_history(file_path, columns))
+
+def enrich_data(df: pd.DataFrame) -> pd.DataFrame:
+    """注入特码 / 正码的静态属性。只依赖每期自身的数据，因此也可以只对新增的几期调用。"""
     # 确保日期列是 datetime 类型
     if not np.issubdtype(df['date'].dtype, np.datetime64):
         df['date'] = pd.to_datetime(df['date'])
@@ -88,32 +143,19 @@ def load_data(file_path: str) -> pd.DataFrame:
     # 尾数 (0-9)
     df['sp_tail'] = (df['special'] % 10).astype('uint8')
     
-    # 生肖 (基于年份动态计算)
-    # 我们假设 'year' 列存在且正确
-    
-    # 确保 year 列存在
+    # 确保 year 列存在 (生肖按开奖日期所在的生肖年计算，不依赖该列)
     if 'year' not in df.columns:
         df['year'] = df['date'].dt.year
     else:
         df['year'] = pd.to_numeric(df['year'], errors='coerce').fillna(0).astype('int')
 
-    def calc_zodiac(row):
-        try:
-            year = int(row['year'])
-        except:
-            year = 0 # Default fallback
-            
-        # 基础算法：(year - 2008) % 12
-        # 2008 是鼠年(0)。2024 - 2008 = 16 % 12 = 4 (龙)。正确。
-        base_zodiac = (year - 2008) % 12
-        
-        # 计算号码对应的生肖
-        # 01 号对应 base_zodiac
-        # n 号对应 (base_zodiac - (n - 1)) % 12
-        z_idx = (base_zodiac - (row['special'] - 1)) % 12
-        return z_idx
-
-    df['sp_zodiac'] = df.apply(calc_zodiac, axis=1).astype('uint8')
+    # 特码和正码的生肖：一次 searchsorted 定位生肖年，再统一做取模运算
+    df['zodiac_year'] = zodiac_years(df['date'].to_numpy()).astype('uint16')
+    base_zodiac = (df['zodiac_year'].to_numpy().astype(np.int64) - 2008) % 12
+    df['sp_zodiac'] = zodiac_index(base_zodiac, df['special'].to_numpy())
+    for i in range(1, 7):
+        if f'n{i}' in df.columns:
+            df[f'n{i}_zodiac_idx'] = zodiac_index(base_zodiac, df[f'n{i}'].to_numpy())
 
     return df
 
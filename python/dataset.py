@@ -0,0 +1,211 @@
+"""
+按年份分区的开奖历史 (data/history/<year>.feather，Rust 导入器逐年写出)。
+
+load_range 只打开与日期范围相交的年份文件；范围开始之前的历史由分区边界的检查点代替：
+检查点记录截至某年最后一期的遗漏值行、连中期数行和该年各期的累计计数行 (各年相接即范围之前的全部累计计数)，
+因此区间加载后的遗漏 / 连中统计和任意窗口的热度都与全量加载完全相同。
+检查点按链式指纹缓存在 .stats_cache/ 中：某年的检查点只依赖它和之前各年的文件内容，
+改写当年的文件不会使往年的检查点失效。各文件的内容哈希记录在 .stats_cache/partitions.json，
+大小和修改时间都没变的文件不再重新读取。
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_data
+from stat_engine import calc_cumulative_counts, calc_omission_matrices, calc_streaks
+from stats_cache import CACHE_DIR_NAME, STATS_SCHEMA_VERSION, file_fingerprint, load_stats_cache, save_stats_cache
+
+PARTITION_NAME = re.compile(r'(\d{4})\.feather')
+# 各分区文件的 {文件名: {"size", "mtime_ns", "hash"}}，位于缓存目录中
+PARTITION_HASHES = 'partitions.json'
+
+
+def year_partitions(history_dir):
+    """目录中的年份分区，按年份排序的 [(year, path)]；all.feather 等其它文件不算。"""
+    parts = []
+    for name in os.listdir(history_dir):
+        m = PARTITION_NAME.fullmatch(name)
+        if m:
+            parts.append((int(m.group(1)), os.path.join(history_dir, name)))
+    return sorted(parts)
+
+
+def _load_partitions(paths):
+    frames = [load_data(p) for p in paths]
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    return df.sort_values(by='date', ascending=True, kind='stable').reset_index(drop=True)
+
+
+def advance_state(state, df):
+    """
+    把检查点状态推进过 df 中的各期 (已增强、按日期排序)。state 为 None 表示从历史开头开始。
+    状态：{"om:{dim}": 遗漏值行, "streak": 连中期数行, "count_blocks": [累计计数块, ...]}；
+    各块依次相接即历史开头起的全部累计计数行 (见 count_history)，推进时只追加新的一块，不复制之前的块。
+    """
+    if len(df) == 0:
+        return state
+    if state is None:
+        om = calc_omission_matrices(df)
+        _, counts = calc_cumulative_counts(df)
+        _, streaks = calc_streaks(df)
+        blocks = [counts]
+    else:
+        om = calc_omission_matrices(df, {k[3:]: v for k, v in state.items() if k.startswith("om:")})
+        _, counts = calc_cumulative_counts(df, state["count_blocks"][-1][-1])
+        _, streaks = calc_streaks(df, state["streak"])
+        blocks = state["count_blocks"] + [counts]
+    out = {f"om:{dim}": np.ascontiguousarray(m[-1]) for dim, m in om.items()}
+    out["streak"] = np.ascontiguousarray(streaks[-1])
+    out["count_blocks"] = blocks
+    return out
+
+
+def count_history(state):
+    """检查点之前的全部累计计数行 ((期数 + 1) x K，首行为 0)，列优先以便按列计算窗口热度。"""
+    blocks = state["count_blocks"]
+    out = np.empty((sum(len(b) for b in blocks), blocks[0].shape[1]), dtype=blocks[0].dtype, order='F')
+    row = 0
+    for b in blocks:
+        out[row:row + len(b)] = b
+        row += len(b)
+    return out
+
+
+def _checkpoint_path(history_dir, year):
+    # 检查点没有对应的数据文件，这个路径只用来确定缓存目录和条目名 (.stats_cache/checkpoint-<year>-...)
+    return os.path.join(history_dir, f"checkpoint-{year}")
+
+
+def _checkpoint_arrays(state, known):
+    # 缓存条目只保存该年新增的累计计数块 (known 为之前各年的块数)，读取时接在之前各年的块后面
+    blocks = state["count_blocks"]
+    arrays = {k: v for k, v in state.items() if k != "count_blocks"}
+    arrays["counts"] = np.vstack(blocks[known:]) if len(blocks) > known else blocks[-1][:0]
+    return arrays
+
+
+class PartitionHashes:
+    """
+    分区文件内容哈希的记录 (.stats_cache/partitions.json)。大小和修改时间都与记录相同时直接返回记录的哈希，
+    否则重新读取文件计算；save 在有新哈希时写回。读写失败只记录日志，退化为每次重新计算。
+    """
+
+    def __init__(self, history_dir):
+        self.path = os.path.join(history_dir, CACHE_DIR_NAME, PARTITION_HASHES)
+        self.dirty = False
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.known = json.load(f)
+        except FileNotFoundError:
+            self.known = {}
+        except Exception as e:
+            logging.warning(f"分区哈希记录读取失败，将重新计算: {e}")
+            self.known = {}
+
+    def get(self, path):
+        name = os.path.basename(path)
+        st = os.stat(path)
+        entry = self.known.get(name)
+        if entry and entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            return entry["hash"]
+        fp = file_fingerprint(path)
+        self.known[name] = {"size": fp["size"], "mtime_ns": fp["mtime_ns"], "hash": fp["hash"]}
+        self.dirty = True
+        return fp["hash"]
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = f"{self.path}.tmp{os.getpid()}"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.known, f)
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except Exception as e:
+            logging.warning(f"分区哈希记录写入失败: {e}")
+
+
+def checkpoint_before(parts, year, use_cache=True):
+    """
+    截至 year 之前各分区最后一期的检查点状态 (year 是第一个分区时为 None)。
+    未缓存的检查点从最近的已缓存检查点起逐年计算并写入缓存；不使用缓存时也不计算指纹。
+    """
+    chain = hashlib.blake2b(digest_size=16)
+    hashes = PartitionHashes(os.path.dirname(parts[0][1])) if use_cache and parts else None
+    state = None
+    for y, path in parts:
+        if y >= year:
+            break
+        known = len(state["count_blocks"]) if state is not None else 0
+        cached = None
+        if use_cache:
+            chain.update(hashes.get(path).encode())
+            fingerprint = {"hash": chain.hexdigest(), "schema": STATS_SCHEMA_VERSION}
+            ckpt = _checkpoint_path(os.path.dirname(path), y)
+            cached = load_stats_cache(ckpt, fingerprint)
+        if cached is not None:
+            arrays = cached[0]
+            blocks = state["count_blocks"] if state is not None else []
+            state = {k: v for k, v in arrays.items() if k != "counts"}
+            state["count_blocks"] = blocks + [arrays["counts"]]
+            continue
+        state = advance_state(state, _load_partitions([path]))
+        if use_cache and state is not None:
+            save_stats_cache(ckpt, _checkpoint_arrays(state, known), {"year": y}, fingerprint)
+    if hashes is not None:
+        hashes.save()
+    return state
+
+
+def _date_bound(value, end):
+    """'YYYY-MM-DD' 或年份 (int / 'YYYY') -> datetime64[D] 边界；年份取该年第一天 / 最后一天。"""
+    if value is None or value == "":
+        return None
+    text = str(value)
+    if re.fullmatch(r'\d{4}', text):
+        text = f"{text}-12-31" if end else f"{text}-01-01"
+    return np.datetime64(text, 'D')
+
+
+def _year_of(day):
+    return int(day.astype('datetime64[Y]').astype(np.int64)) + 1970
+
+
+def load_range(history_dir, start=None, end=None, use_cache=True):
+    """
+    读取日期在 [start, end] 内的各期 (含两端，'YYYY-MM-DD' 或年份；None 表示不限)，只解码相交的年份分区。
+    返回 (df, warm, info)：df 为已增强并按日期排序的各期；warm 为 df 第一期之前的检查点状态
+    (范围从第一个分区的开头开始时为 None)；info 记录读取的分区、检查点所在的年份和范围是否到最后一期。
+    """
+    lo, hi = _date_bound(start, False), _date_bound(end, True)
+    parts = year_partitions(history_dir)
+    years = [(y, p) for y, p in parts
+             if (lo is None or y >= _year_of(lo)) and (hi is None or y <= _year_of(hi))]
+    if not years:
+        raise ValueError(f"{history_dir} 中没有 {start or '开头'} ~ {end or '最后'} 范围内的年份文件")
+
+    first = years[0][0]
+    before = [y for y, _ in parts if y < first]
+    warm = checkpoint_before(parts, first, use_cache)
+    df = _load_partitions([p for _, p in years])
+    dates = df['date'].to_numpy()
+    a = 0 if lo is None else int(np.searchsorted(dates, lo, 'left'))
+    b = len(df) if hi is None else int(np.searchsorted(dates, hi + 1, 'left'))
+    if b <= a:
+        raise ValueError(f"{start or '开头'} ~ {end or '最后'} 范围内没有开奖记录")
+    # 起始分区中范围之前的各期只用来推进检查点
+    warm = advance_state(warm, df.iloc[:a])
+    info = {"partitions": [y for y, _ in years], "checkpoint_year": before[-1] if before else None,
+            "start_date": str(lo) if lo is not None else None, "end_date": str(hi) if hi is not None else None,
+            # 范围是否一直到数据集的最后一期 (否则不能直接追加新开奖，见 BacktestSystem.append_draws)
+            "to_last": b == len(df) and years[-1][0] == parts[-1][0]}
+    logging.info(f"区间加载: 分区 {info['partitions']}，检查点 {info['checkpoint_year']}，共 {b - a} 期")
+    return df.iloc[a:b].reset_index(drop=True), warm, info
@@ -0,0 +1,193 @@
+import numpy as np
+
+# Comparison ufuncs for entry conditions
+COMPARE_OPS = {
+    '>=': np.greater_equal,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '>': np.greater,
+    '<': np.less,
+}
+
+
+class CompiledCondition:
+    """
+    一条已编译的入场条件：统计列已解析为数组，阈值已转为浮点数，运算符已映射为 ufunc。
+    编译失败的条件 (error 非空) 恒为 False，并在信号评估中原样展示错误描述。
+    """
+
+    def __init__(self, ctype, dim, column=None, values=None, compare=None, operator=None, threshold=None, error=None,
+                 stat=None):
+        self.ctype = ctype
+        self.dim = dim
+        self.column = column        # 统计列名 (便于调试)
+        self.stat = stat            # (统计量, 类别下标, 窗口期数)，统计量为 'omission' / 'freq' / 'streak_hit'
+        self.values = values        # 全历史的统计值，长度 N
+        self.compare = compare      # ufunc；未知运算符时为 None
+        self.operator = operator
+        self.threshold = threshold
+        self.error = error
+
+    @property
+    def active(self):
+        return self.error is None and self.compare is not None
+
+    def explain_block(self, rows, count):
+        """
+        一段期数 (count 期) 的条件拆解 (replay 的 Signal Evaluation)：(各期是否通过, 各期的详情)，
+        整段只比较一次。编译失败的条件每期都是 False 和错误描述。
+        """
+        if self.error is not None:
+            return [False] * count, [dict(self.error) for _ in range(count)]
+        actual = self.values[rows].astype(np.float64)
+        passed = (self.compare(actual, self.threshold) if self.compare is not None
+                  else np.zeros(len(actual), dtype=np.bool_)).tolist()
+        desc = f"{self.dim} {self.ctype}"
+        details = [{"desc": desc, "actual": a, "threshold": self.threshold, "operator": self.operator, "passed": p}
+                   for a, p in zip(actual.tolist(), passed)]
+        return passed, details
+
+
+class EntryPlan:
+    """
+    入场规则的编译结果。编译一次后可对整段历史或任意一批期数做向量化评估。
+    """
+
+    def __init__(self, conditions, logic_operator, n):
+        self.conditions = conditions
+        self.logic_operator = logic_operator
+        self.n = n
+
+    @property
+    def errors(self):
+        return [c.error['desc'] for c in self.conditions if c.error is not None]
+
+    def _row_count(self, rows):
+        if rows is None:
+            return self.n
+        if isinstance(rows, slice):
+            return len(range(self.n)[rows])
+        return len(rows)
+
+    def condition_matrix(self, rows=None):
+        """(期数 × 条件) 的布尔矩阵。"""
+        passed = np.zeros((self._row_count(rows), len(self.conditions)), dtype=np.bool_)
+        for j, c in enumerate(self.conditions):
+            if c.active:
+                passed[:, j] = c.compare(c.values if rows is None else c.values[rows], c.threshold)
+        return passed
+
+    def evaluate(self, rows=None):
+        """入场信号：rows 为 None 时返回全历史的布尔向量，否则只评估给定的期数 (切片或下标数组)。"""
+        passed = self.condition_matrix(rows)
+        if passed.shape[1] == 0:
+            return np.zeros(passed.shape[0], dtype=np.bool_)
+        if self.logic_operator == 'AND':
+            return passed.all(axis=1)
+        if self.logic_operator == 'OR':
+            return passed.any(axis=1)
+        return np.zeros(passed.shape[0], dtype=np.bool_)
+
+    def explain_block(self, rows):
+        """
+        一段连续期数 (切片) 的条件拆解：每期一个 (是否触发, 每个条件的详情列表)，
+        与旧的 _check_entry_detailed 的输出相同；每个条件在整段上只比较一次。
+        """
+        count = self._row_count(rows)
+        if not self.conditions:
+            return [(False, []) for _ in range(count)]
+        columns = [c.explain_block(rows, count) for c in self.conditions]
+        out = []
+        for i in range(count):
+            flags = [passed[i] for passed, _ in columns]
+            triggered = False
+            if self.logic_operator == 'AND': triggered = all(flags)
+            if self.logic_operator == 'OR': triggered = any(flags)
+            out.append((triggered, [details[i] for _, details in columns]))
+        return out
+
+    def explain(self, idx):
+        """单期的条件拆解：(是否触发, 每个条件的详情列表)。"""
+        idx = idx + self.n if idx < 0 else idx
+        return self.explain_block(slice(idx, idx + 1))[0]
+
+
+def evaluate_plans(plans, n):
+    """
+    多个入场规则一起评估，返回 (N × 规则数) 的信号矩阵，第 m 列等于 plans[m].evaluate()
+    (plans[m] 为 None 时恒为 False)。统计列、运算符和阈值都相同的条件 (不同策略间的重复条件) 只比较一次。
+    """
+    signals = np.zeros((n, len(plans)), dtype=np.bool_, order='F')
+    passed = {}
+    for m, plan in enumerate(plans):
+        if plan is None:
+            continue
+        columns = []
+        for c in plan.conditions:
+            if not c.active:
+                columns.append(None)  # 编译失败的条件恒为 False
+                continue
+            key = (c.column, c.operator, c.threshold)
+            if key not in passed:
+                passed[key] = c.compare(c.values, c.threshold)
+            columns.append(passed[key])
+        if plan.logic_operator == 'AND':
+            if columns and all(col is not None for col in columns):
+                signals[:, m] = np.logical_and.reduce(columns)
+        elif plan.logic_operator == 'OR':
+            columns = [col for col in columns if col is not None]
+            if columns:
+                signals[:, m] = np.logical_or.reduce(columns)
+    return signals
+
+
+def compile_entry(entry_config, n, resolve_target, resolve_column):
+    """
+    编译入场规则。
+    - resolve_target(dim, value) -> 类别下标 (前端值到后端编码的映射，失败时抛异常)
+    - resolve_column(cond, target_idx) -> (列名, 长度 N 的数组, (统计量, 类别下标, 窗口期数))；
+      列不存在时数组为 None，类型未知时列名为 None
+    映射错误、缺失列、非法阈值都在这里一次性确定，而不是每期重复判断。
+    """
+    compiled = []
+    for cond in entry_config.get('conditions', []):
+        ctype = cond.get('type')
+        dim = cond.get('dimension')
+        val = cond.get('value')
+
+        try:
+            target_idx = resolve_target(dim, val)
+        except Exception:
+            compiled.append(CompiledCondition(ctype, dim, error={"desc": f"Map Error: {dim}={val}", "passed": False}))
+            continue
+
+        val_name, values, stat = resolve_column(cond, target_idx)
+        if val_name is None:
+            compiled.append(CompiledCondition(ctype, dim, error={"desc": f"Unknown Type: {ctype}", "passed": False}))
+            continue
+        if values is None:
+            compiled.append(CompiledCondition(ctype, dim, column=val_name, error={
+                "desc": f"Missing Col: {val_name}",
+                "passed": False,
+                "actual": "N/A",  # Show N/A so it appears in UI
+                "operator": "?",
+                "threshold": "?"
+            }))
+            continue
+
+        threshold = cond.get('threshold')
+        try:
+            threshold = float(threshold)
+        except (TypeError, ValueError):
+            compiled.append(CompiledCondition(ctype, dim, column=val_name, error={
+                "desc": f"Bad Threshold: {threshold}", "passed": False
+            }))
+            continue
+
+        op = cond.get('operator')
+        compiled.append(CompiledCondition(
+            ctype, dim, column=val_name, values=values,
+            compare=COMPARE_OPS.get(op), operator=op, threshold=threshold, stat=stat
+        ))
+
+    return EntryPlan(compiled, entry_config.get('logicOperator', 'AND'), n)
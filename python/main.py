@@ -3,7 +3,16 @@ import json
 import time
 import os
 import traceback
+import asyncio
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor
 from backtester import BacktestSystem
+from sweep import run_sweep
+from walk_forward import run_walk_forward
+from monte_carlo import build_spec, run_monte_carlo
+from wire import blob_bytes, encode_bulk, remove_stale_blobs
+from profiling import METRICS, RequestTrace, profiled, traced
+import multiprocessing
 
 # 全局变量存储回测系统实例
 backtest_system = None
@@ -41,19 +50,24 @@ def handle_load_data(params):
     if not os.path.exists(file_path):
         return {"status": "error", "message": "File not found"}
     
+    # 区间加载：只读取 start_date ~ end_date (或 start_year ~ end_year) 相交的年份分区
+    start = params.get("start_date") or params.get("start_year")
+    end = params.get("end_date") or params.get("end_year")
     try:
-        backtest_system = BacktestSystem(file_path)
+        backtest_system = BacktestSystem(file_path, start_date=start, end_date=end)
         return {
             "status": "success", 
-            "message": f"Loaded {len(backtest_system.raw_df)} records",
-            "count": len(backtest_system.raw_df)
+            "message": f"Loaded {backtest_system.n} records",
+            "count": backtest_system.n,
+            "cached": backtest_system.cache_hit,
+            "range": backtest_system.source
         }
     except Exception as e:
         log(f"Failed to load data: {str(e)}")
         traceback.print_exc(file=sys.stderr)
         return {"status": "error", "message": f"Data Load Error: {str(e)}"}
 
-def handle_run_backtest(params):
+def handle_run_backtest(params, cancel=None, progress=None):
     global backtest_system
     if not backtest_system:
          return {"status": "error", "message": "Data not loaded"}
@@ -63,11 +77,16 @@ def handle_run_backtest(params):
     # Check wrapper from frontend
     
     try:
-        result = backtest_system.run_backtest(strategy_config)
+        # 可选的回测区间：日期 (含两端) 和 / 或期号，作为已加载全历史的切片模拟
+        bounds = {k: params.get(k) for k in ("start_date", "end_date", "start_period", "end_period")}
+        result = backtest_system.run_backtest(strategy_config, progress=progress, cancel=cancel, **bounds)
         return {
             "status": "success",
             "result": result
         }
+    except CancelledError:
+        log("Backtest cancelled")
+        return {"status": "error", "message": "cancelled"}
     except Exception as e:
         log(f"Backtest error: {str(e)}")
         traceback.print_exc(file=sys.stderr)
@@ -82,7 +101,8 @@ def handle_get_replay_state(params):
     strategy_config = params.get("strategy_config")
     
     try:
-        state = backtest_system.get_replay_state(period, strategy_config)
+        state = backtest_system.get_replay_state(period, strategy_config, params.get("orders_limit"),
+                                                 index=params.get("index"))
         return {
             "status": "success",
             "data": state 
@@ -92,13 +112,35 @@ def handle_get_replay_state(params):
         traceback.print_exc(file=sys.stderr)
         return {"status": "error", "message": str(e)}
 
+def handle_get_replay_states(params):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
+    try:
+        block = backtest_system.get_replay_states(
+            params.get("period"),
+            params.get("count", 100),
+            params.get("strategy_config"),
+            params.get("orders_limit"),
+            start_index=params.get("start_index")
+        )
+        return {
+            "status": "success",
+            "data": block
+        }
+    except Exception as e:
+        log(f"Replay Error: {e}")
+        traceback.print_exc(file=sys.stderr)
+        return {"status": "error", "message": str(e)}
+
 def handle_get_data_stats(params):
     global backtest_system
     if not backtest_system:
          return {"status": "error", "message": "Data not loaded"}
          
     try:
-        stats = backtest_system.get_data_stats()
+        stats = backtest_system.get_data_stats(include_periods=params.get("include_periods") is not False)
         return {
             "status": "success",
             "data": stats
@@ -106,72 +148,536 @@ def handle_get_data_stats(params):
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
-def process_command(line):
+def handle_query_periods(params):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
     try:
-        data = json.loads(line)
-        cmd = data.get("cmd")
-        params = data.get("params", {})
-        req_id = data.get("request_id")
-        
-        log(f"Received command: {cmd}")
-        
-        response_payload = None
-        status = "ok"
-        message = ""
-        
-        if cmd == "load_data":
-            res = handle_load_data(params)
-            if res['status'] == 'error':
-                status = 'error'
-                message = res['message']
-            else:
-                response_payload = res 
-                
-        elif cmd == "run_backtest":
-            res = handle_run_backtest(params)
-            if res['status'] == 'error':
-                 status = 'error'
-                 message = res['message']
-            else:
-                 response_payload = res.get('result')
+        page = backtest_system.query_periods(
+            start_date=params.get("start_date"),
+            end_date=params.get("end_date"),
+            offset=params.get("offset", 0),
+            limit=params.get("limit")
+        )
+        return {
+            "status": "success",
+            "data": page
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
 
-        elif cmd == "get_replay_state":
-            res = handle_get_replay_state(params)
-            if res['status'] == 'error':
-                 status = 'error'
-                 message = res['message']
-            else:
-                 response_payload = res.get('data')
+def handle_query_trades(params):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
 
-        elif cmd == "get_data_stats":
-            res = handle_get_data_stats(params)
-            if res['status'] == 'error':
-                 status = 'error'
-                 message = res['message']
-            else:
-                 response_payload = res.get('data')
-
-        else:
-            status = "error"
-            message = f"Unknown command: {cmd}"
-            
-        # Construct Flat Response for python.ts
-        response = {
-            "request_id": req_id,
-            "status": status,
-            "message": message,
-            "data": response_payload
+    try:
+        page = backtest_system.query_trades(
+            params.get("strategy_config") or {},
+            start=params.get("start", 0),
+            end=params.get("end"),
+            columns=bool(params.get("columns"))
+        )
+        return {
+            "status": "success",
+            "data": page
+        }
+    except Exception as e:
+        log(f"Query trades error: {str(e)}")
+        traceback.print_exc(file=sys.stderr)
+        return {"status": "error", "message": str(e)}
+
+def handle_query_equity_curve(params):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
+    try:
+        curve = backtest_system.query_equity_curve(
+            params.get("strategy_config") or {},
+            start_date=params.get("start_date"),
+            end_date=params.get("end_date"),
+            points=params.get("points", 500)
+        )
+        return {
+            "status": "success",
+            "data": curve
+        }
+    except Exception as e:
+        log(f"Query equity curve error: {str(e)}")
+        traceback.print_exc(file=sys.stderr)
+        return {"status": "error", "message": str(e)}
+
+def handle_get_cache_stats(params):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
+    try:
+        stats = backtest_system.get_cache_stats()
+        return {
+            "status": "success",
+            "data": stats
+        }
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def handle_get_metrics(params):
+    """
+    最近请求的计时记录：每个命令的次数、耗时分位数和各阶段平均耗时，以及最近 limit 条请求的明细。
+    params: {"cmd": 只看某个命令, "limit": 明细条数 (默认 50), "reset": 返回后清空记录}
+    不需要先加载数据；已加载时附带模拟缓存的统计和统计缓存是否命中。
+    """
+    try:
+        data = METRICS.snapshot(params.get("cmd"), params.get("limit", 50))
+        if backtest_system:
+            data["sim_cache"] = backtest_system.get_cache_stats()
+            data["stats_cache_hit"] = backtest_system.cache_hit
+        if params.get("reset"):
+            METRICS.clear()
+        return {"status": "success", "data": data}
+    except Exception as e:
+        return {"status": "error", "message": str(e)}
+
+def handle_append_draws(params):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
+    draws = params.get("draws") or []
+    log(f"Appending {len(draws)} draws...")
+    try:
+        return {
+            "status": "success",
+            "data": backtest_system.append_draws(draws)
+        }
+    except Exception as e:
+        log(f"Append error: {str(e)}")
+        traceback.print_exc(file=sys.stderr)
+        return {"status": "error", "message": str(e)}
+
+def handle_run_backtest_batch(params, cancel=None, progress=None):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
+    configs = params.get("configs") or []
+    log(f"Running batch backtest: {len(configs)} strategies...")
+    try:
+        start = time.time()
+        summaries = backtest_system.run_backtest_batch(
+            configs,
+            progress=progress,
+            cancel=cancel,
+            metrics_only=bool(params.get("metrics_only"))
+        )
+        log(f"Batch backtest finished in {time.time() - start:.3f}s")
+        return {
+            "status": "success",
+            "data": summaries
+        }
+    except CancelledError:
+        log("Batch backtest cancelled")
+        return {"status": "error", "message": "cancelled"}
+    except Exception as e:
+        log(f"Batch backtest error: {str(e)}")
+        traceback.print_exc(file=sys.stderr)
+        return {"status": "error", "message": str(e)}
+
+def handle_run_sweep(params, cancel=None, progress=None):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
+    base_config = params.get("strategy_config") or {}
+    ranges = params.get("ranges") or {}
+    last_logged = [0]
+
+    def sweep_progress(done, total, detail=None):
+        # 每 10% 输出一次进度
+        pct = done * 100 // total
+        if pct >= last_logged[0] + 10 or done == total:
+            last_logged[0] = pct
+            log(f"Sweep progress: {done}/{total} ({pct}%)")
+        if progress:
+            progress(done, total, detail)
+
+    log("Running parameter sweep...")
+    try:
+        result = run_sweep(
+            backtest_system, base_config, ranges,
+            workers=params.get("workers"),
+            sort_by=params.get("sort_by", "total_profit"),
+            top=params.get("top", 100),
+            progress=sweep_progress,
+            cancel=cancel
+        )
+        log(f"Sweep finished: {result['total']} points in {result['elapsed']}s ({result['workers']} workers)")
+        return {
+            "status": "success",
+            "data": result
+        }
+    except CancelledError:
+        log("Sweep cancelled")
+        return {"status": "error", "message": "cancelled"}
+    except Exception as e:
+        log(f"Sweep error: {str(e)}")
+        traceback.print_exc(file=sys.stderr)
+        return {"status": "error", "message": str(e)}
+
+def handle_run_walk_forward(params, cancel=None, progress=None):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
+    log("Running walk-forward evaluation...")
+    try:
+        result = run_walk_forward(
+            backtest_system,
+            params.get("strategy_config") or {},
+            params.get("ranges") or {},
+            folds=params.get("folds", 5),
+            train_size=params.get("train_size"),
+            test_size=params.get("test_size"),
+            anchored=bool(params.get("anchored")),
+            sort_by=params.get("sort_by", "total_profit"),
+            progress=progress,
+            cancel=cancel
+        )
+        log(f"Walk-forward finished: {len(result['folds'])} folds x {result['grid_size']} points in {result['elapsed']}s")
+        return {
+            "status": "success",
+            "data": result
         }
-        
-        # 打印 JSON 到 stdout，供 Rust 端读取
-        print(json.dumps(response, cls=NumpyEncoder))
-        sys.stdout.flush()
-        
-    except json.JSONDecodeError:
-        log("Invalid JSON received")
+    except CancelledError:
+        log("Walk-forward cancelled")
+        return {"status": "error", "message": "cancelled"}
+    except Exception as e:
+        log(f"Walk-forward error: {str(e)}")
+        traceback.print_exc(file=sys.stderr)
+        return {"status": "error", "message": str(e)}
+
+def handle_run_monte_carlo(params, cancel=None, progress=None):
+    global backtest_system
+    if not backtest_system:
+         return {"status": "error", "message": "Data not loaded"}
+
+    log("Running Monte Carlo simulation...")
+    try:
+        spec = build_spec(
+            backtest_system,
+            params.get("strategy_config") or {},
+            model=params.get("model", "fair"),
+            periods=int(params.get("periods") or backtest_system.n or 4000),
+            initial_capital=float(params.get("initial_capital", 10000))
+        )
+        result = run_monte_carlo(
+            spec,
+            paths=params.get("paths", 10000),
+            seed=params.get("seed"),
+            workers=params.get("workers", 1),
+            cancel=cancel,
+            progress=progress
+        )
+        log(f"Monte Carlo finished: {result['paths']} paths x {result['periods']} periods in {result['elapsed']}s")
+        return {
+            "status": "success",
+            "data": result
+        }
+    except CancelledError:
+        log("Monte Carlo cancelled")
+        return {"status": "error", "message": "cancelled"}
+    except Exception as e:
+        log(f"Monte Carlo error: {str(e)}")
+        traceback.print_exc(file=sys.stderr)
+        return {"status": "error", "message": str(e)}
+
+# 命令表: cmd -> (处理函数, 响应 data 取自结果的哪个字段；None 表示整个结果)
+COMMANDS = {
+    "load_data": (handle_load_data, None),
+    "run_backtest": (handle_run_backtest, "result"),
+    "get_replay_state": (handle_get_replay_state, "data"),
+    "get_replay_states": (handle_get_replay_states, "data"),
+    "get_data_stats": (handle_get_data_stats, "data"),
+    "get_cache_stats": (handle_get_cache_stats, "data"),
+    "get_metrics": (handle_get_metrics, "data"),
+    "query_periods": (handle_query_periods, "data"),
+    "query_trades": (handle_query_trades, "data"),
+    "query_equity_curve": (handle_query_equity_curve, "data"),
+    "append_draws": (handle_append_draws, "data"),
+    "run_backtest_batch": (handle_run_backtest_batch, "data"),
+    "run_sweep": (handle_run_sweep, "data"),
+    "run_walk_forward": (handle_run_walk_forward, "data"),
+    "run_monte_carlo": (handle_run_monte_carlo, "data"),
+}
+# 长时间运行的命令：处理函数接受 (params, cancel, progress)，可被 cancel 命令中途停止并发送进度消息
+LONG_RUNNING = {"run_backtest", "run_backtest_batch", "run_sweep", "run_walk_forward", "run_monte_carlo"}
+# 进度消息的最小间隔 (秒)；最后一条 (100%) 不受限制
+PROGRESS_INTERVAL = 0.25
+# 替换或修改回测系统的命令，执行时独占 (等待其它命令完成，之后的命令等待它完成)
+EXCLUSIVE = {"load_data", "append_draws"}
+
+# 工作线程数。回测内核和统计计算在 NumPy / numba (nogil) 中释放 GIL，
+# 参数扫描和蒙特卡洛自己再分发到进程池，因此线程足以让短命令不被长命令阻塞
+ENGINE_WORKERS = max(2, min(4, os.cpu_count() or 2))
+
+
+class ProgressReporter:
+    """
+    长时间命令的进度回调 progress(done, total, detail=None)，按 PROGRESS_INTERVAL 节流后以
+    {"request_id": ..., "status": "progress", "data": {percent, done, total, ...}} 写到 stdout。
+    detail() 返回附加字段 (当前期号、部分资金曲线、目前最好的结果等)，只在真正发送时才调用。
+    """
+
+    def __init__(self, req_id, emit, interval=PROGRESS_INTERVAL):
+        self.req_id = req_id
+        self.emit = emit
+        self.interval = interval
+        self.last = 0.0
+
+    def __call__(self, done, total, detail=None):
+        now = time.monotonic()
+        if done < total and now - self.last < self.interval:
+            return
+        self.last = now
+        data = {"percent": round(done * 100 / total, 1) if total else 100.0, "done": done, "total": total}
+        if detail is not None:
+            data.update(detail())
+        self.emit(format_response(self.req_id, "progress", "", data))
+
+
+def run_command(cmd, params, cancel=None, accept=None, progress=None, trace=None):
+    """
+    同步执行一条命令，返回 (status, message, data)。
+    accept == "arrow" 时 data 中的大数组替换为 Arrow IPC 文件句柄 (见 wire.py)。
+    trace: 可选的 RequestTrace，记录 handler 和 encode 两个阶段。
+    """
+    entry = COMMANDS.get(cmd)
+    if entry is None:
+        return "error", f"Unknown command: {cmd}", None
+    handler, key = entry
+    trace = trace or RequestTrace(cmd)
+    try:
+        with trace.phase("handler"):
+            res = handler(params, cancel, progress) if cmd in LONG_RUNNING else handler(params)
     except Exception as e:
         log(f"Error processing command: {str(e)}")
         traceback.print_exc(file=sys.stderr)
+        return "error", str(e), None
+    if res['status'] == 'error':
+        return "error", res['message'], None
+    data = res if key is None else res.get(key)
+    try:
+        with trace.phase("encode"):
+            data = encode_bulk(data, accept)
+    except Exception as e:
+        log(f"Arrow encoding failed, falling back to JSON: {e}")
+    return "ok", "", data
+
+
+def format_response(req_id, status, message="", data=None, profile=None):
+    # Construct Flat Response for python.ts
+    response = {
+        "request_id": req_id,
+        "status": status,
+        "message": message,
+        "data": data
+    }
+    if profile is not None:
+        response["profile"] = profile
+    return json.dumps(response, cls=NumpyEncoder)
+
+
+def write_line(line):
+    # 打印 JSON 到 stdout，供 Rust 端读取 (每条响应一行；只在事件循环线程中调用，不会交错)
+    print(line)
+    sys.stdout.flush()
+
+
+def write_response(req_id, status, message="", data=None):
+    write_line(format_response(req_id, status, message, data))
+
+
+def _cache_counters():
+    system = backtest_system
+    if system is None:
+        return None
+    cache = system.sim_cache
+    return cache.hits, cache.misses
+
+
+def execute(cmd, params, req_id, cancel=None, accept=None, progress=None, trace=None, profile=None):
+    """
+    在工作线程中执行命令并序列化响应，事件循环只负责写出。
+    trace 记录 queue / handler / encode / serialize 各阶段 (以及 handler 中的引擎阶段)、响应大小和模拟缓存的命中变化；
+    profile ("cprofile" / "pyinstrument" / true) 时剖析整个命令，剖析结果放在响应的 "profile" 字段。
+    """
+    trace = trace or RequestTrace(cmd, req_id)
+    trace.add("queue", time.perf_counter() - trace.received)
+    before = _cache_counters()
+    report = None
+    with traced(trace):
+        try:
+            if profile:
+                with profiled(profile) as report:
+                    status, message, data = run_command(cmd, params, cancel, accept, progress, trace)
+            else:
+                status, message, data = run_command(cmd, params, cancel, accept, progress, trace)
+            after = _cache_counters()
+            if before is not None and after is not None:
+                # 并发的其它命令也会计入这段时间内的命中变化
+                trace.cache = {"hits": after[0] - before[0], "misses": after[1] - before[1]}
+            if accept == "arrow":
+                trace.sizes["blobs"] = blob_bytes(data)
+            with trace.phase("serialize"):
+                line = format_response(req_id, status, message, data, report)
+        except Exception as e:
+            log(f"Error encoding response: {str(e)}")
+            status, line = "error", format_response(req_id, "error", str(e))
+    trace.status = status
+    trace.sizes["response"] = len(line)
+    return line
+
+
+class StateGate:
+    """
+    读写闸门：EXCLUSIVE 命令独占回测系统，其它命令可以并发。
+    已有独占命令排队时，新来的命令排在它之后，因此 load_data 之后发出的查询看到的是新数据。
+    """
+
+    def __init__(self):
+        self._cond = asyncio.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    async def acquire(self, exclusive):
+        async with self._cond:
+            if exclusive:
+                self._writers_waiting += 1
+                await self._cond.wait_for(lambda: not self._writer and self._readers == 0)
+                self._writers_waiting -= 1
+                self._writer = True
+            else:
+                await self._cond.wait_for(lambda: not self._writer and self._writers_waiting == 0)
+                self._readers += 1
+
+    async def release(self, exclusive):
+        async with self._cond:
+            if exclusive:
+                self._writer = False
+            else:
+                self._readers -= 1
+            self._cond.notify_all()
+
+
+class CommandServer:
+    """
+    asyncio 命令分发器：逐行读取 stdin 的 JSON 命令，在线程池中执行，完成后按 request_id 写回，
+    因此响应顺序与请求顺序无关 (python.ts 按 request_id 匹配)。
+    cancel 命令 ({"cmd": "cancel", "params": {"request_id": ...}}) 立即以 "cancelled" 回复目标请求，
+    并通知它尽快停止；参数扫描和蒙特卡洛在块之间、回测在模拟内核的块之间停止，其它命令执行完当前计算后丢弃结果。
+    LONG_RUNNING 命令在最终响应之前发送 status 为 "progress" 的进度消息 (同一 request_id)。
+    """
+
+    def __init__(self, workers=ENGINE_WORKERS):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="engine")
+        self.gate = None
+        self.inflight = {}  # request_id -> {"cancel": threading.Event, "answered": bool, "trace", "profile"}
+        self.tasks = set()
+
+    def submit(self, data, size=0):
+        """登记一条已解析的命令并开始执行 (须在事件循环中调用)。size: 请求行的字节数，计入请求记录。"""
+        cmd = data.get("cmd")
+        req_id = data.get("request_id")
+        log(f"Received command: {cmd}")
+        if cmd == "cancel":
+            write_response(req_id, "ok", data={"cancelled": self.cancel((data.get("params") or {}).get("request_id"))})
+            return
+        request = {"cancel": threading.Event(), "answered": False}
+        if req_id is not None:
+            self.inflight[req_id] = request
+        params = data.get("params") or {}
+        # 响应编码协商：命令外层或 params 中的 "accept": "arrow"
+        accept = data.get("accept") or (params.get("accept") if isinstance(params, dict) else None)
+        # 单请求剖析：命令外层或 params 中的 "profile": "cprofile" | "pyinstrument" | true
+        request["profile"] = data.get("profile") or (params.get("profile") if isinstance(params, dict) else None)
+        request["trace"] = RequestTrace(cmd, req_id, size)
+        task = asyncio.get_running_loop().create_task(self._dispatch(cmd, params, req_id, request, accept))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def cancel(self, req_id):
+        request = self.inflight.get(req_id)
+        if request is None or request["answered"]:
+            return False
+        log(f"Cancelling request {req_id}")
+        request["cancel"].set()
+        request["answered"] = True
+        write_response(req_id, "error", "cancelled")
+        return True
+
+    @staticmethod
+    def _write_progress(request, line):
+        if not request["answered"]:
+            write_line(line)
+
+    async def _dispatch(self, cmd, params, req_id, request, accept=None):
+        exclusive = cmd in EXCLUSIVE
+        trace = request["trace"]
+        try:
+            await self.gate.acquire(exclusive)
+            try:
+                if request["cancel"].is_set():
+                    trace.status = "cancelled"
+                    return
+                loop = asyncio.get_running_loop()
+                progress = None
+                if cmd in LONG_RUNNING and req_id is not None:
+                    # 进度消息由工作线程生成，交给事件循环写出 (先于最终响应，且请求已被取消时丢弃)
+                    progress = ProgressReporter(
+                        req_id, lambda line: loop.call_soon_threadsafe(self._write_progress, request, line))
+                line = await loop.run_in_executor(
+                    self.pool, execute, cmd, params, req_id, request["cancel"], accept, progress, trace,
+                    request["profile"])
+            finally:
+                await self.gate.release(exclusive)
+            if not request["answered"]:
+                request["answered"] = True
+                with trace.phase("write"):
+                    write_line(line)
+            else:
+                trace.status = "cancelled"
+        finally:
+            self.inflight.pop(req_id, None)
+            METRICS.record(trace)
+
+    async def serve(self, stream=None):
+        stream = stream or sys.stdin
+        self.gate = StateGate()
+        loop = asyncio.get_running_loop()
+        # stdin 在独立线程中阻塞读取 (Windows 的事件循环不支持把管道注册为异步读取)
+        reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stdin")
+        try:
+            while True:
+                line = await loop.run_in_executor(reader, stream.readline)
+                if not line:
+                    break
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    self.submit(json.loads(line), len(line.encode()))
+                except json.JSONDecodeError:
+                    log("Invalid JSON received")
+        finally:
+            reader.shutdown(wait=False)
+            # stdin 关闭后仍把已收到的命令执行完并回复
+            if self.tasks:
+                await asyncio.gather(*self.tasks, return_exceptions=True)
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
 
 def main():
     # Force UTF-8 for stdin/stdout to handle Chinese characters correctly on Windows
@@ -186,20 +692,16 @@ def main():
 
     log("Mark Six Python Engine Started (Real Backend)")
     log(f"CWD: {os.getcwd()}")
-    
-    while True:
-        try:
-            line = sys.stdin.readline()
-            if not line:
-                break
-            line = line.strip()
-            if line:
-                process_command(line)
-        except KeyboardInterrupt:
-            break
-        except Exception as e:
-            log(f"Fatal loop error: {e}")
-            break
+    remove_stale_blobs()
+
+    try:
+        asyncio.run(CommandServer().serve())
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        log(f"Fatal loop error: {e}")
 
 if __name__ == "__main__":
+    # 打包为 sidecar 可执行文件后，参数扫描 / 蒙特卡洛的进程池需要它来启动子进程
+    multiprocessing.freeze_support()
     main()
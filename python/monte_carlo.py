@@ -0,0 +1,415 @@
+import os
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+import numpy as np
+
+from data_loader import COLOR_MAP, WX_MAP
+from risk import distribution, histogram
+from simulator import _bet_ladder, HAS_NUMBA, njit
+from stat_engine import STAT_DIMENSIONS
+
+# 每个任务模拟的路径数。按固定大小切块并为每块派生独立的随机种子，
+# 因此同一 seed 的结果与进程数无关。
+CHUNK_PATHS = 25000
+# 每次生成多少期的随机开奖 (两种内核消耗完全相同的随机数)
+BLOCK_PERIODS = 64
+
+# 统计量类型、比较运算符和条件组合方式的编码 (numba 内核中使用)
+STAT_OMISSION = 0
+STAT_FREQ = 1
+STAT_STREAK_HIT = 2
+STAT_CODES = {'omission': STAT_OMISSION, 'freq': STAT_FREQ, 'streak_hit': STAT_STREAK_HIT}
+OP_CODES = {'>=': 0, '<=': 1, '==': 2, '>': 3, '<': 4}
+LOGIC_NEVER = -1
+LOGIC_AND = 0
+LOGIC_OR = 1
+
+
+def fair_draw_tables(year):
+    """
+    公平开奖模型：特码在 1..49 中等概率出现，各维度属性按号码查表。
+    生肖按 year (生肖年) 的 01 号生肖推算 (与 data_loader 相同的公式)。
+    """
+    numbers = np.arange(1, 50)
+    base_zodiac = (int(year) - 2008) % 12
+    return {
+        'number': numbers.astype(np.uint8),
+        'color': np.array([COLOR_MAP[n] for n in numbers], dtype=np.uint8),
+        'wuxing': np.array([WX_MAP.get(n, 4) for n in numbers], dtype=np.uint8),
+        'parity': (numbers % 2).astype(np.uint8),
+        'size': (numbers >= 25).astype(np.uint8),
+        'tail': (numbers % 10).astype(np.uint8),
+        'zodiac': ((base_zodiac - (numbers - 1)) % 12).astype(np.uint8),
+    }
+
+
+class PathState:
+    """
+    n_paths 条路径的全部状态 (每个字段一个数组)，两种内核共用。
+    ring 为窗口统计的环形缓冲区，按 (统计量, 路径, 槽位) 排列，逐路径推进时访问连续。
+    """
+
+    def __init__(self, spec, n_paths):
+        n_stats = len(spec['stat_kind'])
+        max_window = int(spec['stat_window'].max()) if n_stats else 1
+        self.capital = np.full(n_paths, spec['initial_capital'], dtype=np.float64)
+        self.peak = self.capital.copy()
+        self.max_dd = np.zeros(n_paths, dtype=np.float64)
+        self.max_dd_pct = np.zeros(n_paths, dtype=np.float64)
+        self.active = np.zeros(n_paths, dtype=np.bool_)
+        self.level = np.zeros(n_paths, dtype=np.int64)
+        self.ruined = np.zeros(n_paths, dtype=np.bool_)
+        self.ruin_at = np.full(n_paths, -1, dtype=np.int32)
+        self.trades = np.zeros(n_paths, dtype=np.int32)
+        self.stat = np.zeros((n_stats, n_paths), dtype=np.int32)
+        self.ring = np.zeros((n_stats, n_paths, max_window), dtype=np.bool_)
+
+    def arrays(self):
+        return (self.capital, self.peak, self.max_dd, self.max_dd_pct, self.active, self.level,
+                self.ruined, self.ruin_at, self.trades, self.stat, self.ring)
+
+
+def _compare(op, a, b):
+    if op == 0:
+        return a >= b
+    if op == 1:
+        return a <= b
+    if op == 2:
+        return a == b
+    if op == 3:
+        return a > b
+    return a < b
+
+
+def _advance_block(rows, t0, hit_table, ladder, limit, odds, logic,
+                   stat_kind, stat_pair, stat_window, stat_op, stat_threshold,
+                   capital, peak, max_dd, max_dd_pct, active, level, ruined, ruin_at, trades, stat, ring):
+    """
+    逐路径推进一块期数，供 numba 编译。rows[b, p] 为第 p 条路径在第 t0 + b 期抽到的开奖池下标，
+    hit_table[k, row] 为该期是否命中第 k 个 (维度, 值)，k = 0 为下注目标。
+    路径在外层循环，单条路径的状态在整块期数内保存在局部变量中。
+    """
+    n_block, n_paths = rows.shape
+    n_stats = stat_kind.shape[0]
+    # 环形缓冲区的槽位 (整除很慢，每块只算一次)
+    slots = np.empty((n_stats, n_block), dtype=np.int64)
+    for s in range(n_stats):
+        for b in range(n_block):
+            slots[s, b] = (t0 + b) % stat_window[s]
+    for p in range(n_paths):
+        if ruined[p]:
+            continue
+        cap = capital[p]
+        pk = peak[p]
+        mdd = max_dd[p]
+        mdd_pct = max_dd_pct[p]
+        act = active[p]
+        lvl = level[p]
+        n_trades = trades[p]
+
+        for b in range(n_block):
+            t = t0 + b
+            row = rows[b, p]
+
+            # 1. 结算上一期挂出的注单
+            if t > 0 and act:
+                stake = ladder[lvl]
+                n_trades += 1
+                cap -= stake
+                if hit_table[0, row]:
+                    cap += stake * odds
+                    act = False
+                    lvl = 0
+                else:
+                    lvl += 1
+                    if limit >= 0 and lvl >= limit:
+                        act = False
+                        lvl = 0
+                if cap > pk:
+                    pk = cap
+                drawdown = pk - cap
+                if drawdown > mdd:
+                    mdd = drawdown
+                if drawdown / pk > mdd_pct:
+                    mdd_pct = drawdown / pk
+
+            # 2. 以本期开奖更新统计值，判断入场
+            for s in range(n_stats):
+                h = hit_table[stat_pair[s], row]
+                if stat_kind[s] == 0:
+                    stat[s, p] = (stat[s, p] + 1) * (1 - np.int32(h))  # 无分支：命中时清零
+                elif stat_kind[s] == 2:
+                    stat[s, p] = (stat[s, p] + 1) * np.int32(h)  # 未命中时清零
+                else:
+                    slot = slots[s, b]
+                    stat[s, p] += np.int32(h) - np.int32(ring[s, p, slot])
+                    ring[s, p, slot] = h
+            if t > 0 and logic >= 0 and not act:
+                signal = logic == 0
+                for s in range(n_stats):
+                    passed = _compare(stat_op[s], stat[s, p], stat_threshold[s])
+                    if logic == 0 and not passed:
+                        signal = False
+                        break
+                    if logic == 1 and passed:
+                        signal = True
+                        break
+                act = signal
+
+            # 3. 爆仓：资金不足以支付下一注
+            if act and ladder[lvl] > cap:
+                ruined[p] = True
+                ruin_at[p] = t
+                act = False
+                break
+
+        capital[p] = cap
+        peak[p] = pk
+        max_dd[p] = mdd
+        max_dd_pct[p] = mdd_pct
+        active[p] = act
+        level[p] = lvl
+        trades[p] = n_trades
+
+
+def _advance_block_numpy(rows, t0, hit_table, ladder, limit, odds, logic,
+                         stat_kind, stat_pair, stat_window, stat_op, stat_threshold,
+                         capital, peak, max_dd, max_dd_pct, active, level, ruined, ruin_at, trades, stat, ring):
+    """
+    同一状态机的 NumPy 实现：外层按期数循环，每一期对所有路径做一次数组运算。
+    用乘以布尔数组代替 np.where —— 随机分布的掩码会让 where 的分支预测失效。
+    """
+    compare_ops = [np.greater_equal, np.less_equal, np.equal, np.greater, np.less]
+    n_stats = stat_kind.shape[0]
+    with np.errstate(over='ignore', invalid='ignore'):
+        for b in range(rows.shape[0]):
+            t = t0 + b
+            hits = hit_table[:, rows[b]]
+
+            # 1. 结算上一期挂出的注单
+            if t > 0 and active.any():
+                hit = hits[0]
+                stake = ladder[level] * active
+                capital -= stake
+                capital += stake * hit * odds
+                trades += active
+                lose = active & ~hit
+                level += 1
+                level *= lose
+                active[:] = lose if limit < 0 else lose & (level < limit)
+                level *= active  # 止损后下一轮从第一注开始
+
+                np.maximum(peak, capital, out=peak)
+                drawdown = peak - capital
+                np.maximum(max_dd, drawdown, out=max_dd)
+                np.maximum(max_dd_pct, drawdown / peak, out=max_dd_pct)
+
+            # 2. 以本期开奖更新统计值，判断入场
+            for s in range(n_stats):
+                h = hits[stat_pair[s]]
+                if stat_kind[s] == STAT_OMISSION:
+                    # 与 stat_engine 一致：命中当期遗漏为 0，从未出现时为期数下标 + 1
+                    stat[s] += 1
+                    stat[s] *= ~h
+                elif stat_kind[s] == STAT_STREAK_HIT:
+                    stat[s] += 1
+                    stat[s] *= h
+                else:
+                    slot = t % stat_window[s]
+                    stat[s] += h
+                    stat[s] -= ring[s, :, slot]
+                    ring[s, :, slot] = h
+            if t == 0 or logic == LOGIC_NEVER:
+                continue
+            signal = compare_ops[stat_op[0]](stat[0], stat_threshold[0])
+            for s in range(1, n_stats):
+                passed = compare_ops[stat_op[s]](stat[s], stat_threshold[s])
+                signal = signal & passed if logic == LOGIC_AND else signal | passed
+            active |= signal & ~ruined
+
+            # 3. 爆仓：资金不足以支付下一注
+            short = active & (ladder[level] > capital)
+            if short.any():
+                ruined |= short
+                ruin_at[short] = t
+                active &= ~short
+
+
+if HAS_NUMBA:
+    _compare = njit(cache=True)(_compare)
+    _advance_block_jit = njit(cache=True, nogil=True)(_advance_block)
+
+
+def _simulate_paths(spec, n_paths, seed, use_jit=HAS_NUMBA):
+    """
+    模拟 n_paths 条独立路径。
+    返回每条路径的 (期末资金, 最大回撤, 最大回撤比例, 爆仓期数下标, 下注次数)。
+    """
+    advance = _advance_block_jit if use_jit else _advance_block_numpy
+    rng = np.random.default_rng(seed)
+    state = PathState(spec, n_paths)
+    args = (spec['hit_table'], spec['ladder'], spec['limit'], spec['odds'], spec['logic'],
+            spec['stat_kind'], spec['stat_pair'], spec['stat_window'], spec['stat_op'], spec['stat_threshold'])
+    pool_size = spec['hit_table'].shape[1]
+
+    for t0 in range(0, spec['periods'], BLOCK_PERIODS):
+        n_block = min(BLOCK_PERIODS, spec['periods'] - t0)
+        rows = rng.integers(0, pool_size, (n_block, n_paths))
+        advance(rows, t0, *args, *state.arrays())
+
+    return state.capital, state.max_dd, state.max_dd_pct, state.ruin_at, state.trades
+
+
+def build_spec(system, config, model='fair', periods=4000, initial_capital=10000.0, year=None):
+    """
+    把策略配置整理为可序列化的模拟规格 (传给子进程的只有这份规格)。
+    入场条件沿用 BacktestSystem 的编译结果：映射错误 / 缺失统计列的条件恒为 False。
+    """
+    if float(initial_capital) <= 0:
+        raise ValueError("initial_capital must be positive")
+    if model == 'bootstrap':
+        # 对已加载的历史按期有放回抽样 (保留同一期各维度属性之间的关系)
+        pool = {dim: np.asarray(system.columns[col]) for dim, (col, _) in STAT_DIMENSIONS.items() if col in system.columns}
+        if not pool or system.n == 0:
+            raise ValueError("Bootstrap model needs loaded history")
+    elif model == 'fair':
+        if year is None:
+            # 生肖按最后一期所在的生肖年 (春节为界) 查表
+            years = system.columns.get('zodiac_year', system.columns.get('year'))
+            year = int(years[-1]) if years is not None and len(years) else time.localtime().tm_year
+        pool = fair_draw_tables(year)
+    else:
+        raise ValueError(f"Unknown draw model: {model}")
+    pool_size = len(next(iter(pool.values())))
+
+    entry_config = config.get('entry', {})
+    plan = system._compile_entry(entry_config)
+    active = [c for c in plan.conditions if c.active]
+    if not active or plan.logic_operator not in ('AND', 'OR'):
+        logic = LOGIC_NEVER
+    elif plan.logic_operator == 'AND':
+        # AND 规则中只要有一条条件编译失败 (恒为 False)，信号就永远不会触发
+        logic = LOGIC_AND if len(active) == len(plan.conditions) else LOGIC_NEVER
+    else:
+        logic = LOGIC_OR
+
+    # 需要逐期判断命中的 (维度, 值)，第 0 个为下注目标
+    pairs = []
+    hit_rows = []
+
+    def pair_index(dim, value):
+        if (dim, value) not in pairs:
+            pairs.append((dim, value))
+            col = pool.get(dim)
+            hit_rows.append(np.zeros(pool_size, dtype=np.bool_) if col is None else col == value)
+        return pairs.index((dim, value))
+
+    odds = 2.0
+    stats = []
+    if logic != LOGIC_NEVER:
+        target, odds = system._target_and_odds(config)
+        pair_index(*target)
+        for c in active:
+            # 连挂期数与遗漏值的定义相同，编译时已归为 'omission'
+            kind, idx, window = c.stat
+            stats.append((STAT_CODES[kind], pair_index(c.dim, idx), window, OP_CODES[c.operator], c.threshold))
+    else:
+        hit_rows.append(np.zeros(pool_size, dtype=np.bool_))
+
+    money = system._money_kwargs(config)
+    max_bet = np.inf if money['max_bet'] is None else float(money['max_bet'])
+    with np.errstate(over='ignore'):
+        ladder, limit = _bet_ladder(money['mode'], float(money['base_bet']), list(money['multipliers']),
+                                    float(odds), float(money['target_profit']), max_bet, periods + 1)
+
+    return {
+        "periods": int(periods),
+        "initial_capital": float(initial_capital),
+        "hit_table": np.array(hit_rows, dtype=np.bool_),
+        "ladder": ladder,
+        "limit": -1 if limit is None else int(limit),
+        "odds": float(odds),
+        "logic": logic,
+        "stat_kind": np.array([s[0] for s in stats], dtype=np.int64),
+        "stat_pair": np.array([s[1] for s in stats], dtype=np.int64),
+        "stat_window": np.array([s[2] for s in stats], dtype=np.int64),
+        "stat_op": np.array([s[3] for s in stats], dtype=np.int64),
+        "stat_threshold": np.array([s[4] for s in stats], dtype=np.float64),
+    }
+
+
+def run_monte_carlo(spec, paths=10000, seed=None, workers=1, cancel=None, progress=None):
+    """
+    模拟 paths 条独立路径，返回期末资金 / 最大回撤的分布和爆仓概率。
+    workers > 1 时按块分发到进程池。cancel (threading.Event) 被置位后在块之间抛出 CancelledError。
+    progress(done_paths, paths, detail): 每完成一块回调一次，detail() 返回目前的爆仓比例。
+    """
+    start_time = time.time()
+    paths = int(paths)
+    if paths <= 0 or spec['periods'] <= 0:
+        raise ValueError("paths and periods must be positive")
+
+    sizes = [min(CHUNK_PATHS, paths - i) for i in range(0, paths, CHUNK_PATHS)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(int(workers), len(sizes)))
+    def check_cancel():
+        if cancel is not None and cancel.is_set():
+            raise CancelledError()
+
+    parts = []
+
+    def add_part(part):
+        parts.append(part)
+        if progress:
+            done = sum(len(p[3]) for p in parts)
+            progress(done, paths, lambda: {
+                "ruin_probability": round(float(sum((p[3] >= 0).sum() for p in parts)) / done, 6)})
+
+    if workers == 1:
+        for size, s in zip(sizes, seeds):
+            check_cancel()
+            add_part(_simulate_paths(spec, size, s))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_simulate_paths, spec, size, s) for size, s in zip(sizes, seeds)]
+            try:
+                for fut in futures:
+                    check_cancel()
+                    add_part(fut.result())
+            except CancelledError:
+                for fut in futures:
+                    fut.cancel()
+                raise
+
+    final_capital, max_dd, max_dd_pct, ruin_at, trades = (np.concatenate(a) for a in zip(*parts))
+    ruined = ruin_at >= 0
+
+    # 生存曲线：到第 t 期为止仍未爆仓的路径比例 (抽样约 100 个点)
+    periods = spec['periods']
+    checkpoints = np.unique(np.linspace(0, periods - 1, min(periods, 100)).astype(np.int64))
+    ruin_sorted = np.sort(ruin_at[ruined])
+    survival = 1.0 - np.searchsorted(ruin_sorted, checkpoints, side='right') / paths
+
+    return {
+        "paths": paths,
+        "periods": periods,
+        "initial_capital": spec['initial_capital'],
+        "workers": workers,
+        "elapsed": round(time.time() - start_time, 3),
+        "ruin_probability": round(float(ruined.mean()), 6),
+        "ruined_paths": int(ruined.sum()),
+        "profit_probability": round(float((final_capital > spec['initial_capital']).mean()), 6),
+        "mean_trades": round(float(trades.mean()), 2),
+        "final_capital": distribution(final_capital),
+        "final_capital_histogram": histogram(final_capital, 50),
+        "max_drawdown": distribution(max_dd),
+        "max_drawdown_pct": distribution(max_dd_pct),
+        "survival": {
+            "periods": checkpoints.tolist(),
+            "alive": [round(float(v), 6) for v in survival]
+        }
+    }
@@ -0,0 +1,219 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 可选依赖：resource 只在 Unix 上可用；pyinstrument 未安装时单请求剖析退回 cProfile
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    from pyinstrument import Profiler as Pyinstrument
+except ImportError:
+    Pyinstrument = None
+
+# 每条环形缓冲区保留的请求数 (全部请求一条，每个命令各一条)
+METRICS_HISTORY = 256
+# cProfile 输出的函数行数
+PROFILE_LINES = 60
+
+_local = threading.local()
+
+
+class RequestTrace:
+    """
+    一个请求的计时记录：各阶段的墙钟 / CPU 时间 (秒)、载荷大小 (字节) 和模拟缓存的命中变化。
+    阶段：queue (等待闸门和工作线程)、handler (命令本身，包含其中的引擎阶段)、encode (Arrow 句柄)、
+    serialize (JSON)、write (写 stdout)，以及 handler 内部由 phase() 记录的引擎阶段 (load、stats、simulate ...)。
+    CPU 时间为执行该阶段的线程的 CPU 时间，不含参数扫描 / 蒙特卡洛子进程。
+    """
+
+    def __init__(self, cmd, request_id=None, request_bytes=0):
+        self.cmd = cmd
+        self.request_id = request_id
+        self.started = time.time()
+        self.received = time.perf_counter()
+        self.status = None
+        self.phases = {}  # name -> [wall, cpu]
+        self.sizes = {"request": request_bytes}
+        self.cache = None
+        self.peak_rss = None
+        self.finished = None
+
+    def add(self, name, wall, cpu=0.0):
+        totals = self.phases.setdefault(name, [0.0, 0.0])
+        totals[0] += wall
+        totals[1] += cpu
+
+    @contextmanager
+    def phase(self, name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def to_dict(self):
+        return {
+            "request_id": self.request_id,
+            "cmd": self.cmd,
+            "status": self.status,
+            "started": round(self.started, 3),
+            "wall": round(self.finished - self.received, 6) if self.finished is not None else None,
+            "phases": {name: {"wall": round(w, 6), "cpu": round(c, 6)} for name, (w, c) in self.phases.items()},
+            "sizes": self.sizes,
+            "cache": self.cache,
+            "peak_rss": self.peak_rss,
+        }
+
+
+@contextmanager
+def traced(trace):
+    """把 trace 设为当前线程正在执行的请求，供 phase() 记录引擎内部的阶段。"""
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def phase(name):
+    """引擎内部的阶段计时；当前线程没有被跟踪的请求时 (测试、基准、子进程) 什么也不做。"""
+    trace = getattr(_local, "trace", None)
+    if trace is None:
+        yield
+        return
+    with trace.phase(name):
+        yield
+
+
+def peak_rss():
+    """进程的峰值常驻内存 (字节)；平台不支持时为 None。"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def current_rss():
+    """进程当前的常驻内存 (字节)，只在有 /proc 的系统上可用。"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class MetricsRegistry:
+    """
+    最近 METRICS_HISTORY 个请求的记录 (环形缓冲区) 和每个命令的累计计数。
+    记录只在请求结束时追加一次，查询时才汇总分位数，因此平时的开销只有几次计时调用。
+    """
+
+    def __init__(self, size=METRICS_HISTORY):
+        self.size = size
+        self.recent = deque(maxlen=size)
+        self.by_cmd = {}  # cmd -> {"count", "errors", "cancelled", "recent": deque}
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        trace.finished = time.perf_counter()
+        trace.peak_rss = peak_rss()
+        with self._lock:
+            self.recent.append(trace)
+            entry = self.by_cmd.get(trace.cmd)
+            if entry is None:
+                entry = self.by_cmd[trace.cmd] = {"count": 0, "errors": 0, "cancelled": 0,
+                                                  "recent": deque(maxlen=self.size)}
+            entry["count"] += 1
+            if trace.status == "error":
+                entry["errors"] += 1
+            elif trace.status == "cancelled":
+                entry["cancelled"] += 1
+            entry["recent"].append(trace)
+
+    def snapshot(self, cmd=None, limit=50):
+        """按命令汇总 (次数、错误、耗时分位数、各阶段平均耗时、平均响应大小) 和最近 limit 条记录。"""
+        with self._lock:
+            entries = {name: (dict(e), list(e["recent"])) for name, e in self.by_cmd.items()
+                       if cmd is None or name == cmd}
+            recent = [t for t in self.recent if cmd is None or t.cmd == cmd]
+        summary = {}
+        for name, (entry, traces) in entries.items():
+            walls = sorted(t.finished - t.received for t in traces)
+            phases = {}
+            for t in traces:
+                for p, (w, c) in t.phases.items():
+                    totals = phases.setdefault(p, [0.0, 0.0])
+                    totals[0] += w
+                    totals[1] += c
+            responses = [t.sizes.get("response", 0) for t in traces]
+            summary[name] = {
+                "count": entry["count"],
+                "errors": entry["errors"],
+                "cancelled": entry["cancelled"],
+                "wall_p50": round(_percentile(walls, 0.5), 6),
+                "wall_p95": round(_percentile(walls, 0.95), 6),
+                "wall_max": round(walls[-1], 6),
+                "phases_mean": {p: {"wall": round(w / len(traces), 6), "cpu": round(c / len(traces), 6)}
+                                for p, (w, c) in phases.items()},
+                "response_bytes_mean": round(sum(responses) / len(responses)),
+            }
+        limit = max(int(limit), 0)
+        return {
+            "history": self.size,
+            "commands": summary,
+            "recent": [t.to_dict() for t in recent[len(recent) - limit:]] if limit else [],
+            "memory": {"rss": current_rss(), "peak_rss": peak_rss()},
+        }
+
+    def clear(self):
+        with self._lock:
+            self.recent.clear()
+            self.by_cmd.clear()
+
+
+METRICS = MetricsRegistry()
+
+
+@contextmanager
+def profiled(mode):
+    """
+    剖析当前线程中的一段代码，产出 {"format": ..., "text": ...} (yield 的字典在退出时填充)。
+    mode: "pyinstrument" (未安装时退回 cProfile 并在 note 中说明) 或其它真值 (cProfile)。
+    """
+    out = {}
+    if mode == "pyinstrument" and Pyinstrument is not None:
+        profiler = Pyinstrument(async_mode="disabled")
+        profiler.start()
+        try:
+            yield out
+        finally:
+            profiler.stop()
+            out.update(format="pyinstrument", text=profiler.output_text())
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield out
+    finally:
+        profiler.disable()
+        buf = io.StringIO()
+        pstats.Stats(profiler, stream=buf).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        out.update(format="cprofile", text=buf.getvalue())
+        if mode == "pyinstrument":
+            out["note"] = "pyinstrument is not installed; fell back to cProfile"
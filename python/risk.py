@@ -0,0 +1,57 @@
+import numpy as np
+
+# 汇总结果中的分位数
+PERCENTILES = (1, 5, 25, 50, 75, 95, 99)
+
+
+def distribution(values):
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return {"mean": 0.0, "std": 0.0, "min": 0.0, "max": 0.0, "percentiles": {}}
+    pct = np.percentile(values, PERCENTILES)
+    return {
+        "mean": round(float(values.mean()), 2),
+        "std": round(float(values.std()), 2),
+        "min": round(float(values.min()), 2),
+        "max": round(float(values.max()), 2),
+        "percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, pct)}
+    }
+
+
+def histogram(values, bins):
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return {"edges": [], "counts": []}
+    counts, edges = np.histogram(values, bins=bins)
+    return {"edges": [round(float(e), 2) for e in edges], "counts": counts.tolist()}
+
+
+def max_drawdown(capital, initial_capital):
+    """
+    (最大回撤金额, 最大回撤比例)：资金相对此前峰值 (含初始资金) 的最大跌幅，
+    与 monte_carlo 内核逐期维护峰值的结果相同。
+    """
+    if capital.size == 0:
+        return 0.0, 0.0
+    peak = np.maximum.accumulate(capital)
+    np.maximum(peak, initial_capital, out=peak)
+    drawdown = peak - capital
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct = drawdown / peak
+    return float(drawdown.max()), float(pct.max())
+
+
+def longest_runs(flags):
+    """布尔序列中最长的连续 True 和最长的连续 False 的长度 (按游程切分，不逐个遍历)。"""
+    if flags.size == 0:
+        return 0, 0
+    starts = np.concatenate(([0], np.flatnonzero(flags[1:] != flags[:-1]) + 1))
+    lengths = np.diff(np.append(starts, flags.size))
+    values = flags[starts]
+    return int(lengths[values].max(initial=0)), int(lengths[~values].max(initial=0))
+
+
+def first_bust(capital, next_amount, has_next):
+    """资金不足以支付下一注的第一期下标 (与 monte_carlo 的爆仓判定相同)，从未爆仓时返回 None。"""
+    short = np.flatnonzero(has_next & (next_amount > capital))
+    return int(short[0]) if short.size else None
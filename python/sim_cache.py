@@ -0,0 +1,100 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+# 前端传入的规则对象中与回测结果无关的字段（界面用的 id、名称、时间戳等）
+COSMETIC_KEYS = {'id', 'name', 'description', 'createTime', 'updateTime'}
+
+
+def _strip_cosmetic(obj):
+    if isinstance(obj, dict):
+        return {k: _strip_cosmetic(v) for k, v in obj.items() if k not in COSMETIC_KEYS}
+    if isinstance(obj, list):
+        return [_strip_cosmetic(v) for v in obj]
+    return obj
+
+
+def config_key(config):
+    """
+    策略配置的规范化哈希：只取 entry / money / odds 三部分，
+    去掉界面字段后按键排序序列化，因此同一策略在不同请求中得到相同的键。
+    """
+    canonical = _strip_cosmetic({
+        'entry': config.get('entry', {}),
+        'money': config.get('money', {}),
+        'odds': config.get('odds'),
+    })
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class SimulationCache:
+    """
+    回测结果的 LRU 缓存。同时受条目数和内存预算 (字节) 限制，超出时淘汰最久未使用的条目。
+    各方法加锁，可被命令服务器的多个工作线程同时使用。
+    """
+
+    def __init__(self, max_entries=16, max_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, nbytes)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, nbytes=0):
+        with self._lock:
+            self._put(key, value, nbytes)
+
+    def _put(self, key, value, nbytes):
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, nbytes)
+        self.total_bytes += nbytes
+        # 至少保留刚放入的条目，即使它本身超出预算
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_bytes
+            self.evictions += 1
+
+    def items(self):
+        """(键, 值) 列表，按最久未使用到最近使用排列；不计入命中统计，也不改变淘汰顺序。"""
+        with self._lock:
+            return [(key, value) for key, (value, _) in self._entries.items()]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0
+        }
@@ -0,0 +1,449 @@
+import numpy as np
+from bisect import bisect_left, bisect_right
+from concurrent.futures import CancelledError
+
+# 可选依赖：安装了 numba 时使用 JIT 编译的逐期循环，否则使用按轮次推进的 NumPy 实现
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    njit = None
+    HAS_NUMBA = False
+
+# 资金管理模式编码 (paroli 等未实现的模式与 fixed 行为一致：一直按原注额追到命中)
+MODE_FIXED = 0
+MODE_MARTINGALE = 1
+MODE_LOSS_RECOVERY = 2
+
+MODE_CODES = {
+    'fixed': MODE_FIXED,
+    'martingale': MODE_MARTINGALE,
+    'loss_recovery': MODE_LOSS_RECOVERY,
+}
+
+
+class SimulationResult:
+    """
+    一次回测的逐期结果（全部为长度 N 的数组，下标即期数下标）。
+    - placed[i]:      第 i 期是否有注单结算
+    - won[i]:         第 i 期结算的注单是否命中
+    - stake[i]:       第 i 期结算的注额
+    - pnl[i]:         第 i 期的盈亏
+    - capital[i]:     第 i 期结算后的资金
+    - next_amount[i]: 第 i 期收盘后为 i+1 期挂出的注额 (无注单时为 0)
+    - has_next[i]:    第 i 期收盘后是否持有注单
+    - step[i]:        该注单所处的倍投层级
+    final_* 为最后一期收盘后的状态机状态 (是否持仓、倍投层级、连输成本)，用于追加新数据后续算 (extend_simulation)。
+    """
+
+    def __init__(self, n, initial_capital):
+        self.n = n
+        self.initial_capital = initial_capital
+        self.placed = np.zeros(n, dtype=np.bool_)
+        self.won = np.zeros(n, dtype=np.bool_)
+        self.stake = np.zeros(n, dtype=np.float64)
+        self.pnl = np.zeros(n, dtype=np.float64)
+        self.next_amount = np.zeros(n, dtype=np.float64)
+        self.has_next = np.zeros(n, dtype=np.bool_)
+        self.step = np.zeros(n, dtype=np.int32)
+        self.capital = None
+        self.trade_count = None
+        self.win_count = None
+        self.max_single_bet = 0.0
+        self.max_streak_cost = 0.0
+        self.final_active = False
+        self.final_level = 0
+        self.final_streak_cost = 0.0
+
+    @property
+    def nbytes(self):
+        arrays = (self.placed, self.won, self.stake, self.pnl, self.next_amount, self.has_next, self.step,
+                  self.capital, self.trade_count, self.win_count)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def finalize(self):
+        # 资金曲线：以初始资金为首项做前缀和，加法顺序与逐期 capital += profit 完全一致
+        with np.errstate(over='ignore', invalid='ignore'):
+            self.capital = np.cumsum(np.concatenate(([self.initial_capital], self.pnl)))[1:]
+        self.trade_count = np.cumsum(self.placed, dtype=np.int64)
+        self.win_count = np.cumsum(self.won, dtype=np.int64)
+        return self
+
+
+def _bet_ladder(mode, base_bet, multipliers, odds, target_profit, max_bet, length):
+    """
+    一轮注单（入场 -> 命中/止损）内第 k 次下注的注额序列。
+    每轮都从 baseBet 和零累计亏损重新开始，因此所有轮次共享同一条序列。
+    返回 (ladder, limit)：limit 为一轮最多下注次数，None 表示一直追到命中。
+    """
+    if mode == MODE_MARTINGALE:
+        ladder = [base_bet] + [base_bet * m for m in multipliers[1:]]
+        return np.array(ladder, dtype=np.float64), len(ladder)
+
+    if mode == MODE_LOSS_RECOVERY:
+        ladder = [base_bet]
+        acc_loss = 0.0
+        while len(ladder) < length:
+            acc_loss += ladder[-1]
+            if odds <= 1:
+                return np.array(ladder, dtype=np.float64), len(ladder)
+            amount = round((acc_loss + target_profit) / (odds - 1), 2)
+            if amount < 1:
+                amount = 1.0
+            if amount > max_bet:
+                return np.array(ladder, dtype=np.float64), len(ladder)  # Stop Loss (Max Bet)
+            ladder.append(amount)
+        return np.array(ladder, dtype=np.float64), None
+
+    return np.full(length, base_bet, dtype=np.float64), None
+
+
+def _simulate_episodes(signal, hit, ladder, limit, odds, track_step, res):
+    """
+    按"轮次"推进的 NumPy 状态机。
+    只有轮次的起止点需要顺序推导（下一轮从上一轮结束后的首个信号开始），
+    每轮的结束点由"下一次命中"和注额序列长度直接定位，
+    轮内每一期的注额/盈亏则一次性按数组写入。
+    """
+    n = signal.shape[0]
+    sig_list = (np.flatnonzero(signal[1:]) + 1).tolist()
+    if not sig_list:
+        return 0.0, 0.0, False, 0, 0.0
+    hit_list = np.flatnonzero(hit).tolist()
+
+    starts = []
+    ends = []
+    is_open = False  # 数据结束时最后一轮是否仍在持仓
+    k = 0
+    while k < len(sig_list):
+        i = sig_list[k]
+        hp = bisect_right(hit_list, i)
+        h = hit_list[hp] if hp < len(hit_list) else n
+        if h < n and (limit is None or h - i <= limit):
+            e = h            # 命中止盈
+        elif limit is not None and i + limit <= n - 1:
+            e = i + limit    # 止损
+        else:
+            e = n - 1        # 数据结束
+            is_open = True
+        starts.append(i)
+        ends.append(e)
+        if is_open:
+            break
+        # 注单在第 e 期结束后，第 e 期本身即可再次触发入场
+        k = bisect_left(sig_list, e, k + 1)
+
+    starts = np.array(starts, dtype=np.int64)
+    counts = np.array(ends, dtype=np.int64) - starts
+    total = int(counts.sum())
+    pos = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    bet_period = np.repeat(starts, counts) + 1 + pos
+    amounts = ladder[pos]
+    is_hit = hit[bet_period]
+
+    res.placed[bet_period] = True
+    res.stake[bet_period] = amounts
+    res.won[bet_period] = is_hit
+    res.pnl[bet_period] = np.where(is_hit, amounts * (odds - 1), -amounts)
+    res.next_amount[bet_period - 1] = amounts
+    res.has_next[bet_period - 1] = True
+    if track_step:
+        res.step[bet_period - 1] = pos
+    if is_open:
+        tail, c = ends[-1], int(counts[-1])
+        res.next_amount[tail] = ladder[c]
+        res.has_next[tail] = True
+        if track_step:
+            res.step[tail] = c
+
+    final_level = int(counts[-1]) if is_open else 0
+    if total == 0:
+        return 0.0, 0.0, is_open, final_level, 0.0
+    # 连输成本：自上一次命中以来（含本注）累计投入的注额
+    # (loss_recovery 不设上限时注额可能溢出为 inf，与逐期循环的结果保持一致)
+    with np.errstate(over='ignore', invalid='ignore'):
+        spent = np.cumsum(amounts)
+        reset = np.maximum.accumulate(np.where(is_hit, spent, 0.0))
+        exposure = spent - np.concatenate(([0.0], reset[:-1]))
+        streak_cost = float(spent[-1] - reset[-1])
+    return float(amounts.max()), float(np.nanmax(exposure)), is_open, final_level, streak_cost
+
+
+def _simulate_periods(signal, hit, ladder, limit, odds, track_step,
+                      placed, won, stake, pnl, next_amount, has_next, step,
+                      active=False, level=0, streak_cost=0.0):
+    """
+    逐期推进的同一状态机，供 numba 编译。limit < 0 表示不设下注次数上限。
+    (active, level, streak_cost) 为第 0 期收盘后的状态；返回值末尾是最后一期收盘后的状态。
+    """
+    n = signal.shape[0]
+    max_single_bet = 0.0
+    max_streak_cost = 0.0
+
+    for j in range(1, n):
+        if active:
+            amount = ladder[level]
+            max_single_bet = max(max_single_bet, amount)
+            max_streak_cost = max(max_streak_cost, streak_cost + amount)
+            placed[j] = True
+            stake[j] = amount
+            if hit[j]:
+                pnl[j] = amount * (odds - 1)
+                won[j] = True
+                streak_cost = 0.0
+                active = False
+            else:
+                pnl[j] = -amount
+                streak_cost += amount
+                level += 1
+                if limit >= 0 and level >= limit:
+                    active = False
+
+        if not active and signal[j]:
+            active = True
+            level = 0
+
+        if active:
+            next_amount[j] = ladder[level]
+            has_next[j] = True
+            if track_step:
+                step[j] = level
+
+    # 空仓时的层级没有意义 (下次入场从 0 开始)
+    return max_single_bet, max_streak_cost, active, level if active else 0, streak_cost
+
+
+if HAS_NUMBA:
+    _simulate_periods_jit = njit(cache=True, nogil=True)(_simulate_periods)
+
+
+# 只模拟一段期数时在第一个可下注期之前多带的行数：内核从不读取第 0 期的信号 (第 0 期收盘后尚未持仓)，
+# 第 1 期收盘后的信号决定第 2 期的注单，因此切片从第一个可下注期往前 2 期开始
+ENTRY_LEAD = 2
+
+# 带进度回调时 JIT 内核每次推进的期数 (内核在块之间携带状态，结果与一次推进完全相同)
+PROGRESS_CHUNK = 1 << 16
+
+
+def simulate(signal, hit, mode=MODE_FIXED, base_bet=10.0, multipliers=(), odds=2.0,
+             target_profit=10.0, max_bet=None, initial_capital=10000.0, progress=None, cancel=None):
+    """
+    运行资金管理状态机。
+    signal[i] 为第 i 期收盘后是否满足入场条件（即是否为 i+1 期下注），
+    hit[i] 为第 i 期开奖是否命中目标。第 0 期不参与入场判断。
+    progress(done, n, res): 进度回调，res 的前 done 期已写入 (placed / pnl 等，capital 尚未计算)。
+    使用 JIT 内核时每 PROGRESS_CHUNK 期回调一次；NumPy 实现一次完成，只在结束时回调。
+    cancel: threading.Event；已设置时抛出 CancelledError (JIT 内核在块之间检查，NumPy 实现只在开始前检查)。
+    """
+    if cancel is not None and cancel.is_set():
+        raise CancelledError()
+    signal = np.asarray(signal, dtype=np.bool_)
+    hit = np.asarray(hit, dtype=np.bool_)
+    n = signal.shape[0]
+    res = SimulationResult(n, float(initial_capital))
+
+    if n > 1 and signal[1:].any():
+        # 一轮最多连续下注的期数不会超过两次命中之间的最大间隔
+        bounds = np.concatenate(([0], np.flatnonzero(hit), [n]))
+        max_len = int(np.diff(bounds).max()) + 1
+        max_bet = np.inf if max_bet is None else float(max_bet)
+        ladder, limit = _bet_ladder(mode, float(base_bet), list(multipliers), float(odds),
+                                    float(target_profit), max_bet, max_len)
+        track_step = mode == MODE_MARTINGALE
+
+        if HAS_NUMBA and (progress is not None or cancel is not None) and n > PROGRESS_CHUNK:
+            state = _simulate_chunked(signal, hit, ladder, -1 if limit is None else limit, float(odds),
+                                      track_step, res, progress, cancel)
+        elif HAS_NUMBA:
+            state = _simulate_periods_jit(signal, hit, ladder, -1 if limit is None else limit, float(odds),
+                                          track_step, res.placed, res.won, res.stake, res.pnl,
+                                          res.next_amount, res.has_next, res.step)
+        else:
+            state = _simulate_episodes(signal, hit, ladder, limit, float(odds), track_step, res)
+        res.max_single_bet = float(state[0])
+        res.max_streak_cost = float(state[1])
+        res.final_active, res.final_level, res.final_streak_cost = bool(state[2]), int(state[3]), float(state[4])
+
+    if progress is not None:
+        progress(n, n, res)
+    return res.finalize()
+
+
+def _simulate_chunked(signal, hit, ladder, limit, odds, track_step, res, progress=None, cancel=None):
+    """
+    分块调用 JIT 内核：第 a 块从第 a-1 期收盘后的状态开始 (内核把传入切片的第 0 期当作上一期)。
+    每块之后回调进度，cancel 已设置时抛出 CancelledError。
+    """
+    n = signal.shape[0]
+    msb = msc = 0.0
+    active, level, streak_cost = False, 0, 0.0
+    for a in range(1, n, PROGRESS_CHUNK):
+        b = min(n, a + PROGRESS_CHUNK)
+        rows = slice(a - 1, b)
+        state = _simulate_periods_jit(signal[rows], hit[rows], ladder, limit, odds, track_step,
+                                      res.placed[rows], res.won[rows], res.stake[rows], res.pnl[rows],
+                                      res.next_amount[rows], res.has_next[rows], res.step[rows],
+                                      active, level, streak_cost)
+        msb, msc = max(msb, state[0]), max(msc, state[1])
+        active, level, streak_cost = state[2], state[3], state[4]
+        if b < n:
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+            if progress is not None:
+                progress(b, n, res)
+    return msb, msc, active, level, streak_cost
+
+
+def _simulate_batch_totals(signals, hits, ladders, limits, odds, initial_capital, totals):
+    """
+    _simulate_periods 的多策略版本，供 numba 编译：逐个策略沿它的那一列推进状态机，
+    只累计汇总指标而不写逐期数组。signals / hits 为 (N × M) 矩阵 (F 顺序时每列连续)，第 k 列属于第 k 个策略；
+    ladders 为 (M × L)，limits / odds 为长度 M 的数组。totals (M × 8) 写入各策略的
+    (期末资金, 交易次数, 命中次数, 最大单注, 最大连输成本, 是否持仓, 倍投层级, 连输成本)。
+    """
+    n, m = signals.shape
+    for k in range(m):
+        active = False
+        level = 0
+        streak_cost = 0.0
+        capital = initial_capital
+        trades = 0
+        wins = 0
+        max_single_bet = 0.0
+        max_streak_cost = 0.0
+        limit = limits[k]
+        win = odds[k] - 1
+
+        for j in range(1, n):
+            if active:
+                amount = ladders[k, level]
+                max_single_bet = max(max_single_bet, amount)
+                max_streak_cost = max(max_streak_cost, streak_cost + amount)
+                trades += 1
+                # 与 finalize() 的前缀和相同的加法顺序 (无注单的期数加 0 不改变资金)
+                if hits[j, k]:
+                    capital += amount * win
+                    wins += 1
+                    streak_cost = 0.0
+                    active = False
+                else:
+                    capital += -amount
+                    streak_cost += amount
+                    level += 1
+                    if limit >= 0 and level >= limit:
+                        active = False
+
+            if not active and signals[j, k]:
+                active = True
+                level = 0
+
+        totals[k, 0] = capital
+        totals[k, 1] = trades
+        totals[k, 2] = wins
+        totals[k, 3] = max_single_bet
+        totals[k, 4] = max_streak_cost
+        totals[k, 5] = 1.0 if active else 0.0
+        totals[k, 6] = level if active else 0
+        totals[k, 7] = streak_cost
+
+
+if HAS_NUMBA:
+    _simulate_batch_totals_jit = njit(cache=True, nogil=True)(_simulate_batch_totals)
+
+# simulate_batch_totals 返回的各列
+BATCH_TOTALS = ('final_capital', 'total_trades', 'wins', 'max_single_bet', 'max_streak_cost',
+                'final_active', 'final_level', 'final_streak_cost')
+
+
+def simulate_batch_totals(signals, hits, money, initial_capital=10000.0):
+    """
+    一次遍历历史，同时运行 M 个策略的资金管理状态机，只返回汇总指标 (不保留逐期结果)。
+    signals / hits: (N × M) 布尔矩阵 (第 k 列即第 k 个策略的 simulate() 输入)；
+    money: 长度 M 的列表，每项为 simulate() 的资金参数 (mode, base_bet, multipliers, odds, target_profit, max_bet)。
+    返回 {BATCH_TOTALS 中的名称: 长度 M 的数组}，与逐个 simulate() 的结果完全一致。
+    未安装 numba 时逐个调用 simulate()。
+    """
+    signals = np.asarray(signals, dtype=np.bool_)
+    hits = np.asarray(hits, dtype=np.bool_)
+    n, m = signals.shape
+    totals = np.zeros((m, len(BATCH_TOTALS)))
+    if not HAS_NUMBA:
+        for k in range(m):
+            res = simulate(signals[:, k], hits[:, k], initial_capital=initial_capital, **money[k])
+            totals[k] = (res.capital[-1] if n else initial_capital, res.trade_count[-1] if n else 0,
+                         res.win_count[-1] if n else 0, res.max_single_bet, res.max_streak_cost,
+                         res.final_active, res.final_level, res.final_streak_cost)
+        return dict(zip(BATCH_TOTALS, totals.T))
+
+    ladder_list, limits, odds = [], np.full(m, -1, dtype=np.int64), np.ones(m)
+    max_lens = {}  # 命中列 -> 两次命中之间的最大间隔 + 1 (同一投注目标的策略共用同一列)
+    for k, p in enumerate(money):
+        odds[k] = float(p.get('odds', 2.0))
+        if n > 1 and signals[1:, k].any():
+            column = hits[:, k].tobytes()
+            if column not in max_lens:
+                bounds = np.concatenate(([0], np.flatnonzero(hits[:, k]), [n]))
+                max_lens[column] = int(np.diff(bounds).max()) + 1
+            max_bet = p.get('max_bet')
+            ladder, limit = _bet_ladder(p.get('mode', MODE_FIXED), float(p.get('base_bet', 10.0)),
+                                        list(p.get('multipliers', ())), float(odds[k]),
+                                        float(p.get('target_profit', 10.0)),
+                                        np.inf if max_bet is None else float(max_bet), max_lens[column])
+            limits[k] = -1 if limit is None else limit
+        else:
+            # 没有入场信号 (第 0 期不参与入场判断) 的策略不会下注，状态机原地不动
+            ladder = np.zeros(1)
+        ladder_list.append(ladder)
+
+    ladders = np.zeros((m, max((len(l) for l in ladder_list), default=1)))
+    for k, ladder in enumerate(ladder_list):
+        ladders[k, :len(ladder)] = ladder
+
+    # 内核逐列推进：F 顺序的输入 (backtester 的批量矩阵) 每列连续，直接传入而不转置
+    with np.errstate(over='ignore', invalid='ignore'):
+        _simulate_batch_totals_jit(signals, hits, ladders, limits, odds, float(initial_capital), totals)
+    return dict(zip(BATCH_TOTALS, totals.T))
+
+
+def extend_simulation(result, signal, hit, mode=MODE_FIXED, base_bet=10.0, multipliers=(), odds=2.0,
+                      target_profit=10.0, max_bet=None):
+    """
+    从 result 的期末状态继续推进新增的 k 期 (signal / hit 只含新增的各期)，返回长度 N + k 的新结果。
+    结果与对全部 N + k 期调用 simulate() 完全一致，但只需逐期推进新增部分。
+    """
+    signal = np.asarray(signal, dtype=np.bool_)
+    hit = np.asarray(hit, dtype=np.bool_)
+    k = signal.shape[0]
+    # 下标 0 代表已有历史的最后一期 (状态机从它收盘后的状态开始)
+    ext = SimulationResult(k + 1, 0.0)
+    active, level, streak_cost = result.final_active, result.final_level, result.final_streak_cost
+    msb, msc = result.max_single_bet, result.max_streak_cost
+
+    if k and (active or signal.any()):
+        max_bet = np.inf if max_bet is None else float(max_bet)
+        ladder, limit = _bet_ladder(mode, float(base_bet), list(multipliers), float(odds),
+                                    float(target_profit), max_bet, level + k + 1)
+        kernel = _simulate_periods_jit if HAS_NUMBA else _simulate_periods
+        state = kernel(np.concatenate(([False], signal)), np.concatenate(([False], hit)), ladder,
+                       -1 if limit is None else limit, float(odds), mode == MODE_MARTINGALE,
+                       ext.placed, ext.won, ext.stake, ext.pnl, ext.next_amount, ext.has_next, ext.step,
+                       bool(active), int(level), float(streak_cost))
+        msb = max(msb, float(state[0]))
+        msc = max(msc, float(state[1]))
+        active, level, streak_cost = bool(state[2]), int(state[3]), float(state[4])
+
+    out = SimulationResult(result.n + k, result.initial_capital)
+    for name in ('placed', 'won', 'stake', 'pnl', 'next_amount', 'has_next', 'step'):
+        setattr(out, name, np.concatenate((getattr(result, name), getattr(ext, name)[1:])))
+    # 资金曲线从最后一期的资金继续累加，加法顺序与整体 finalize() 相同
+    last_capital = result.capital[-1] if result.n else result.initial_capital
+    with np.errstate(over='ignore', invalid='ignore'):
+        out.capital = np.concatenate((result.capital, np.cumsum(np.concatenate(([last_capital], ext.pnl[1:])))[1:]))
+    last_trades = result.trade_count[-1] if result.n else 0
+    last_wins = result.win_count[-1] if result.n else 0
+    out.trade_count = np.concatenate((result.trade_count, last_trades + np.cumsum(ext.placed[1:], dtype=np.int64)))
+    out.win_count = np.concatenate((result.win_count, last_wins + np.cumsum(ext.won[1:], dtype=np.int64)))
+    out.max_single_bet = msb
+    out.max_streak_cost = msc
+    out.final_active, out.final_level, out.final_streak_cost = active, level, streak_cost
+    return out
@@ -26,131 +26,129 @@ def calculate_omission(series: pd.Series) -> pd.Series:
     # We can create columns like: `omission_sp_color_0` (Red Omission), `omission_sp_color_1` (Blue)...
     pass
 
-def precompute_omissions(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Vectorized calculation of omissions for known dimensions.
-    Adds columns: `om_color_0`, `om_color_1`, `om_zodiac_0`...
-    """
-    # Helper to calculate omission for a specific binary condition or value match
-    # Algorithm:
-    # 1. Identify hits: mask = (df[col] == target)
-    # 2. Cumulative count of periods?
-    # Better: Groupby cumcount? No.
-    # Pandas approach:
-    #   groups = mask.cumsum()
-    #   omission = df.groupby(groups).cumcount() 
-    #   Wait, if hit, omission is 0. If miss, omission increases.
-    
-    stats_df = pd.DataFrame(index=df.index)
-    
-    # Dimension: Color (0, 1, 2)
-    for val in [0, 1, 2]:
-        mask = (df['sp_color'] == val)
-        # Reset group on hit
-        # groups increments on every hit
-        groups = mask.cumsum()
-        # cumcount gives 0, 1, 2... within the group.
-        # If row is a hit (mask=True), it belongs to the NEW group (k). cumcount is 0.
-        # If row is a miss (mask=False), it belongs to group (k). cumcount increments.
-        # BUT: mask.cumsum() increments ON the hit row.
-        
-        # 稳健的方法：
-        # 对于每一行，获取最后一次看到该值的索引并向下填充。
-        last_seen = pd.Series(np.where(mask, df.index, np.nan), index=df.index).ffill()
-        omission = df.index - last_seen
-        
-        # 处理当前命中情况：如果 mask 为 True，则遗漏为 0。
-        # 验证：如果第 5 行命中，last_seen=5，5-5=0。正确。
-        # 第 6 行未命中，last_seen=5，6-5=1。正确。
-        
-        # 将 NaN（从未出现过）填充为 index + 1（自开始以来的遗漏数）
-        omission = omission.fillna(pd.Series(df.index + 1, index=df.index))
-        stats_df[f'om_color_{val}'] = omission.astype('uint16')
+# 参与逐期统计的特码维度: 维度 -> (数据列, 取值列表)。号码直接取特码本身
+STAT_DIMENSIONS = {
+    'number': ('special', range(1, 50)),
+    'color': ('sp_color', range(3)),
+    'zodiac': ('sp_zodiac', range(12)),
+    'wuxing': ('sp_wuxing', range(5)),
+    'size': ('sp_size', range(2)),
+    'parity': ('sp_parity', range(2)),
+    'tail': ('sp_tail', range(10)),
+}
 
+# uint16 遗漏值的上限 (超过时饱和，不回绕)
+OMISSION_MAX = np.iinfo(np.uint16).max
 
-    # 维度：生肖 (0..11)
-    for val in range(12):
-        mask = (df['sp_zodiac'] == val)
-        last_seen = pd.Series(np.where(mask, df.index, np.nan), index=df.index).ffill()
-        omission = (df.index - last_seen).fillna(pd.Series(df.index + 1, index=df.index))
-        stats_df[f'om_zodiac_{val}'] = omission.astype('uint16')
+def category_column(dim: str, val):
+    """(维度, 取值) 在该维度统计矩阵中的列号，未知维度或取值时返回 None。"""
+    spec = STAT_DIMENSIONS.get(dim)
+    if spec is None or not isinstance(val, (int, np.integer)) or val not in spec[1]:
+        return None
+    return spec[1].index(val)
 
-    # 维度：五行 (0..4) - 暂时跳过，数据中没有此列
-    # for val in range(5):
-    #     mask = (df['sp_wuxing'] == val)
-    #     last_seen = pd.Series(np.where(mask, df.index, np.nan), index=df.index).ffill()
-    #     omission = (df.index - last_seen).fillna(pd.Series(df.index + 1, index=df.index))
-    #     stats_df[f'om_wuxing_{val}'] = omission.astype('uint16')
+def _category_hits(df: pd.DataFrame):
+    """逐维度的命中矩阵：[(dim, N x K 布尔矩阵)]，跳过 df 中不存在的维度。"""
+    blocks = []
+    for dim, (col, values) in STAT_DIMENSIONS.items():
+        if col in df.columns:
+            blocks.append((dim, df[col].to_numpy()[:, None] == np.asarray(values)))
+    return blocks
 
-    # 维度：大小 (0, 1)
-    for val in [0, 1]:
-        mask = (df['sp_size'] == val)
-        last_seen = pd.Series(np.where(mask, df.index, np.nan), index=df.index).ffill()
-        omission = (df.index - last_seen).fillna(pd.Series(df.index + 1, index=df.index))
-        stats_df[f'om_size_{val}'] = omission.astype('uint16')
+def _flat_index(blocks):
+    """把逐维度的列号展平为 "{dim}_{val}" -> 全局列号。"""
+    index = {}
+    for dim, _ in blocks:
+        for val in STAT_DIMENSIONS[dim][1]:
+            index[f'{dim}_{val}'] = len(index)
+    return index
 
-    # 维度：单双 (0, 1)
-    for val in [0, 1]:
-        mask = (df['sp_parity'] == val)
-        last_seen = pd.Series(np.where(mask, df.index, np.nan), index=df.index).ffill()
-        omission = (df.index - last_seen).fillna(pd.Series(df.index + 1, index=df.index))
-        stats_df[f'om_parity_{val}'] = omission.astype('uint16')
+def calc_omission_matrices(df: pd.DataFrame, last=None):
+    """
+    所有维度的遗漏值，一次扫描得到。
+    返回 {dim: N x K 的 uint16 矩阵}，列顺序与 STAT_DIMENSIONS 中的取值列表一致：
+    命中当期遗漏为 0，之后每期 +1；从未出现时为期数下标 + 1。
+    last 为 {dim: 已有历史最后一期的遗漏值行} 时，df 只含新增的各期，结果从该行续接 (O(新增期数))。
+    """
+    rows = np.arange(1, len(df) + 1, dtype=np.int64)[:, None]  # 相对已有历史最后一期的偏移
+    matrices = {}
+    for dim, hit in _category_hits(df):
+        # 上一次命中的位置：没有已有历史时为 0 (即第 -1 期)，否则为 -遗漏值
+        prev = np.zeros(hit.shape[1], dtype=np.int64) if last is None else -np.asarray(last[dim], dtype=np.int64)
+        last_hit = np.maximum.accumulate(np.where(hit, rows, prev), axis=0)
+        om = np.empty(hit.shape, dtype=np.uint16, order='F')
+        np.minimum(rows - last_hit, OMISSION_MAX, out=om, casting='unsafe')
+        matrices[dim] = om
+    return matrices
 
-    # 维度：尾数 (0..9)
-    for val in range(10):
-        mask = (df['sp_tail'] == val)
-        last_seen = pd.Series(np.where(mask, df.index, np.nan), index=df.index).ffill()
-        omission = (df.index - last_seen).fillna(pd.Series(df.index + 1, index=df.index))
-        stats_df[f'om_tail_{val}'] = omission.astype('uint16')
-        
-    return stats_df
+def calc_cumulative_counts(df: pd.DataFrame, last=None):
+    """
+    每个 (维度, 取值) 的累计出现次数，代替固定窗口的滚动列。
+    返回 (index, counts)：index 为 "{dim}_{val}" -> 列号，counts 为 (N + 1) x K 的矩阵，
+    counts[i] 是前 i 期 (0..i-1) 的出现次数，首行为 0。任意窗口的热度都由两行相减得到，见 window_counts。
+    last 为已有历史的最后一行累计值时，df 只含新增的各期，只返回新增的 k 行。
+    """
+    blocks = _category_hits(df)
+    index = _flat_index(blocks)
+    counts = np.zeros((len(df) + 1, len(index)), dtype=np.uint32, order='F')
+    if last is not None:
+        counts[0] = last
+    if blocks:
+        np.cumsum(np.hstack([hit for _, hit in blocks]), axis=0, out=counts[1:])
+        if last is not None:
+            counts[1:] += counts[0]
+    return index, counts if last is None else counts[1:]
+
+def calc_streaks(df: pd.DataFrame, last=None):
+    """
+    连中期数：截至第 i 期 (含) 该取值连续出现的期数，本期未出现时为 0。
+    返回 (index, hits)，index 为 "{dim}_{val}" -> 列号。连挂期数与遗漏值相同，直接使用 calc_omission_matrices。
+    last 为已有历史最后一期的连中期数行时，df 只含新增的各期，结果从该行续接。
+    """
+    blocks = _category_hits(df)
+    index = _flat_index(blocks)
+    n = len(df)
+    if not blocks:
+        return index, np.zeros((n, 0), dtype=np.uint32)
+    hit = np.hstack([h for _, h in blocks])
+    rows = np.arange(1, n + 1, dtype=np.int64)[:, None]
+    # 游程长度 = 当前位置 - 最近一次未出现的位置 (从未中断时为 0，续接时为 -已有连中期数)
+    prev = np.zeros(hit.shape[1], dtype=np.int64) if last is None else -np.asarray(last, dtype=np.int64)
+    last_miss = np.maximum.accumulate(np.where(hit, prev, rows), axis=0)
+    return index, np.asfortranarray(rows - last_miss, dtype=np.uint32)
 
-def calc_all_stats(df: pd.DataFrame) -> pd.DataFrame:
+def window_counts(cum: np.ndarray, window: int, idx=None, lead=None):
     """
-    计算所有统计指标的主入口（遗漏、热度等）。
-    返回与 df 对齐的 DataFrame，仅包含统计列。
+    最近 window 期 (含当期) 的出现次数，等价于 rolling(window, min_periods=1).sum()。
+    cum 为 calc_cumulative_counts 中的一列 (长度 N + 1)。
+    lead 为区间加载时 cum 之前的累计计数行 (从历史开头起，见 dataset.py)，窗口跨过第一期时从中取值。
+    - idx 为 None：返回全部 N 期的向量 (O(N))
+    - idx 为整数：只返回该期的值 (O(1))
+    """
+    window = max(int(window), 1)
+    t = 0
+    if lead is not None and len(lead):
+        t = len(lead)
+        cum = np.concatenate((lead, cum))
+    if idx is not None:
+        return int(cum[t + idx + 1]) - int(cum[max(0, t + idx + 1 - window)])
+    out = cum[t + 1:].astype(np.int64)
+    # 第 k 期起窗口的起点落在 cum 之内，之前的各期从 cum[0] 算起
+    k = min(max(window - t - 1, 0), len(out))
+    out[k:] -= cum[k + t + 1 - window:len(cum) - window]
+    out[:k] -= cum[0]
+    return out
+
+def calc_all_stats(df: pd.DataFrame):
+    """
+    计算逐期统计的主入口。
+    返回 calc_omission_matrices 的逐维度遗漏值矩阵；窗口热度由 calc_cumulative_counts 的累计计数按需计算。
     """
     # 确保索引是递增的整数 (0..N)
     df = df.reset_index(drop=True)
     
-    # 1. 遗漏值计算
-    om_df = precompute_omissions(df)
-    
-    # 2. 热度计算 (最近 100 期的频率)
-    # 对布尔掩码进行滚动求和
-    hot_df = pd.DataFrame(index=df.index)
-    
-    # 波色热度
-    for val in [0, 1, 2]:
-        mask = (df['sp_color'] == val).astype(int)
-        hot_df[f'freq_color_{val}_100'] = mask.rolling(100, min_periods=1).sum().fillna(0).astype('uint16')
-    
-    # 生肖热度
-    for val in range(12):
-        mask = (df['sp_zodiac'] == val).astype(int)
-        hot_df[f'freq_zodiac_{val}_100'] = mask.rolling(100, min_periods=1).sum().fillna(0).astype('uint16')
-        
-    # 五行热度 - 暂时跳过，数据中没有此列
-    # for val in range(5):
-    #     mask = (df['sp_wuxing'] == val).astype(int)
-    #     hot_df[f'freq_wuxing_{val}_100'] = mask.rolling(100, min_periods=1).sum().fillna(0).astype('uint16')
-
-    # 大小热度
-    for val in [0, 1]:
-        mask = (df['sp_size'] == val).astype(int)
-        hot_df[f'freq_size_{val}_100'] = mask.rolling(100, min_periods=1).sum().fillna(0).astype('uint16')
-
-    # 单双热度
-    for val in [0, 1]:
-        mask = (df['sp_parity'] == val).astype(int)
-        hot_df[f'freq_parity_{val}_100'] = mask.rolling(100, min_periods=1).sum().fillna(0).astype('uint16')
-
-    # 尾数热度
-    for val in range(10):
-        mask = (df['sp_tail'] == val).astype(int)
-        hot_df[f'freq_tail_{val}_100'] = mask.rolling(100, min_periods=1).sum().fillna(0).astype('uint16')
-
-    return pd.concat([om_df, hot_df], axis=1)
+    # 遗漏值计算
+    return calc_omission_matrices(df)
 
 if __name__ == "__main__":
     from data_loader import load_data
@@ -159,12 +157,13 @@ if __name__ == "__main__":
         df = load_data(path)
         stats = calc_all_stats(df)
         print("统计指标计算完成。")
-        print(stats.columns.tolist()[:10])
-        print(stats.tail())
+        print({dim: m.shape for dim, m in stats.items()})
         
         # 验证逻辑：
         # 检查当值出现时，遗漏值是否重置为 0。
-        check = pd.concat([df[['sp_color', 'sp_zodiac']], stats[['om_color_0', 'om_color_1', 'om_zodiac_0']]], axis=1)
+        check = df[['sp_color', 'sp_zodiac']].copy()
+        check['om_color_0'] = stats['color'][:, 0]
+        check['om_zodiac_0'] = stats['zodiac'][:, 0]
         print(check.tail(10))
     except Exception as e:
         print(e)
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+
+import numpy as np
+
+# 统计结果格式的版本号。data_loader 的增强列或 stat_engine 的统计定义变化时必须加一，
+# 旧版本的缓存会因此自动失效
+STATS_SCHEMA_VERSION = 3
+
+# 缓存目录名，位于数据文件所在目录下 (例如 data/history/.stats_cache/)
+CACHE_DIR_NAME = '.stats_cache'
+MANIFEST_NAME = 'manifest.json'
+ENTRY_SUFFIX = re.compile(r'[0-9a-f]{32}-v\d+')
+
+
+def file_fingerprint(path):
+    """数据文件的指纹：大小、修改时间和内容哈希。"""
+    st = os.stat(path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest.hexdigest(),
+            "schema": STATS_SCHEMA_VERSION}
+
+
+def _entry_dir(path, fingerprint):
+    # 目录名包含指纹，重写数据文件后写入新目录，而不是覆盖可能仍被映射的旧文件
+    stem = os.path.splitext(os.path.basename(path))[0]
+    key = f"{fingerprint['hash']}-v{fingerprint['schema']}"
+    return os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME, f"{stem}-{key}")
+
+
+def load_stats_cache(path, fingerprint=None):
+    """
+    读取 path 对应的统计缓存。命中时返回 (arrays, meta)，数组以只读内存映射方式打开；
+    没有缓存、指纹不符或文件损坏时返回 None。
+    """
+    fingerprint = fingerprint or file_fingerprint(path)
+    entry = _entry_dir(path, fingerprint)
+    try:
+        with open(os.path.join(entry, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get("fingerprint") != fingerprint:
+            return None
+        # 以普通 ndarray 视图返回 (映射由 .base 保持)：np.memmap 子类的逐元素索引开销高出一个数量级
+        arrays = {name: np.load(os.path.join(entry, file), mmap_mode='r').view(np.ndarray)
+                  for name, file in manifest["arrays"].items()}
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"统计缓存读取失败，将重新计算: {e}")
+        return None
+    return arrays, manifest["meta"]
+
+
+def save_stats_cache(path, arrays, meta, fingerprint=None):
+    """
+    写入 path 对应的缓存 (增强后的数据列和统计数组，均为 NumPy 数组)，并删除同一数据文件的旧缓存。
+    失败 (例如目录只读) 时只记录日志，不影响加载。
+    """
+    fingerprint = fingerprint or file_fingerprint(path)
+    entry = _entry_dir(path, fingerprint)
+    tmp = f"{entry}.tmp{os.getpid()}"
+    try:
+        os.makedirs(tmp, exist_ok=True)
+        files = {}
+        for i, (name, arr) in enumerate(arrays.items()):
+            files[name] = f"{i}.npy"
+            np.save(os.path.join(tmp, files[name]), np.asarray(arr))
+        manifest = {"source": os.path.basename(path), "fingerprint": fingerprint, "arrays": files, "meta": meta}
+        # manifest 最后写入：只有完整写完的目录才会被 load_stats_cache 当作有效缓存
+        with open(os.path.join(tmp, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+    except Exception as e:
+        logging.warning(f"统计缓存写入失败: {e}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        return None
+    _remove_stale(path, entry)
+    return entry
+
+
+def _remove_stale(path, keep):
+    """删除同一数据文件的其它缓存目录 (Windows 下仍被映射的目录会删除失败，下次再清理)。"""
+    cache_root = os.path.dirname(keep)
+    prefix = os.path.splitext(os.path.basename(path))[0] + '-'
+    for name in os.listdir(cache_root):
+        full = os.path.join(cache_root, name)
+        # 只匹配 "{stem}-{hash}-v{schema}"，不会误删文件名以同样前缀开头的其它数据文件的缓存
+        if name.startswith(prefix) and ENTRY_SUFFIX.fullmatch(name[len(prefix):]) and full != keep:
+            shutil.rmtree(full, ignore_errors=True)
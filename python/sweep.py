@@ -0,0 +1,228 @@
+import copy
+import itertools
+import os
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# 单次扫描允许的最大组合数，防止误传的范围把引擎卡死
+MAX_POINTS = 200000
+# 组合数少于该值时直接在当前进程内计算 (启动进程池的开销比计算本身还大)
+INLINE_THRESHOLD = 256
+
+# 排序时数值越小越好的指标
+ASCENDING_METRICS = {'max_single_bet', 'max_streak_cost'}
+
+
+def _extend_multipliers(multipliers, length):
+    """把倍投序列截断或延长到指定长度，延长部分按最后一级翻倍。"""
+    seq = list(multipliers or [1])[:length]
+    while len(seq) < length:
+        seq.append(seq[-1] * 2)
+    return seq
+
+
+def expand_grid(ranges):
+    """
+    参数范围 -> 参数组合列表。每个组合是 {参数路径: 取值} 的字典。
+    ranges 示例:
+    {
+        "conditions": [{"threshold": [5, 10, 15], "value": ["红", "蓝"]}],  # 按下标对应入场条件
+        "baseBet": [5, 10],
+        "multipliers_length": [3, 4, 5],
+        "maxBet": [500, 1000]
+    }
+    """
+    axes = []
+    for i, cond_ranges in enumerate(ranges.get('conditions') or []):
+        for field in ('threshold', 'value', 'operator'):
+            values = (cond_ranges or {}).get(field)
+            if values:
+                axes.append((f"conditions.{i}.{field}", list(values)))
+    for field in ('baseBet', 'multipliers_length', 'maxBet'):
+        values = ranges.get(field)
+        if values:
+            axes.append((field, list(values)))
+
+    total = 1
+    for _, values in axes:
+        total *= len(values)
+    if total > MAX_POINTS:
+        raise ValueError(f"Sweep grid too large: {total} points (max {MAX_POINTS})")
+
+    keys = [k for k, _ in axes]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*[v for _, v in axes])]
+
+
+def apply_params(base_config, params):
+    """在基础策略上套用一个参数组合，返回新的策略配置。"""
+    config = copy.deepcopy(base_config)
+    entry = config.setdefault('entry', {})
+    money = config.setdefault('money', {})
+    money_params = money.setdefault('params', {})
+
+    for key, value in params.items():
+        if key.startswith('conditions.'):
+            _, idx, field = key.split('.')
+            conditions = entry.get('conditions', [])
+            if int(idx) >= len(conditions):
+                raise ValueError(f"Sweep range refers to missing condition #{idx}")
+            conditions[int(idx)][field] = value
+        elif key == 'multipliers_length':
+            money_params['multipliers'] = _extend_multipliers(money_params.get('multipliers'), int(value))
+        else:
+            money_params[key] = value
+    return config
+
+
+def _evaluate_chunk(system, base_config, chunk):
+    rows = []
+    for idx, params in chunk:
+        try:
+            rows.append((idx, system.evaluate(apply_params(base_config, params))))
+        except Exception as e:
+            rows.append((idx, {"error": str(e)}))
+    return rows
+
+
+class SharedArrays:
+    """
+    把回测系统的 NumPy 数组放进共享内存，子进程按名称直接映射，
+    因此每个任务只需传递参数组合，而不是整份历史数据。
+    """
+
+    def __init__(self, arrays):
+        self.blocks = []
+        self.spec = {}
+        for name, arr in arrays.items():
+            order = 'F' if arr.flags.f_contiguous and not arr.flags.c_contiguous else 'C'
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf, order=order)
+            view[...] = arr
+            self.blocks.append(shm)
+            self.spec[name] = (shm.name, arr.shape, arr.dtype.str, order)
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+
+# 子进程内的全局状态 (由 _init_worker 设置)
+_worker_system = None
+_worker_config = None
+_worker_blocks = []
+
+
+def _init_worker(spec, meta, base_config):
+    global _worker_system, _worker_config, _worker_blocks
+    from backtester import BacktestSystem
+
+    arrays = {}
+    for name, (shm_name, shape, dtype, order) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker_blocks.append(shm)  # 保持映射存活
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, order=order)
+        arr.flags.writeable = False
+        arrays[name] = arr
+    _worker_system = BacktestSystem.from_arrays(arrays, meta)
+    _worker_config = base_config
+
+
+def _worker_chunk(chunk):
+    return _evaluate_chunk(_worker_system, _worker_config, chunk)
+
+
+def _rank(rows, sort_by, top):
+    ok = [r for r in rows if "error" not in r]
+    failed = [r for r in rows if "error" in r]
+    descending = sort_by not in ASCENDING_METRICS
+    ok.sort(key=lambda r: r.get(sort_by, 0), reverse=descending)
+    ranked = ok[:top] if top else ok
+    for rank, row in enumerate(ranked, 1):
+        row["rank"] = rank
+    return ranked, failed
+
+
+def _best_so_far(results, grid, sort_by):
+    """已完成的组合中按 sort_by 最好的一个 (进度消息用)。"""
+    done = [(i, m) for i, m in enumerate(results) if m is not None and "error" not in m]
+    if not done:
+        return {"best": None}
+    pick = min if sort_by in ASCENDING_METRICS else max
+    i, metrics = pick(done, key=lambda item: item[1].get(sort_by, 0))
+    return {"best": dict(metrics, params=grid[i])}
+
+
+def run_sweep(system, base_config, ranges, workers=None, sort_by='total_profit', top=100,
+              progress=None, chunk_size=None, cancel=None):
+    """
+    参数扫描：对参数网格中的每个组合运行一次回测，返回按 sort_by 排序的结果表。
+    - workers: 进程数，默认 CPU 核数；1 或组合数很少时在当前进程内计算
+    - progress(done, total, detail): 进度回调 (在主进程中调用)，detail() 返回目前最好的组合
+    - cancel: threading.Event，被置位后在下一块完成时放弃尚未开始的块并抛出 CancelledError
+    """
+    start_time = time.time()
+    grid = expand_grid(ranges)
+    total = len(grid)
+    if total:
+        apply_params(base_config, grid[0])  # 范围与基础策略不匹配时尽早报错
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(int(workers), total or 1))
+    if total < INLINE_THRESHOLD:
+        workers = 1
+
+    tasks = list(enumerate(grid))
+    if chunk_size is None:
+        # 每个进程约 8 块，兼顾负载均衡和进度刷新频率
+        chunk_size = max(1, min(500, -(-total // (workers * 8))))
+    chunks = [tasks[i:i + chunk_size] for i in range(0, total, chunk_size)]
+
+    results = [None] * total
+    done = 0
+    if workers == 1:
+        for chunk in chunks:
+            if cancel is not None and cancel.is_set():
+                raise CancelledError()
+            for idx, metrics in _evaluate_chunk(system, base_config, chunk):
+                results[idx] = metrics
+            done += len(chunk)
+            if progress:
+                progress(done, total, lambda: _best_so_far(results, grid, sort_by))
+    else:
+        arrays, meta = system.export_arrays()
+        shared = SharedArrays(arrays)
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(shared.spec, meta, base_config)) as pool:
+                futures = [pool.submit(_worker_chunk, chunk) for chunk in chunks]
+                for fut in as_completed(futures):
+                    if cancel is not None and cancel.is_set():
+                        for f in futures:
+                            f.cancel()
+                        raise CancelledError()
+                    rows = fut.result()
+                    for idx, metrics in rows:
+                        results[idx] = metrics
+                    done += len(rows)
+                    if progress:
+                        progress(done, total, lambda: _best_so_far(results, grid, sort_by))
+        finally:
+            shared.close()
+
+    rows = [dict(metrics, params=grid[i]) for i, metrics in enumerate(results)]
+    ranked, failed = _rank(rows, sort_by, top)
+    return {
+        "total": total,
+        "errors": len(failed),
+        "first_error": failed[0]["error"] if failed else None,
+        "workers": workers,
+        "elapsed": round(time.time() - start_time, 3),
+        "sort_by": sort_by,
+        "rows": ranked
+    }
@@ -0,0 +1,59 @@
+import logging
+import os
+import random
+import tempfile
+
+from backtester import BacktestSystem
+from test_stats_cache import write_history
+
+DIMENSIONS = {"color": ["red", "blue", "green"], "zodiac": ["龙", "马", "鼠"], "parity": ["odd", "even"],
+              "size": ["big", "small"]}
+
+
+def random_config(rng):
+    conditions = []
+    for _ in range(rng.randint(1, 3)):
+        dim = rng.choice(list(DIMENSIONS))
+        ctype = rng.choice(["omission", "window_stat", "streak"])
+        cond = {"type": ctype, "dimension": dim, "value": rng.choice(DIMENSIONS[dim]),
+                "operator": rng.choice([">=", "<=", ">"]), "threshold": rng.choice([1, 2, 3, 5, 8])}
+        if ctype == "window_stat":
+            cond["window"] = rng.choice([10, 20])
+        if ctype == "streak":
+            cond["streak"] = rng.choice(["hit", "miss"])
+        conditions.append(cond)
+    mode = rng.choice(["fixed", "martingale", "loss_recovery"])
+    params = {"baseBet": rng.choice([5, 10]), "multipliers": [1, 2, 4], "maxBet": rng.choice([None, 200])}
+    return {"entry": {"conditions": conditions, "logicOperator": rng.choice(["AND", "OR"])},
+            "money": {"mode": mode, "params": params}}
+
+
+def test_batch_matches_single_backtests():
+    logging.disable(logging.CRITICAL)
+    rng = random.Random(5)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        write_history(path, 400, seed=6)
+        configs = [random_config(rng) for _ in range(40)]
+        configs += configs[:3]  # 重复的策略只模拟一次
+        configs.append({"entry": {"conditions": [{"type": "omission", "dimension": "nope", "value": "x",
+                                                  "operator": ">=", "threshold": 1}]}, "money": {}})
+
+        batch = BacktestSystem(path)
+        batch.run_backtest(configs[7])  # 已缓存的策略直接取缓存
+        summaries = batch.run_backtest_batch(configs)
+        single = BacktestSystem(path)
+        metrics = batch.run_backtest_batch(configs, metrics_only=True)
+        for config, summary, metric in zip(configs, summaries, metrics):
+            assert summary == single.run_backtest(config)
+            if "error" not in summary:
+                assert metric == single.evaluate(config)
+        # 结果进入模拟缓存
+        hits = batch.get_cache_stats()["hits"]
+        batch.run_backtest(configs[39])
+        assert batch.get_cache_stats()["hits"] == hits + 1
+
+
+if __name__ == "__main__":
+    test_batch_matches_single_backtests()
+    print("Verified!")
@@ -0,0 +1,43 @@
+import copy
+import os
+
+import pandas as pd
+
+from benchmark import CONFIGS, compare, run_benchmarks, synthetic_history
+from data_loader import COLOR_MAP, zodiac_years
+
+
+def test_synthetic_history_matches_feather_schema():
+    real = pd.read_feather(os.path.join(os.path.dirname(__file__), "..", "data", "history", "all.feather"))
+    df = synthetic_history(500, seed=1)
+    assert list(df.columns) == list(real.columns)
+    assert dict(df.dtypes) == dict(real.dtypes)
+    assert df["date"].is_monotonic_increasing and df["period"].iloc[0] == "001"
+    draws = df[[f"n{i}" for i in range(1, 7)] + ["special"]].to_numpy()
+    assert all(len(set(row)) == 7 for row in draws.tolist())
+    assert (df["special_color"] == df["special"].map(COLOR_MAP).map(["red", "blue", "green"].__getitem__)).all()
+    # 1M 期时每天多期，日期仍在 datetime64[ns] 的范围内
+    big = synthetic_history(1000000)
+    assert big["date"].iloc[0] >= "1900-01-01" and big["date"].iloc[-1] == "2025-12-31"
+    assert len(zodiac_years(big["date"].to_numpy(dtype="datetime64[ns]"))) == 1000000
+
+
+def test_run_and_compare():
+    result = run_benchmarks([400], repeat=1, log=lambda msg: None)
+    stages = [(r["stage"], r["config"]) for r in result["results"]]
+    assert ("load_data", None) in stages and ("replay_block", "window_martingale") in stages
+    assert {c for s, c in stages if s == "run_backtest"} == set(CONFIGS)
+
+    slower = copy.deepcopy(result)
+    for r in slower["results"]:
+        r["median"] = r["median"] * 2 + 0.01 if r["stage"] == "init_cold" else r["median"]
+    rows, regressions = compare(slower, result)
+    assert len(rows) == len(result["results"])
+    assert [(r["stage"], r["config"]) for r in regressions] == [("init_cold", None)]
+    assert compare(result, result)[1] == []
+
+
+if __name__ == "__main__":
+    test_synthetic_history_matches_feather_schema()
+    test_run_and_compare()
+    print("Verified!")
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from column_store import ColumnStore
+
+
+def test_from_frame_types_rows_and_period_lookup():
+    df = pd.DataFrame({
+        "period": ["001", "002", "001"],
+        "date": pd.to_datetime(["2024-01-02", "2024-01-04", "2025-01-02"]),
+        "special": np.array([7, 49, 1], dtype=np.int32),
+        "n1_zodiac": ["鼠", "牛", "虎"],
+    })
+    store = ColumnStore.from_frame(df)
+    assert len(store) == 3
+    assert store["period"].dtype.kind == "U" and store["n1_zodiac"].dtype.kind == "U"
+    assert store["date"].dtype == np.dtype("datetime64[ns]")
+    assert store["special"].dtype == np.int32
+
+    # 期号重复时取最后一期
+    assert store.index_of("001") == 2 and store.index_of("002") == 1 and store.index_of("999") is None
+    row = store.row(1)
+    assert row["special"] == 49 and row["n1_zodiac"] == "牛"
+    assert row.get("missing", 0) == 0
+    # 行视图读取的是列数组本身
+    store["special"][1] = 48
+    assert row["special"] == 48
+
+
+if __name__ == "__main__":
+    test_from_frame_types_rows_and_period_lookup()
+    print("Verified!")
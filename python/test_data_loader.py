@@ -0,0 +1,63 @@
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data_loader import ENGINE_COLUMNS, enrich_data, load_data, read_history, zodiac_years
+
+
+def test_zodiac_switches_at_lunar_new_year():
+    dates = pd.to_datetime(["2024-02-09", "2024-02-10", "2025-01-28", "2025-01-29", "1985-06-01"]).to_numpy()
+    # 春节前仍属上一生肖年；表外日期按公历年份
+    assert zodiac_years(dates).tolist() == [2023, 2024, 2024, 2025, 1985]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        n = 40
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            "period": [f"{i + 1:03d}" for i in range(n)],
+            "date": pd.date_range("2024-01-20", periods=n, freq="2D").strftime("%Y-%m-%d"),
+            "year": ["2024"] * n,
+        })
+        for i in range(1, 7):
+            df[f"n{i}"] = rng.integers(1, 50, n).astype(np.int32)
+        df["special"] = np.ones(n, dtype=np.int32)
+        df.to_feather(path)
+
+        out = load_data(path)
+        # 01 号：2024-02-10 之前为兔 (3)，之后为龙 (4)
+        before = out["date"] < "2024-02-10"
+        assert (out.loc[before, "sp_zodiac"] == 3).all() and (out.loc[~before, "sp_zodiac"] == 4).all()
+        for i in range(1, 7):
+            base = np.where(before, 3, 4)
+            assert np.array_equal(out[f"n{i}_zodiac_idx"], (base - (out[f"n{i}"] - 1)) % 12)
+
+
+def test_projected_read_matches_full_read():
+    path = os.path.join(os.path.dirname(__file__), "..", "data", "history", "all.feather")
+    raw = read_history(path)
+    assert list(raw.columns) == list(ENGINE_COLUMNS)
+    # Rust 导入器写出的文件未压缩：数值列是内存映射上的只读视图
+    assert not raw["special"].to_numpy().flags.writeable
+
+    new = load_data(path)
+    old = enrich_data(pd.read_feather(path))
+    assert "n1_zodiac" in old.columns and "n1_zodiac" not in new.columns
+    for col in new.columns:
+        assert new[col].dtype == old[col].dtype, col
+        assert np.array_equal(new[col].to_numpy(), old[col].to_numpy()), col
+
+    # 日期格式不标准时退回 pandas 解析
+    with tempfile.TemporaryDirectory() as tmp:
+        odd = os.path.join(tmp, "odd.feather")
+        pd.DataFrame({"period": ["001"], "date": ["2024/03/05"], "year": ["2024"], "special": [7]}).to_feather(odd)
+        out = load_data(odd)
+        assert out["date"].iloc[0] == pd.Timestamp("2024-03-05") and out["year"].iloc[0] == 2024
+
+
+if __name__ == "__main__":
+    test_zodiac_switches_at_lunar_new_year()
+    test_projected_read_matches_full_read()
+    print("Verified!")
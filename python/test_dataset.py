@@ -0,0 +1,140 @@
+import json
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from backtester import BacktestSystem
+from benchmark import synthetic_history
+from dataset import PARTITION_HASHES, count_history, load_range, year_partitions
+from stat_engine import window_counts
+from stats_cache import CACHE_DIR_NAME
+
+
+def write_partitions(tmp, n=3000):
+    # 与 Rust 导入器相同的按年份文件，外加全部历史的 all.feather
+    df = synthetic_history(n, seed=3)
+    for year, part in df.groupby("year"):
+        part.reset_index(drop=True).to_feather(os.path.join(tmp, f"{year}.feather"))
+    df.to_feather(os.path.join(tmp, "all.feather"))
+    return df
+
+
+def test_range_load_matches_full_load():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_partitions(tmp)
+        full = BacktestSystem(os.path.join(tmp, "all.feather"), use_cache=False)
+        years = [y for y, _ in year_partitions(tmp)]
+        assert len(years) >= 15
+
+        start, end = f"{years[12]}-03-01", f"{years[13]}-06-30"
+        part = BacktestSystem(os.path.join(tmp, "all.feather"), start_date=start, end_date=end)
+        assert part.source["partitions"] == [years[12], years[13]] and part.source["checkpoint_year"] == years[11]
+        a = int(np.searchsorted(full.store["date"], np.datetime64(start)))
+        b = a + part.n
+        assert part.store["date"][0] >= np.datetime64(start) > full.store["date"][a - 1]
+        assert part.store["date"][-1] <= np.datetime64(end) < full.store["date"][b]
+        assert np.array_equal(part.periods, full.periods[a:b])
+
+        for dim, matrix in full.omissions.items():
+            assert np.array_equal(part.omissions[dim], matrix[a:b]), dim
+        assert np.array_equal(part.streak_hits, full.streak_hits[a:b])
+        # 检查点保留范围之前的全部累计计数，比范围之前的期数还长的窗口也与全量加载相同
+        assert len(part.count_lead) == a > 1500
+        for j in range(full.count_matrix.shape[1]):
+            for window in (1, 30, 100, 1500, 2500):
+                assert np.array_equal(window_counts(part.count_matrix[:, j], window, lead=part.count_lead[:, j]),
+                                      window_counts(full.count_matrix[:, j], window)[a:b]), (j, window)
+
+        # 回放中的 100 期热度跨过区间起点 (期号每年重复，按下标取)
+        assert part._replay_block(0, 3) == full._replay_block(a, a + 3)
+
+        entry = {"conditions": [{"type": "window_stat", "dimension": "color", "value": "red", "window": 50,
+                                 "operator": ">=", "threshold": 17}]}
+        signal = part._entry_signal(entry)
+        assert signal[:50].any() and np.array_equal(signal, full._entry_signal(entry)[a:b])
+        cond = entry["conditions"][0]
+        cond["window"] = 1500
+        cond["threshold"] = int(np.median(full._resolve_stat_column(cond, 0)[1][a:b]))
+        signal = part._entry_signal(entry)
+        assert signal.any() and not signal.all() and np.array_equal(signal, full._entry_signal(entry)[a:b])
+
+
+def test_checkpoints_are_cached_per_partition():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        write_partitions(tmp)
+        parts = year_partitions(tmp)
+        last_year = parts[-1][0]
+        df, warm, _ = load_range(tmp, last_year, last_year)
+        cache = os.path.join(tmp, CACHE_DIR_NAME)
+        checkpoints = lambda: sorted(e for e in os.listdir(cache) if e.startswith("checkpoint-"))
+        entries = checkpoints()
+        assert len(entries) == len(parts) - 1 and sorted(os.listdir(cache)) == entries + [PARTITION_HASHES]
+
+        # 改写最后一年的文件不影响之前各年的检查点
+        df.iloc[:-1].to_feather(parts[-1][1])
+        _, warm_again, _ = load_range(tmp, last_year, last_year)
+        assert checkpoints() == entries
+        assert all(np.array_equal(warm[k], warm_again[k]) for k in warm if k != "count_blocks")
+        assert np.array_equal(count_history(warm), count_history(warm_again))
+
+        # 大小和修改时间没变的文件沿用记录的哈希，不重新读取：改掉记录后链式指纹随之改变
+        record_path = os.path.join(cache, PARTITION_HASHES)
+        with open(record_path) as f:
+            record = json.load(f)
+        first = os.path.basename(parts[0][1])
+        real_hash, record[first]["hash"] = record[first]["hash"], "0" * 32
+        with open(record_path, "w") as f:
+            json.dump(record, f)
+        load_range(tmp, last_year, last_year)
+        assert not set(checkpoints()) & set(entries)
+        # 修改时间变化后重新计算哈希，回到原来的检查点
+        st = os.stat(parts[0][1])
+        os.utime(parts[0][1], ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+        load_range(tmp, last_year, last_year)
+        with open(record_path) as f:
+            assert json.load(f)[first]["hash"] == real_hash
+        assert checkpoints() == entries
+
+
+def test_append_after_range_load():
+    # 区间加载后追加新开奖：窗口热度仍从范围之前的累计计数算起，与全量加载一致
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        df = write_partitions(tmp)
+        full = BacktestSystem(os.path.join(tmp, "all.feather"), use_cache=False)
+        years = [y for y, _ in year_partitions(tmp)]
+        last = df[df["year"] == str(years[-1])].reset_index(drop=True)
+        last.iloc[:-5].to_feather(os.path.join(tmp, f"{years[-1]}.feather"))
+
+        part = BacktestSystem(tmp, start_date=years[-3])
+        assert part.source["to_last"]
+        a = full.n - 5 - part.n
+        out = part.append_draws(last.iloc[-5:].to_dict("records"))
+        assert out["appended"] == 5 and part.n == full.n - a
+        assert len(part.count_lead) == a
+        cond = {"type": "window_stat", "dimension": "color", "value": "red", "window": 120,
+                "operator": ">=", "threshold": 40}
+        assert np.array_equal(part._resolve_stat_column(cond, 0)[1], full._resolve_stat_column(cond, 0)[1][a:])
+        entry = {"conditions": [cond]}
+        assert np.array_equal(part._entry_signal(entry), full._entry_signal(entry)[a:])
+
+        # 范围在最后一期之前结束时不能直接追加
+        early = BacktestSystem(tmp, start_date=years[-3], end_date=f"{years[-2]}-06-30")
+        assert not early.source["to_last"]
+        try:
+            early.append_draws(last.iloc[-5:].to_dict("records"))
+            assert False, "append after a range that ends early must fail"
+        except ValueError:
+            pass
+        assert early.n == early.store.n
+
+
+if __name__ == "__main__":
+    test_range_load_matches_full_load()
+    test_checkpoints_are_cached_per_partition()
+    test_append_after_range_load()
+    print("Verified!")
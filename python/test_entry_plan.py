@@ -0,0 +1,65 @@
+import numpy as np
+
+from entry_plan import compile_entry
+
+
+def make_plan(conditions, logic='AND'):
+    columns = {
+        'om_color_0': np.array([0, 3, 6, 9, 12], dtype=np.uint16),
+        'om_zodiac_4': np.array([5, 0, 1, 2, 3], dtype=np.uint16),
+    }
+
+    def resolve_target(dim, val):
+        return {'red': 0, '龙': 4}[val]
+
+    def resolve_column(cond, target_idx):
+        if cond['type'] != 'omission':
+            return None, None, None
+        name = f"om_{cond['dimension']}_{target_idx}"
+        return name, columns.get(name), ('omission', target_idx, 1)
+
+    return compile_entry({'conditions': conditions, 'logicOperator': logic}, 5, resolve_target, resolve_column)
+
+
+def test_plan_evaluates_whole_history_and_row_batches():
+    plan = make_plan([
+        {'type': 'omission', 'dimension': 'color', 'value': 'red', 'operator': '>=', 'threshold': '6'},
+        {'type': 'omission', 'dimension': 'zodiac', 'value': '龙', 'operator': '<', 'threshold': 3},
+    ])
+    assert plan.errors == []
+    assert plan.evaluate().tolist() == [False, False, True, True, False]
+    assert plan.evaluate(slice(2, 4)).tolist() == [True, True]
+    assert plan.evaluate(np.array([4, 0, 3])).tolist() == [False, False, True]
+
+    triggered, details = plan.explain(2)
+    assert triggered
+    assert details[0] == {"desc": "color omission", "actual": 6.0, "threshold": 6.0, "operator": ">=", "passed": True}
+    # 整段拆解与逐期拆解相同，触发与否与 evaluate 一致
+    block = plan.explain_block(slice(1, 5))
+    assert block == [plan.explain(i) for i in range(1, 5)]
+    assert [t for t, _ in block] == plan.evaluate(slice(1, 5)).tolist()
+
+
+def test_compile_errors_are_resolved_once():
+    plan = make_plan([
+        {'type': 'omission', 'dimension': 'color', 'value': 'purple', 'operator': '>=', 'threshold': 1},
+        {'type': 'omission', 'dimension': 'color', 'value': 'red', 'operator': '>=', 'threshold': None},
+        {'type': 'mystery', 'dimension': 'color', 'value': 'red', 'operator': '>=', 'threshold': 1},
+        {'type': 'omission', 'dimension': 'tail', 'value': 'red', 'operator': '>=', 'threshold': 1},
+        {'type': 'omission', 'dimension': 'color', 'value': 'red', 'operator': '>=', 'threshold': 1},
+    ], logic='OR')
+
+    assert plan.errors == [
+        "Map Error: color=purple", "Bad Threshold: None", "Unknown Type: mystery", "Missing Col: om_tail_0"
+    ]
+    # 出错的条件恒为 False，其余条件照常评估
+    assert plan.evaluate().tolist() == [False, True, True, True, True]
+    _, details = plan.explain(1)
+    assert details[3]["actual"] == "N/A" and not details[3]["passed"]
+    assert [t for t, _ in plan.explain_block(slice(0, 5))] == plan.evaluate().tolist()
+
+
+if __name__ == "__main__":
+    test_plan_evaluates_whole_history_and_row_batches()
+    test_compile_errors_are_resolved_once()
+    print("Verified!")
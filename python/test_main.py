@@ -0,0 +1,199 @@
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import main
+import simulator
+from backtester import BacktestSystem
+from profiling import METRICS, phase
+from test_stats_cache import CONFIG, write_history
+
+
+class ScriptedStdin:
+    # 按顺序给出命令行；某一行可以是函数，在读到它时才生成 (用来等待前面的响应)
+    def __init__(self, lines):
+        self.lines = list(lines)
+
+    def readline(self):
+        if not self.lines:
+            return ""
+        line = self.lines.pop(0)
+        return (line() if callable(line) else line) + "\n"
+
+
+class ResponseLog(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.answered = {}  # request_id -> threading.Event
+
+    def write(self, s):
+        for line in s.splitlines():
+            if line.strip():
+                self.event(json.loads(line)["request_id"]).set()
+        return super().write(s)
+
+    def event(self, req_id):
+        return self.answered.setdefault(req_id, threading.Event())
+
+    def responses(self):
+        return [json.loads(line) for line in self.getvalue().splitlines() if line.strip()]
+
+
+def test_out_of_order_responses_and_cancel():
+    stopped = threading.Event()
+
+    def handle_slow(params, cancel=None, progress=None):
+        # 模拟长时间的参数扫描：直到被取消
+        if cancel.wait(10):
+            stopped.set()
+        return {"status": "success", "data": "finished"}
+
+    out = ResponseLog()
+
+    def cancel_after_fast():
+        # 慢命令仍在执行时，快命令已经先返回
+        assert out.event("fast").wait(10)
+        return json.dumps({"cmd": "cancel", "params": {"request_id": "slow"}, "request_id": "c1"})
+
+    stdin = ScriptedStdin([
+        json.dumps({"cmd": "slow", "params": {}, "request_id": "slow"}),
+        json.dumps({"cmd": "get_cache_stats", "params": {}, "request_id": "fast"}),
+        "not json",
+        cancel_after_fast,
+        json.dumps({"cmd": "cancel", "params": {"request_id": "slow"}, "request_id": "c2"}),
+    ])
+
+    main.COMMANDS["slow"] = (handle_slow, "data")
+    main.LONG_RUNNING.add("slow")
+    try:
+        with contextlib.redirect_stdout(out):
+            asyncio.run(main.CommandServer(workers=2).serve(stdin))
+    finally:
+        del main.COMMANDS["slow"]
+        main.LONG_RUNNING.discard("slow")
+
+    assert stopped.is_set()
+    by_id = {}
+    for resp in out.responses():
+        assert resp["request_id"] not in by_id  # 每个请求只回复一次
+        by_id[resp["request_id"]] = resp
+    assert [r["request_id"] for r in out.responses()].index("fast") == 0
+    assert by_id["fast"]["status"] == "error" and by_id["fast"]["message"] == "Data not loaded"
+    assert by_id["slow"]["status"] == "error" and by_id["slow"]["message"] == "cancelled"
+    assert by_id["c1"]["data"] == {"cancelled": True}
+    assert by_id["c2"]["data"] == {"cancelled": False}
+
+
+def test_progress_messages_are_throttled_and_precede_the_result():
+    def handle_steps(params, cancel=None, progress=None):
+        for i in range(101):
+            progress(i, 100, lambda: {"period": f"{i:03d}"})
+        return {"status": "success", "data": "done"}
+
+    out = ResponseLog()
+    stdin = ScriptedStdin([json.dumps({"cmd": "steps", "params": {}, "request_id": "job"})])
+    main.COMMANDS["steps"] = (handle_steps, "data")
+    main.LONG_RUNNING.add("steps")
+    try:
+        with contextlib.redirect_stdout(out):
+            asyncio.run(main.CommandServer(workers=1).serve(stdin))
+    finally:
+        del main.COMMANDS["steps"]
+        main.LONG_RUNNING.discard("steps")
+
+    responses = out.responses()
+    assert all(r["request_id"] == "job" for r in responses)
+    progress = [r["data"] for r in responses if r["status"] == "progress"]
+    # 第一条立即发送，其余在间隔内被丢弃，100% 总是发送
+    assert progress[0] == {"percent": 0.0, "done": 0, "total": 100, "period": "000"}
+    assert progress[-1] == {"percent": 100.0, "done": 100, "total": 100, "period": "100"}
+    assert len(progress) < 10
+    assert responses[-1]["status"] == "ok" and responses[-1]["data"] == "done"
+
+
+def test_request_metrics_and_profile():
+    def handle_work(params):
+        with phase("simulate"):
+            total = sum(range(10000))
+        return {"status": "success", "data": total}
+
+    out = ResponseLog()
+
+    def metrics_after_work():
+        assert out.event("w2").wait(10)
+        return json.dumps({"cmd": "get_metrics", "params": {"cmd": "work", "limit": 1}, "request_id": "m"})
+
+    stdin = ScriptedStdin([
+        json.dumps({"cmd": "work", "params": {}, "request_id": "w1"}),
+        json.dumps({"cmd": "work", "params": {"profile": "cprofile"}, "request_id": "w2"}),
+        metrics_after_work,
+    ])
+    METRICS.clear()
+    main.COMMANDS["work"] = (handle_work, "data")
+    try:
+        with contextlib.redirect_stdout(out):
+            asyncio.run(main.CommandServer(workers=2).serve(stdin))
+    finally:
+        del main.COMMANDS["work"]
+        METRICS.clear()
+
+    by_id = {r["request_id"]: r for r in out.responses()}
+    assert "profile" not in by_id["w1"]
+    assert by_id["w2"]["profile"]["format"] == "cprofile" and "handle_work" in by_id["w2"]["profile"]["text"]
+
+    metrics = by_id["m"]["data"]
+    assert list(metrics["commands"]) == ["work"]
+    work = metrics["commands"]["work"]
+    assert work["count"] == 2 and work["errors"] == 0
+    assert {"queue", "handler", "encode", "simulate", "serialize", "write"} <= set(work["phases_mean"])
+    assert work["phases_mean"]["simulate"]["wall"] <= work["phases_mean"]["handler"]["wall"]
+    assert work["wall_p50"] <= work["wall_p95"] <= work["wall_max"]
+    [last] = metrics["recent"]
+    assert last["request_id"] == "w2" and last["status"] == "ok"
+    assert last["sizes"]["request"] == len(json.dumps({"cmd": "work", "params": {"profile": "cprofile"},
+                                                       "request_id": "w2"}))
+    assert last["sizes"]["response"] == len(json.dumps(by_id["w2"]))
+
+
+def test_backtest_stops_between_kernel_chunks_when_cancelled():
+    # 回测在模拟内核的块之间检查 cancel：取消后不写入缓存，之后的同一回测重新计算
+    if not simulator.HAS_NUMBA:
+        return
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        write_history(path, 600, seed=5)
+        main.backtest_system = system = BacktestSystem(path, use_cache=False)
+        cancel = threading.Event()
+        seen = []
+
+        def progress(done, total, detail=None):
+            seen.append(done)
+            cancel.set()
+
+        chunk = simulator.PROGRESS_CHUNK
+        simulator.PROGRESS_CHUNK = 97
+        try:
+            res = main.handle_run_backtest(dict(CONFIG), cancel, progress)
+            assert res == {"status": "error", "message": "cancelled"}
+            assert seen == [98] and len(system.sim_cache) == 0
+            bounded = main.handle_run_backtest(dict(CONFIG, start_period="050"), cancel, progress)
+            assert bounded == res and len(system.sim_cache) == 0
+            done = main.handle_run_backtest(dict(CONFIG), threading.Event(), None)
+            assert done["status"] == "success" and done["result"] == system.run_backtest(CONFIG)
+        finally:
+            simulator.PROGRESS_CHUNK = chunk
+            main.backtest_system = None
+
+
+if __name__ == "__main__":
+    test_out_of_order_responses_and_cancel()
+    test_progress_messages_are_throttled_and_precede_the_result()
+    test_request_metrics_and_profile()
+    test_backtest_stops_between_kernel_chunks_when_cancelled()
+    print("Verified!")
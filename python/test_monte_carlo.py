@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+import monte_carlo
+from backtester import BacktestSystem
+from monte_carlo import build_spec, run_monte_carlo, _simulate_paths, fair_draw_tables, BLOCK_PERIODS
+from simulator import HAS_NUMBA
+from stat_engine import calc_cumulative_counts, calc_omission_matrices, calc_streaks
+
+CONFIG = {
+    "entry": {
+        "conditions": [
+            {"type": "omission", "dimension": "color", "value": "red", "operator": ">=", "threshold": 2},
+            {"type": "window_stat", "dimension": "color", "value": "blue", "operator": "<=", "threshold": 8, "window": 20},
+        ],
+        "logicOperator": "AND"
+    },
+    "money": {"mode": "martingale", "params": {"baseBet": 10, "multipliers": [1, 2, 4, 8]}}
+}
+
+
+def make_system(colors):
+    # 只含特码波色的回测系统，统计值由 stat_engine 计算
+    df = pd.DataFrame({"sp_color": np.asarray(colors)})
+    count_index, counts = calc_cumulative_counts(df)
+    streak_index, hits = calc_streaks(df)
+    return BacktestSystem.from_arrays(
+        {"col:sp_color": df["sp_color"].to_numpy(), "om:color": calc_omission_matrices(df)["color"],
+         "count_matrix": counts, "streak_hits": hits},
+        {"n": len(df), "count_index": count_index, "streak_index": streak_index}
+    )
+
+
+def test_paths_match_historical_backtest():
+    # 每条模拟路径都应与把该路径当作历史数据回测的结果一致
+    system = make_system(np.zeros(10, dtype=np.uint8))
+    spec = build_spec(system, CONFIG, model='fair', periods=300, initial_capital=1e6, year=2024)
+    capital, _, _, ruin_at, trades = _simulate_paths(spec, 20, np.random.SeedSequence(3))
+    assert (ruin_at < 0).all()
+
+    rng = np.random.default_rng(np.random.SeedSequence(3))
+    rows = np.concatenate([rng.integers(0, 49, (min(BLOCK_PERIODS, 300 - t0), 20)) for t0 in range(0, 300, BLOCK_PERIODS)])
+    colors = fair_draw_tables(2024)['color'][rows]
+    for p in range(20):
+        replay = make_system(colors[:, p])
+        summary = replay.evaluate(CONFIG)
+        assert summary["total_trades"] == trades[p]
+        assert abs(summary["final_capital"] - (capital[p] - 1e6 + 10000)) < 1e-6
+
+
+def test_numpy_kernel_matches_jit():
+    if not HAS_NUMBA:
+        return
+    system = make_system(np.zeros(10, dtype=np.uint8))
+    for initial_capital in (150, 1e6):
+        spec = build_spec(system, CONFIG, model='fair', periods=400, initial_capital=initial_capital, year=2024)
+        a = _simulate_paths(spec, 500, np.random.SeedSequence(9), use_jit=False)
+        b = _simulate_paths(spec, 500, np.random.SeedSequence(9), use_jit=True)
+        for x, y in zip(a, b):
+            assert np.array_equal(x, y)
+
+
+def test_streak_conditions_match_historical_backtest():
+    # 连中 / 连挂条件在模拟路径上的结果与历史回测一致
+    config = {
+        "entry": {
+            "conditions": [
+                {"type": "streak", "streak": "hit", "dimension": "color", "value": "red", "operator": ">=", "threshold": 2},
+                {"type": "streak", "streak": "miss", "dimension": "color", "value": "blue", "operator": ">=", "threshold": 4},
+            ],
+            "logicOperator": "OR"
+        },
+        "money": {"mode": "fixed", "params": {"baseBet": 10}}
+    }
+    system = make_system(np.zeros(10, dtype=np.uint8))
+    spec = build_spec(system, config, model='fair', periods=200, initial_capital=1e6, year=2024)
+    assert list(spec["stat_kind"]) == [monte_carlo.STAT_STREAK_HIT, monte_carlo.STAT_OMISSION]
+    capital, _, _, _, trades = _simulate_paths(spec, 10, np.random.SeedSequence(5), use_jit=False)
+
+    rng = np.random.default_rng(np.random.SeedSequence(5))
+    rows = np.concatenate([rng.integers(0, 49, (min(BLOCK_PERIODS, 200 - t0), 10)) for t0 in range(0, 200, BLOCK_PERIODS)])
+    colors = fair_draw_tables(2024)['color'][rows]
+    for p in range(10):
+        summary = make_system(colors[:, p]).evaluate(config)
+        assert summary["total_trades"] == trades[p]
+        assert abs(summary["final_capital"] - (capital[p] - 1e6 + 10000)) < 1e-6
+    if HAS_NUMBA:
+        jit = _simulate_paths(spec, 10, np.random.SeedSequence(5), use_jit=True)
+        assert np.array_equal(jit[0], capital) and np.array_equal(jit[4], trades)
+
+
+def test_spec_reads_stats_from_compiled_conditions():
+    # 统计量、类别和窗口取自编译结果，与调试用的列名无关
+    system = make_system(np.zeros(10, dtype=np.uint8))
+    plan = system._compile_entry(CONFIG["entry"])
+    assert [c.stat for c in plan.conditions] == [('omission', 0, 1), ('freq', 1, 20)]
+    for c in plan.conditions:
+        c.column = "renamed"
+    spec = build_spec(system, CONFIG, model='fair', periods=10, initial_capital=1e6, year=2024)
+    assert list(spec["stat_kind"]) == [monte_carlo.STAT_OMISSION, monte_carlo.STAT_FREQ]
+    assert list(spec["stat_window"]) == [1, 20]
+    assert list(spec["stat_pair"]) == [0, 1]
+
+
+def test_ruin_probability_and_worker_independence():
+    system = make_system(np.random.default_rng(0).integers(0, 3, 500).astype(np.uint8))
+    spec = build_spec(system, CONFIG, model='bootstrap', periods=500, initial_capital=200)
+
+    chunk = monte_carlo.CHUNK_PATHS
+    monte_carlo.CHUNK_PATHS = 1000
+    try:
+        single = run_monte_carlo(spec, paths=3000, seed=11, workers=1)
+        pooled = run_monte_carlo(spec, paths=3000, seed=11, workers=2)
+    finally:
+        monte_carlo.CHUNK_PATHS = chunk
+
+    assert single["ruin_probability"] == pooled["ruin_probability"]
+    assert single["final_capital"] == pooled["final_capital"]
+    assert 0 < single["ruin_probability"] < 1
+    alive = single["survival"]["alive"]
+    assert alive == sorted(alive, reverse=True)
+    assert abs(alive[-1] - (1 - single["ruin_probability"])) < 1e-9
+    assert 0 < single["max_drawdown_pct"]["max"] <= 1
+
+
+if __name__ == "__main__":
+    test_paths_match_historical_backtest()
+    test_numpy_kernel_matches_jit()
+    test_streak_conditions_match_historical_backtest()
+    test_spec_reads_stats_from_compiled_conditions()
+    test_ruin_probability_and_worker_independence()
+    print("Verified!")
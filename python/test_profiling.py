@@ -0,0 +1,54 @@
+import time
+
+from profiling import MetricsRegistry, RequestTrace, phase, profiled, traced
+
+
+def test_phases_are_recorded_only_inside_a_traced_request():
+    with phase("simulate"):
+        pass  # 没有被跟踪的请求时什么也不做
+
+    trace = RequestTrace("run_backtest", "r1", 120)
+    with traced(trace):
+        for _ in range(2):
+            with phase("simulate"):
+                time.sleep(0.01)
+    with phase("simulate"):
+        pass
+    wall, cpu = trace.phases["simulate"]
+    assert 0.02 <= wall < 1 and cpu < wall  # 两次累加；sleep 不占 CPU
+
+
+def test_registry_snapshot():
+    registry = MetricsRegistry(size=4)
+    for i in range(6):
+        trace = RequestTrace("run_backtest" if i % 3 else "load_data", f"r{i}")
+        trace.add("handler", 0.1 * i, 0.05 * i)
+        trace.sizes["response"] = 100 * i
+        trace.status = "error" if i == 5 else "ok"
+        registry.record(trace)
+
+    snapshot = registry.snapshot(limit=3)
+    assert [t["request_id"] for t in snapshot["recent"]] == ["r3", "r4", "r5"]
+    backtest = snapshot["commands"]["run_backtest"]
+    assert backtest["count"] == 4 and backtest["errors"] == 1
+    assert backtest["response_bytes_mean"] == (100 + 200 + 400 + 500) / 4
+    assert abs(backtest["phases_mean"]["handler"]["wall"] - (0.1 + 0.2 + 0.4 + 0.5) / 4) < 1e-6
+    assert backtest["wall_p50"] <= backtest["wall_p95"] <= backtest["wall_max"]
+    assert list(registry.snapshot(cmd="load_data")["commands"]) == ["load_data"]
+    assert registry.snapshot(limit=0)["recent"] == []
+
+    registry.clear()
+    assert registry.snapshot()["commands"] == {}
+
+
+def test_profiled_cprofile_report():
+    with profiled("cprofile") as report:
+        sorted(range(1000), key=lambda x: -x)
+    assert report["format"] == "cprofile" and "function calls" in report["text"]
+
+
+if __name__ == "__main__":
+    test_phases_are_recorded_only_inside_a_traced_request()
+    test_registry_snapshot()
+    test_profiled_cprofile_report()
+    print("Verified!")
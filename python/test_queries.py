@@ -0,0 +1,173 @@
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from backtester import BacktestSystem
+from benchmark import synthetic_history
+from simulator import ENTRY_LEAD, simulate
+from test_stats_cache import CONFIG, write_history
+
+
+def test_range_queries_slice_the_full_results():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        write_history(path, 300, seed=4)
+        system = BacktestSystem(path)
+        dates = np.datetime_as_string(system.store['date'], unit='D').tolist()
+
+        # 日期范围 + 分页
+        page = system.query_periods(dates[20], dates[119], offset=30, limit=50)
+        assert page["total"] == 100 and page["start_index"] == 50 and page["next_offset"] == 80
+        assert page["periods"].tolist() == system.periods[50:100].tolist()
+        assert page["dates"].tolist() == dates[50:100]
+        last = system.query_periods(dates[20], dates[119], offset=80, limit=50)
+        assert len(last["periods"]) == 20 and last["next_offset"] is None
+        assert "periods" not in system.get_data_stats(include_periods=False)
+
+        # 交易记录不再截断为最后 50 笔
+        summary = system.run_backtest(CONFIG)
+        trades = system.query_trades(CONFIG)
+        assert trades["total"] == summary["total_trades"] > 50
+        assert trades["trades"][-50:] == summary["trades"]
+        assert system.query_trades(CONFIG, 10, 20)["trades"] == trades["trades"][10:20]
+        assert system.query_trades(CONFIG, -5)["trades"] == trades["trades"][-5:]
+        log = system.query_trades(CONFIG, 10, 20, columns=True)["trade_log"]
+        assert log["period"].tolist() == [t["period"] for t in trades["trades"][10:20]]
+        assert log["amount"].tolist() == [t["amount"] for t in trades["trades"][10:20]]
+
+        # 资金曲线：抽样点数受 points 限制，且包含范围内的最后一期
+        curve = system.query_equity_curve(CONFIG, points=1000)
+        assert curve["step"] == 1 and len(curve["curve"]) == 300
+        coarse = system.query_equity_curve(CONFIG, dates[100], dates[199], points=10)
+        assert coarse["step"] == 10 and len(coarse["curve"]) == 11
+        assert coarse["curve"][-1] == curve["curve"][199]
+
+        # 回放只带当前期及之前结算的交易
+        period = system.periods[150]
+        orders = system.get_replay_state(period, CONFIG, orders_limit=1000)["history_orders"]
+        settled = [t for t in trades["trades"] if dates[system.periods.tolist().index(t["period"])] <= dates[150]]
+        assert orders == settled
+
+
+def test_replay_block_matches_single_period_states():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        write_history(path, 260, seed=9)
+        system = BacktestSystem(path)
+    config = {
+        "entry": {"conditions": [
+            {"type": "omission", "dimension": "color", "value": "red", "operator": ">=", "threshold": 2},
+            {"type": "window_stat", "dimension": "parity", "value": "odd", "window": 20, "operator": "<=",
+             "threshold": 9},
+            {"type": "omission", "dimension": "nope", "value": "x", "operator": ">=", "threshold": 1},
+        ], "logicOperator": "OR"},
+        "money": {"mode": "martingale", "params": {"baseBet": 10, "multipliers": [1, 2, 4]}}
+    }
+
+    for cfg in (config, None):
+        block = system.get_replay_states(system.periods[0], 1000, cfg, orders_limit=20)
+        assert len(block["states"]) == 260 and block["next_period"] is None
+        assert block["history_orders"] == system.get_replay_state(system.periods[0], cfg, 20)["history_orders"]
+        for i in (0, 1, 2, 57, 199, 258, 259):
+            single = system.get_replay_state(system.periods[i], cfg)
+            del single["history_orders"]
+            assert block["states"][i] == single, i
+
+    block = system.get_replay_states(system.periods[100], 50, config)
+    assert [s["period"] for s in block["states"]] == system.periods[100:150].tolist()
+    assert block["next_period"] == system.periods[150]
+    state = block["states"][30]
+    assert state["stats"]["freq_100"]["color_0"] == int((system.columns["sp_color"][31:131] == 0).sum())
+    assert state["signal_evaluation"]["conditions"][2]["passed"] is False
+    assert block["start_index"] == 100 and block["next_index"] == 150
+
+
+def test_replay_states_by_row_index_with_repeated_periods():
+    # 期号每年重复：按下标取的整块状态与逐期按下标取的状态相同，而不是同一期号在其它年份的状态
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "all.feather")
+        synthetic_history(800, seed=6).to_feather(path)
+        system = BacktestSystem(path)
+    first_year = system.periods[:200].tolist()
+    start = first_year.index("100")
+    assert system.store.index_of("100") != start  # 该期号在之后的年份再次出现
+
+    block = system.get_replay_states(count=300, strategy_config=CONFIG, start_index=start)
+    assert block["start_index"] == start and block["next_index"] == start + 300
+    assert [s["period"] for s in block["states"]] == system.periods[start:start + 300].tolist()
+    for i in (0, 1, 150, 299):
+        single = system.get_replay_state(None, CONFIG, index=start + i)
+        del single["history_orders"]
+        assert block["states"][i] == single, i
+    dates = np.datetime_as_string(system.store["date"], unit="D")
+    assert system.get_replay_state(None, index=start)["result"]["date"] == dates[start]
+    assert system.get_replay_state("100")["result"]["date"] == dates[system.store.index_of("100")] != dates[start]
+    try:
+        system.get_replay_state(None, index=system.n)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_backtest_range_slices_the_full_history():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "all.feather")
+        synthetic_history(800, seed=6).to_feather(path)
+        system = BacktestSystem(path)
+    dates = np.datetime_as_string(system.store['date'], unit='D').tolist()
+    years = np.array([d[:4] for d in dates])
+    year = years[400]
+    lo, hi = int(np.argmax(years == year)), int(len(years) - np.argmax(years[::-1] == year))
+
+    # 期号每年重复：起止期号在日期范围内匹配
+    summary = system.run_backtest(CONFIG, start_date=f"{year}-01-01", end_date=f"{year}-12-31", end_period="100")
+    end = lo + system.periods[lo:hi].tolist().index("100") + 1
+    assert summary["range"]["start_index"] == lo and summary["range"]["end_index"] == end - 1
+    assert summary["range"]["start_period"] == "001" and summary["range"]["start_date"] == dates[lo]
+
+    # 与对全历史信号 / 命中向量切片后直接模拟的结果相同 (从前两期开始，区间第一期即可下注)
+    target, odds = system._target_and_odds(CONFIG)
+    signal = system._entry_signal(CONFIG["entry"])[lo - ENTRY_LEAD:end]
+    hit = system._hit_vector(*target)[lo - ENTRY_LEAD:end]
+    result = simulate(signal, hit, odds=odds, **system._money_kwargs(CONFIG))
+    assert summary["final_capital"] == round(float(result.capital[-1]), 2)
+    assert summary["total_trades"] == int(result.trade_count[-1]) > 0
+    assert {t["period"] for t in summary["trades"]} <= set(system.periods[lo:end].tolist())
+    # 遗漏值来自全历史 (单独加载该年份文件时第一期的遗漏值最多为 1)
+    assert system.omissions["zodiac"][lo].max() > 1
+
+    # 入场条件恒成立时，区间第一期就下注 (前一期收盘后的信号)
+    always = {"entry": {"conditions": [{"type": "omission", "dimension": "zodiac", "value": "龙",
+                                        "operator": ">=", "threshold": 0}]},
+              "money": {"mode": "fixed", "params": {"baseBet": 10}}}
+    one = system.run_backtest(always, start_date=dates[lo], end_date=dates[lo])
+    assert one["total_trades"] == 1 and [t["period"] for t in one["trades"]] == [system.periods[lo]]
+    week = system.run_backtest(always, start_date=dates[lo], end_date=dates[lo + 3])
+    assert week["total_trades"] == 4 and [t["period"] for t in week["trades"]] == system.periods[lo:lo + 4].tolist()
+
+    # 相同区间再次回测命中模拟缓存
+    hits = system.sim_cache.hits
+    assert system.run_backtest(CONFIG, start_period="001", end_period="100", start_date=dates[lo],
+                               end_date=dates[end - 1]) == summary
+    assert system.sim_cache.hits == hits + 1
+    # 覆盖全部历史的区间就是普通回测
+    assert system.run_backtest(CONFIG, start_date=dates[0]) == system.run_backtest(CONFIG)
+    try:
+        system.run_backtest(CONFIG, start_date=f"{year}-01-01", start_period="999")
+        assert False
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_range_queries_slice_the_full_results()
+    test_replay_block_matches_single_period_states()
+    test_replay_states_by_row_index_with_repeated_periods()
+    test_backtest_range_slices_the_full_history()
+    print("Verified!")
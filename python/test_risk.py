@@ -0,0 +1,86 @@
+import logging
+import os
+import tempfile
+
+import numpy as np
+
+from backtester import BacktestSystem
+from risk import first_bust, longest_runs, max_drawdown
+from test_stats_cache import write_history
+
+
+def test_helpers_match_plain_loops():
+    rng = np.random.default_rng(4)
+    for _ in range(50):
+        n = int(rng.integers(0, 60))
+        capital = 100 + np.cumsum(rng.normal(0, 20, n))
+        flags = rng.random(n) < 0.6
+
+        peak, worst, worst_pct = 100.0, 0.0, 0.0
+        for c in capital:
+            peak = max(peak, c)
+            worst, worst_pct = max(worst, peak - c), max(worst_pct, (peak - c) / peak)
+        assert max_drawdown(capital, 100.0) == (worst, worst_pct)
+
+        runs = {True: 0, False: 0}
+        length = 0
+        for i, f in enumerate(flags):
+            length = length + 1 if i and flags[i - 1] == f else 1
+            runs[bool(f)] = max(runs[bool(f)], length)
+        assert longest_runs(flags) == (runs[True], runs[False])
+
+    has_next = np.array([False, True, True, True])
+    assert first_bust(np.array([5.0, 5.0, 5.0, 1.0]), np.array([0.0, 4.0, 8.0, 2.0]), has_next) == 2
+    assert first_bust(np.array([5.0, 5.0]), np.array([9.0, 1.0]), np.array([False, True])) is None
+
+
+def test_summary_risk_metrics_and_trade_log():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        write_history(path, 500, seed=8)
+        system = BacktestSystem(path)
+    config = {
+        "entry": {"conditions": [{"type": "omission", "dimension": "color", "value": "red", "operator": ">=",
+                                  "threshold": 2}]},
+        "money": {"mode": "martingale", "params": {"baseBet": 100, "multipliers": [1, 2, 4, 8, 16, 32]}}
+    }
+    summary = system.run_backtest(config)
+
+    log = {k: v.tolist() for k, v in system.query_trades(config, columns=True)["trade_log"].items()}
+    assert "trade_log" not in summary  # 完整交易记录留在结果数组中，由 query_trades 取回
+    assert len(log["period"]) == summary["total_trades"] > 50
+    assert summary["trades"][-1] == {"period": log["period"][-1], "is_hit": log["is_hit"][-1],
+                                     "profit": round(log["profit"][-1], 2), "amount": log["amount"][-1]}
+    capital = 10000.0 + np.cumsum(log["profit"])
+    assert np.allclose(log["capital"], capital)
+    assert round(capital[-1], 2) == summary["final_capital"]
+
+    # 逐笔交易循环的参照结果
+    peak, max_dd, streak, max_losses = 10000.0, 0.0, 0, 0
+    for c, hit in zip(log["capital"], log["is_hit"]):
+        peak = max(peak, c)
+        max_dd = max(max_dd, peak - c)
+        streak = 0 if hit else streak + 1
+        max_losses = max(max_losses, streak)
+    assert summary["max_drawdown"] == round(max_dd, 2)
+    assert summary["max_losing_streak"] == max_losses
+    assert summary["ev_per_bet"] == round(sum(log["profit"]) / len(log["profit"]), 2)
+    assert summary["roi"] == round(sum(log["profit"]) / sum(log["amount"]), 4)
+    assert sum(summary["profit_distribution"]["histogram"]["counts"]) == summary["total_trades"]
+    assert not summary["busted"] and summary["bust_period"] is None
+
+    # 底注 2000 的倍投在 10000 本金下很快不够支付下一注
+    config["money"]["params"]["baseBet"] = 2000
+    summary = system.run_backtest(config)
+    assert summary["busted"]
+    result = system.cached_result
+    i = system.store.index_of(summary["bust_period"])
+    assert result.has_next[i] and result.next_amount[i] > result.capital[i]
+    assert not (result.has_next[:i] & (result.next_amount[:i] > result.capital[:i])).any()
+
+
+if __name__ == "__main__":
+    test_helpers_match_plain_loops()
+    test_summary_risk_metrics_and_trade_log()
+    print("Verified!")
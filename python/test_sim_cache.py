@@ -0,0 +1,44 @@
+from sim_cache import SimulationCache, config_key
+
+
+def test_config_key_ignores_ui_fields():
+    base = {
+        'entry': {'id': 'a1', 'name': '红波遗漏', 'logicOperator': 'AND',
+                  'conditions': [{'id': 'c1', 'type': 'omission', 'dimension': 'color', 'value': 'red',
+                                  'operator': '>=', 'threshold': 5}]},
+        'money': {'id': 'm1', 'mode': 'martingale', 'params': {'baseBet': 10, 'multipliers': [1, 2, 4]},
+                  'createTime': 1, 'updateTime': 2},
+    }
+    renamed = {
+        'money': {'params': {'multipliers': [1, 2, 4], 'baseBet': 10}, 'mode': 'martingale',
+                  'id': 'm2', 'updateTime': 99},
+        'entry': {'conditions': [{'threshold': 5, 'operator': '>=', 'value': 'red', 'dimension': 'color',
+                                  'type': 'omission', 'id': 'c9'}], 'logicOperator': 'AND', 'name': 'copy'},
+    }
+    changed = {**base, 'money': {**base['money'], 'params': {'baseBet': 20, 'multipliers': [1, 2, 4]}}}
+
+    assert config_key(base) == config_key(renamed)
+    assert config_key(base) != config_key(changed)
+
+
+def test_lru_eviction_and_memory_budget():
+    cache = SimulationCache(max_entries=2, max_bytes=100)
+    cache.put('a', 1, 10)
+    cache.put('b', 2, 10)
+    assert cache.get('a') == 1       # a 变为最近使用
+    cache.put('c', 3, 10)            # 条目数超限 -> 淘汰 b
+    assert 'b' not in cache and 'a' in cache and 'c' in cache
+
+    cache.put('d', 4, 95)            # 内存超限 -> 依次淘汰 a, c
+    assert len(cache) == 1 and cache.get('d') == 4
+    assert cache.get('b') is None
+
+    stats = cache.stats()
+    assert stats['hits'] == 2 and stats['misses'] == 1 and stats['evictions'] == 3
+    assert stats['bytes'] == 95
+
+
+if __name__ == "__main__":
+    test_config_key_ignores_ui_fields()
+    test_lru_eviction_and_memory_budget()
+    print("Verified!")
@@ -0,0 +1,166 @@
+import numpy as np
+
+import simulator
+from simulator import (
+    simulate, simulate_batch_totals, extend_simulation, SimulationResult, _bet_ladder, _simulate_periods, _simulate_episodes,
+    MODE_FIXED, MODE_MARTINGALE, MODE_LOSS_RECOVERY
+)
+
+
+def run_kernels(signal, hit, mode, base_bet, multipliers, odds, target_profit, max_bet):
+    bounds = np.concatenate(([0], np.flatnonzero(hit), [len(hit)]))
+    ladder, limit = _bet_ladder(mode, base_bet, multipliers, odds, target_profit, max_bet,
+                                int(np.diff(bounds).max()) + 1)
+    track_step = mode == MODE_MARTINGALE
+
+    # 逐期循环版本 (numba 路径所用的同一函数，这里以纯 Python 执行)
+    a = SimulationResult(len(signal), 10000.0)
+    a.max_single_bet, a.max_streak_cost, *a_state = _simulate_periods(
+        signal, hit, ladder, -1 if limit is None else limit, odds, track_step,
+        a.placed, a.won, a.stake, a.pnl, a.next_amount, a.has_next, a.step
+    )
+    b = SimulationResult(len(signal), 10000.0)
+    b.max_single_bet, b.max_streak_cost, *b_state = _simulate_episodes(signal, hit, ladder, limit, odds, track_step, b)
+    assert a_state[:2] == b_state[:2] and abs(a_state[2] - b_state[2]) < 1e-6
+    return a.finalize(), b.finalize()
+
+
+def test_martingale_steps_and_stop_loss():
+    # 第 1 期收盘入场，第 2/3/4 期连输 -> 达到最大层级止损；第 5 期再次入场，第 6 期命中
+    signal = np.array([0, 1, 0, 0, 0, 1, 0, 0], dtype=bool)
+    hit = np.array([0, 0, 0, 0, 0, 0, 1, 0], dtype=bool)
+    res = simulate(signal, hit, mode=MODE_MARTINGALE, base_bet=10, multipliers=[1, 2, 4], odds=2.0)
+
+    assert res.stake.tolist() == [0, 0, 10, 20, 40, 0, 10, 0]
+    assert res.step[1:5].tolist() == [0, 1, 2, 0]
+    assert not res.has_next[4]
+    assert res.won.tolist() == [False] * 6 + [True, False]
+    assert res.capital[-1] == 10000 - 70 + 10
+    assert res.max_single_bet == 40
+    # 止损后连输成本不清零，直到下一次命中
+    assert res.max_streak_cost == 80
+
+
+def test_loss_recovery_respects_max_bet():
+    signal = np.array([0, 1, 0, 0, 0, 0], dtype=bool)
+    hit = np.zeros(6, dtype=bool)
+    res = simulate(signal, hit, mode=MODE_LOSS_RECOVERY, base_bet=10, odds=1.98, target_profit=10, max_bet=50)
+
+    # 10 -> (10 + 10) / 0.98 = 20.41 -> (30.41 + 10) / 0.98 = 41.23 -> 83.3 > 50 止损
+    assert res.stake[2:5].tolist() == [10, 20.41, 41.23]
+    assert not res.placed[5]
+
+
+def test_fixed_chases_until_hit():
+    signal = np.array([0, 1, 1, 1, 1, 1], dtype=bool)
+    hit = np.array([0, 0, 0, 0, 1, 0], dtype=bool)
+    res = simulate(signal, hit, mode=MODE_FIXED, base_bet=5, odds=3.0)
+
+    assert res.stake.tolist() == [0, 0, 5, 5, 5, 5]
+    assert res.pnl.tolist() == [0, 0, -5, -5, 10, -5]
+    # 数据结束时仍持有注单
+    assert res.has_next[-1] and res.next_amount[-1] == 5
+
+
+def test_episode_kernel_matches_period_loop():
+    rng = np.random.default_rng(42)
+    cases = [
+        (MODE_FIXED, 10.0, [], 11.0, 10.0, np.inf),
+        (MODE_MARTINGALE, 10.0, [1, 2, 4, 8], 2.8, 10.0, np.inf),
+        (MODE_MARTINGALE, 5.0, [], 1.9, 5.0, np.inf),
+        (MODE_LOSS_RECOVERY, 10.0, [], 1.9, 10.0, 500.0),
+        (MODE_LOSS_RECOVERY, 2.5, [], 11.0, 2.5, np.inf),
+    ]
+    for p_signal, p_hit in [(0.3, 0.5), (0.9, 1 / 12), (0.05, 1 / 3)]:
+        signal = rng.random(2000) < p_signal
+        hit = rng.random(2000) < p_hit
+        for args in cases:
+            a, b = run_kernels(signal, hit, *args)
+            for field in ('placed', 'won', 'stake', 'pnl', 'capital', 'next_amount', 'has_next', 'step'):
+                assert np.array_equal(getattr(a, field), getattr(b, field)), (args, field)
+            assert a.max_single_bet == b.max_single_bet
+            assert abs(a.max_streak_cost - b.max_streak_cost) < 1e-6
+
+
+def test_extend_matches_full_simulation():
+    rng = np.random.default_rng(7)
+    signal = rng.random(600) < 0.4
+    hit = rng.random(600) < 1 / 6
+    cases = [
+        dict(mode=MODE_FIXED, base_bet=10, odds=5.5),
+        dict(mode=MODE_MARTINGALE, base_bet=10, multipliers=[1, 2, 4], odds=2.8),
+        dict(mode=MODE_LOSS_RECOVERY, base_bet=10, odds=5.5, target_profit=10, max_bet=300),
+    ]
+    for kwargs in cases:
+        full = simulate(signal, hit, **kwargs)
+        # 在不同位置切开 (包括持仓中途)，逐段追加
+        for cuts in ([1, 600], [300, 600], [2, 17, 18, 250, 599, 600]):
+            res = simulate(signal[:cuts[0]], hit[:cuts[0]], **kwargs)
+            for a, b in zip(cuts, cuts[1:]):
+                res = extend_simulation(res, signal[a:b], hit[a:b], **kwargs)
+            for field in ('placed', 'won', 'stake', 'pnl', 'capital', 'next_amount', 'has_next', 'step',
+                          'trade_count', 'win_count'):
+                assert np.array_equal(getattr(res, field), getattr(full, field)), (kwargs, cuts, field)
+            assert res.max_single_bet == full.max_single_bet
+            assert res.max_streak_cost == full.max_streak_cost
+            assert (res.final_active, res.final_level) == (full.final_active, full.final_level)
+
+
+def test_chunked_progress_matches_single_pass():
+    # 带进度回调时 JIT 内核分块推进，结果与一次推进相同
+    if not simulator.HAS_NUMBA:
+        return
+    rng = np.random.default_rng(8)
+    signal = rng.random(1000) < 0.4
+    hit = rng.random(1000) < 1 / 6
+    kwargs = dict(mode=MODE_MARTINGALE, base_bet=10, multipliers=[1, 2, 4, 8], odds=2.8)
+    full = simulate(signal, hit, **kwargs)
+    seen = []
+    chunk = simulator.PROGRESS_CHUNK
+    simulator.PROGRESS_CHUNK = 97
+    try:
+        res = simulate(signal, hit, progress=lambda done, n, r: seen.append((done, n, r.pnl[:done].sum())), **kwargs)
+    finally:
+        simulator.PROGRESS_CHUNK = chunk
+    assert [d for d, _, _ in seen] == list(range(98, 1000, 97)) + [1000]
+    assert all(abs(s - full.pnl[:d].sum()) < 1e-6 for d, _, s in seen)
+    for field in ('placed', 'won', 'stake', 'pnl', 'capital', 'next_amount', 'has_next', 'step'):
+        assert np.array_equal(getattr(res, field), getattr(full, field)), field
+    assert (res.max_single_bet, res.max_streak_cost) == (full.max_single_bet, full.max_streak_cost)
+    assert (res.final_active, res.final_level, res.final_streak_cost) == \
+        (full.final_active, full.final_level, full.final_streak_cost)
+
+
+def test_batch_matches_single_runs():
+    rng = np.random.default_rng(9)
+    n = 1500
+    money = [
+        dict(mode=MODE_FIXED, base_bet=10, odds=5.5),
+        dict(mode=MODE_MARTINGALE, base_bet=10, multipliers=[1, 2, 4], odds=2.8),
+        dict(mode=MODE_MARTINGALE, base_bet=5, multipliers=[1, 3, 9, 27], odds=1.95, max_bet=100),
+        dict(mode=MODE_LOSS_RECOVERY, base_bet=10, odds=5.5, target_profit=10, max_bet=300),
+        dict(mode=MODE_LOSS_RECOVERY, base_bet=2.5, odds=11.0, target_profit=2.5),
+        dict(mode=MODE_FIXED, base_bet=10, odds=2.0),  # 没有入场信号
+    ]
+    signals = rng.random((n, len(money))) < [0.4, 0.2, 0.6, 0.1, 0.05, 0.0]
+    signals[0, -1] = True  # 第 0 期的信号不参与入场判断
+    hits = rng.random((n, len(money))) < [1 / 6, 1 / 2, 1 / 3, 1 / 12, 1 / 49, 1 / 2]
+    totals = simulate_batch_totals(signals, hits, money)
+    for k, kwargs in enumerate(money):
+        single = simulate(signals[:, k], hits[:, k], **kwargs)
+        assert totals['final_capital'][k] == single.capital[-1], k
+        assert (totals['total_trades'][k], totals['wins'][k]) == (single.trade_count[-1], single.win_count[-1])
+        assert (totals['max_single_bet'][k], totals['max_streak_cost'][k]) == \
+            (single.max_single_bet, single.max_streak_cost)
+        assert (totals['final_active'][k], totals['final_level'][k]) == (single.final_active, single.final_level)
+        assert abs(totals['final_streak_cost'][k] - single.final_streak_cost) < 1e-9
+
+if __name__ == "__main__":
+    test_martingale_steps_and_stop_loss()
+    test_loss_recovery_respects_max_bet()
+    test_fixed_chases_until_hit()
+    test_episode_kernel_matches_period_loop()
+    test_extend_matches_full_simulation()
+    test_chunked_progress_matches_single_pass()
+    test_batch_matches_single_runs()
+    print("Verified!")
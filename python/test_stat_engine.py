@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from stat_engine import calc_cumulative_counts, calc_omission_matrices, calc_streaks, category_column, window_counts
+
+
+def test_window_counts_match_rolling_sum():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({"sp_color": rng.integers(0, 3, 500), "sp_tail": rng.integers(0, 10, 500)})
+    index, counts = calc_cumulative_counts(df)
+    assert counts.shape == (501, 13) and (counts[0] == 0).all()
+
+    for key, col, val in [("color_1", "sp_color", 1), ("tail_7", "sp_tail", 7)]:
+        cum = counts[:, index[key]]
+        for window in (1, 20, 100, 499, 800):
+            expected = (df[col] == val).astype(int).rolling(window, min_periods=1).sum().to_numpy()
+            assert np.array_equal(window_counts(cum, window), expected)
+            # 单期查询与整段向量一致
+            for i in (0, window - 1, 250, 499):
+                if i < 500:
+                    assert window_counts(cum, window, i) == expected[i]
+
+
+def test_streaks_and_omissions_match_loop():
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({"special": rng.integers(1, 50, 300), "sp_color": rng.integers(0, 3, 300),
+                       "sp_wuxing": rng.integers(0, 5, 300)})
+    index, hits = calc_streaks(df)
+    omissions = calc_omission_matrices(df)
+    assert hits.shape == (300, 57)
+    assert omissions["number"].shape == (300, 49) and omissions["number"].dtype == np.uint16
+
+    for dim, col, val in [("number", "special", 7), ("color", "sp_color", 2), ("wuxing", "sp_wuxing", 0)]:
+        om = omissions[dim][:, category_column(dim, val)]
+        run_hit = run_miss = 0
+        for i, x in enumerate(df[col]):
+            run_hit = run_hit + 1 if x == val else 0
+            run_miss = 0 if x == val else run_miss + 1
+            assert hits[i, index[f"{dim}_{val}"]] == run_hit
+            assert om[i] == run_miss
+
+    # 超出 uint16 范围时饱和
+    om = calc_omission_matrices(pd.DataFrame({"sp_size": np.zeros(70000, dtype=np.uint8)}))["size"]
+    assert om[-1, 1] == 65535 and om[-1, 0] == 0
+
+
+if __name__ == "__main__":
+    test_window_counts_match_rolling_sum()
+    test_streaks_and_omissions_match_loop()
+    print("Verified!")
@@ -0,0 +1,100 @@
+import logging
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from backtester import BacktestSystem
+from stats_cache import CACHE_DIR_NAME
+
+CONFIG = {
+    "entry": {
+        "conditions": [{"type": "omission", "dimension": "zodiac", "value": "龙", "operator": ">=", "threshold": 5}],
+        "logicOperator": "AND"
+    },
+    "money": {"mode": "martingale", "params": {"baseBet": 10, "multipliers": [1, 2, 4]}}
+}
+
+
+def write_history(path, n, seed):
+    # 与 Rust 导入器写出的年份文件列结构一致的合成数据
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "period": [f"{i + 1:03d}" for i in range(n)],
+        "date": pd.date_range("2024-01-02", periods=n, freq="2D").strftime("%Y-%m-%d"),
+        "year": ["2024"] * n,
+    })
+    for i in range(1, 7):
+        df[f"n{i}"] = rng.integers(1, 50, n).astype(np.int32)
+    df["special"] = rng.integers(1, 50, n).astype(np.int32)
+    df.to_feather(path)
+
+
+def test_cache_hit_matches_fresh_load_and_invalidates_on_rewrite():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        write_history(path, 150, seed=1)
+
+        fresh = BacktestSystem(path)
+        cached = BacktestSystem(path)
+        assert not fresh.cache_hit and cached.cache_hit
+        assert len(os.listdir(os.path.join(tmp, CACHE_DIR_NAME))) == 1
+
+        for dim, matrix in fresh.omissions.items():
+            assert np.array_equal(cached.omissions[dim], matrix)
+        assert np.array_equal(cached.count_matrix, fresh.count_matrix)
+        assert cached.run_backtest(CONFIG) == fresh.run_backtest(CONFIG)
+        period = fresh.periods[100]
+        assert cached.get_replay_state(period, CONFIG) == fresh.get_replay_state(period, CONFIG)
+
+        # 导入器重写年份文件后缓存自动失效，旧缓存目录被替换
+        write_history(path, 160, seed=2)
+        rewritten = BacktestSystem(path)
+        assert not rewritten.cache_hit and rewritten.n == 160
+        assert BacktestSystem(path).cache_hit
+        assert len(os.listdir(os.path.join(tmp, CACHE_DIR_NAME))) == 1
+
+
+def test_append_draws_matches_full_load():
+    # 先加载前 120 期并回测，再追加其余各期：统计值、缓存的回测结果和复盘都与直接加载全部数据一致
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        full_path = os.path.join(tmp, "full.feather")
+        part_path = os.path.join(tmp, "part.feather")
+        write_history(full_path, 200, seed=3)
+        raw = pd.read_feather(full_path)
+        raw.iloc[:120].reset_index(drop=True).to_feather(part_path)
+
+        full = BacktestSystem(full_path)
+        system = BacktestSystem(part_path)
+        assert BacktestSystem(part_path).cache_hit
+        streak = {"entry": {"conditions": [{"type": "streak", "streak": "hit", "dimension": "parity",
+                                            "value": "odd", "operator": ">=", "threshold": 2}]},
+                  "money": {"mode": "fixed", "params": {"baseBet": 10}}}
+        system.run_backtest(streak)
+        system.run_backtest(CONFIG)
+
+        # 与已加载的最后一期同日或更早的记录被忽略
+        out = system.append_draws(raw.iloc[110:170].to_dict("records"))
+        assert out == {"appended": 50, "count": 170, "extended": 2}
+        out = system.append_draws(raw.iloc[170:])
+        assert out == {"appended": 30, "count": 200, "extended": 2}
+
+        for dim, matrix in full.omissions.items():
+            assert np.array_equal(system.omissions[dim], matrix)
+        assert np.array_equal(system.count_matrix, full.count_matrix)
+        assert np.array_equal(system.streak_hits, full.streak_hits)
+        assert system.get_cache_stats()["hits"] == 0
+        for config in (streak, CONFIG):
+            assert system.run_backtest(config) == full.run_backtest(config)
+        assert system.get_cache_stats()["hits"] == 2
+        period = full.periods[180]
+        assert system.get_replay_state(period, CONFIG) == full.get_replay_state(period, CONFIG)
+
+
+if __name__ == "__main__":
+    test_cache_hit_matches_fresh_load_and_invalidates_on_rewrite()
+    test_append_draws_matches_full_load()
+    print("Verified!")
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from backtester import BacktestSystem
+from stat_engine import calc_omission_matrices
+from sweep import expand_grid, apply_params, run_sweep
+
+BASE = {
+    "entry": {
+        "conditions": [{"type": "omission", "dimension": "color", "value": "red", "operator": ">=", "threshold": 3}],
+        "logicOperator": "AND"
+    },
+    "money": {"mode": "martingale", "params": {"baseBet": 10, "multipliers": [1, 2, 4]}}
+}
+
+
+def make_system(n=3000, seed=7):
+    # 只含特码波色及其遗漏值的合成历史
+    rng = np.random.default_rng(seed)
+    colors = rng.integers(0, 3, n)
+    arrays = {"col:sp_color": colors, "om:color": calc_omission_matrices(pd.DataFrame({"sp_color": colors}))["color"]}
+    return BacktestSystem.from_arrays(arrays, {"n": n})
+
+
+def test_expand_grid_and_apply_params():
+    grid = expand_grid({
+        "conditions": [{"threshold": [2, 4], "value": ["red", "blue"]}],
+        "multipliers_length": [2, 5],
+    })
+    assert len(grid) == 8
+    assert grid[0] == {"conditions.0.threshold": 2, "conditions.0.value": "red", "multipliers_length": 2}
+
+    config = apply_params(BASE, grid[-1])
+    assert config["entry"]["conditions"][0]["threshold"] == 4
+    assert config["entry"]["conditions"][0]["value"] == "blue"
+    assert config["money"]["params"]["multipliers"] == [1, 2, 4, 8, 16]
+    # 基础策略不被修改
+    assert BASE["money"]["params"]["multipliers"] == [1, 2, 4]
+
+
+def test_sweep_ranks_points_and_matches_single_runs():
+    system = make_system()
+    ranges = {
+        "conditions": [{"threshold": [1, 3, 5, 8], "value": ["red", "green"]}],
+        "baseBet": [5, 10],
+        "multipliers_length": [2, 3, 4],
+    }
+    progress = []
+    result = run_sweep(system, BASE, ranges, workers=1, top=5, progress=lambda d, t, detail: progress.append((d, t, detail())))
+
+    assert result["total"] == 48 and result["errors"] == 0
+    assert progress[-1][:2] == (48, 48)
+    profits = [r["total_profit"] for r in result["rows"]]
+    assert len(profits) == 5 and profits == sorted(profits, reverse=True)
+
+    best = result["rows"][0]
+    assert progress[-1][2]["best"]["total_profit"] == best["total_profit"]
+    single = system.evaluate(apply_params(BASE, best["params"]))
+    assert single["total_profit"] == best["total_profit"]
+    assert single["total_trades"] == best["total_trades"]
+
+
+def test_process_pool_matches_inline():
+    system = make_system(n=1000)
+    ranges = {"conditions": [{"threshold": list(range(40))}], "baseBet": [5, 10, 20], "multipliers_length": [2, 3, 4]}
+    inline = run_sweep(system, BASE, ranges, workers=1, top=0)
+    pooled = run_sweep(system, BASE, ranges, workers=2, top=0)
+
+    assert pooled["workers"] == 2
+    assert [r["params"] for r in pooled["rows"]] == [r["params"] for r in inline["rows"]]
+    assert [r["final_capital"] for r in pooled["rows"]] == [r["final_capital"] for r in inline["rows"]]
+
+
+if __name__ == "__main__":
+    test_expand_grid_and_apply_params()
+    test_sweep_ranks_points_and_matches_single_runs()
+    test_process_pool_matches_inline()
+    print("Verified!")
@@ -0,0 +1,96 @@
+import logging
+import os
+import tempfile
+
+from backtester import BacktestSystem
+from simulator import ENTRY_LEAD, simulate
+from sweep import apply_params, expand_grid
+from test_stats_cache import write_history
+from walk_forward import fold_windows, run_walk_forward
+
+BASE = {
+    "entry": {
+        "conditions": [{"type": "omission", "dimension": "color", "value": "red", "operator": ">=", "threshold": 3}],
+        "logicOperator": "AND"
+    },
+    "money": {"mode": "martingale", "params": {"baseBet": 10, "multipliers": [1, 2, 4]}}
+}
+RANGES = {
+    "conditions": [{"threshold": [1, 3, 6], "value": ["red", "blue", "green"]}],
+    "multipliers_length": [2, 4],
+}
+
+
+def test_fold_windows():
+    assert fold_windows(100, 4) == [(0, 20, 40), (20, 40, 60), (40, 60, 80), (60, 80, 100)]
+    # 多余的期数留在最前面，最后一折的测试段总是结束于最后一期
+    assert fold_windows(103, 2, train_size=50, test_size=10) == [(33, 83, 93), (43, 93, 103)]
+    assert fold_windows(103, 2, train_size=50, test_size=10, anchored=True) == [(33, 83, 93), (33, 93, 103)]
+    assert fold_windows(100, 3, test_size=20) == [(0, 40, 60), (20, 60, 80), (40, 80, 100)]
+    try:
+        fold_windows(100, 5, train_size=60, test_size=10)
+        assert False
+    except ValueError:
+        pass
+
+
+def test_walk_forward_matches_slice_by_slice_search():
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        write_history(path, 600, seed=3)
+        system = BacktestSystem(path)
+
+    progress = []
+    report = run_walk_forward(system, BASE, RANGES, folds=4, train_size=200, test_size=100,
+                              progress=lambda d, t, detail: progress.append((d, t, detail())))
+    assert [p[:2] for p in progress] == [(1, 4), (2, 4), (3, 4), (4, 4)]
+    assert report["grid_size"] == 18 and len(report["folds"]) == 4
+
+    # 参照实现：逐折、逐个组合切片模拟
+    grid = expand_grid(RANGES)
+    capital = 10000.0
+    for fold, (train_start, train_end, test_end) in zip(report["folds"], fold_windows(600, 4, 200, 100)):
+        runs = []
+        for params in grid:
+            config = apply_params(BASE, params)
+            signal = system._entry_signal(config["entry"])
+            target, odds = system._target_and_odds(config)
+            hit = system._hit_vector(*target)
+            kwargs = dict(system._money_kwargs(config), odds=odds)
+            train = simulate(signal[train_start:train_end], hit[train_start:train_end], **kwargs)
+            runs.append((system._summary_metrics(train)["total_profit"], signal, hit, kwargs, params))
+        best = max(runs, key=lambda r: r[0])
+        assert fold["params"] == best[4]
+        assert fold["train_metrics"]["total_profit"] == best[0]
+        test = simulate(best[1][train_end - ENTRY_LEAD:test_end], best[2][train_end - ENTRY_LEAD:test_end],
+                        initial_capital=capital, **best[3])
+        assert fold["test_metrics"] == system._summary_metrics(test)
+        assert fold["test"]["start"] == str(system.periods[train_end])
+        capital = float(test.capital[-1])
+
+    assert report["out_of_sample"]["final_capital"] == round(capital, 2)
+    assert report["curve"][-1] == {"period": str(system.periods[-1]), "capital": round(capital, 2)}
+    assert report["curve"][0]["period"] == str(system.periods[200])
+
+
+def test_fold_can_bet_on_its_first_test_period():
+    # 入场条件恒成立、固定注额：每折测试段的每一期都下注，包括紧接训练段的第一期
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "2024.feather")
+        write_history(path, 300, seed=7)
+        system = BacktestSystem(path)
+    always = {"entry": {"conditions": [{"type": "omission", "dimension": "color", "value": "red",
+                                        "operator": ">=", "threshold": 0}]},
+              "money": {"mode": "fixed", "params": {"baseBet": 10}}}
+    report = run_walk_forward(system, always, {}, folds=3, train_size=100, test_size=50)
+    assert [f["test_metrics"]["total_trades"] for f in report["folds"]] == [50, 50, 50]
+    assert report["out_of_sample"]["total_trades"] == 150
+
+
+if __name__ == "__main__":
+    test_fold_windows()
+    test_walk_forward_matches_slice_by_slice_search()
+    test_fold_can_bet_on_its_first_test_period()
+    print("Verified!")
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+
+from wire import BLOB_MIN_ROWS, encode_bulk, read_blob
+
+
+def test_bulk_fields_round_trip_through_arrow():
+    n = BLOB_MIN_ROWS + 10
+    data = {
+        "count": n,
+        "periods": np.array([f"{i:03d}" for i in range(n)]),
+        "dates": np.arange(n).astype("datetime64[D]"),
+        "curve": [{"period": str(i), "capital": i * 1.5} for i in range(n)],
+        "trades": [{"period": "1", "is_hit": True, "profit": 1.0, "amount": 1.0}],
+        "nested": {"values": list(range(n))},
+    }
+    assert encode_bulk(data) is data  # 未协商时保持 JSON
+
+    out = encode_bulk(data, "arrow")
+    try:
+        assert out["count"] == n and out["trades"] is data["trades"]  # 小字段内联
+        assert out["periods"]["kind"] == "values" and out["periods"]["rows"] == n
+        assert read_blob(out["periods"]) == data["periods"].tolist()
+        assert read_blob(out["dates"]) == np.datetime_as_string(data["dates"], unit="D").tolist()
+        assert read_blob(out["curve"]) == data["curve"]
+        assert read_blob(out["nested"]["values"]) == data["nested"]["values"]
+    finally:
+        for handle in (out["periods"], out["dates"], out["curve"], out["nested"]["values"]):
+            os.remove(handle["path"])
+
+
+def test_integer_columns_are_not_int64():
+    # Arrow 的 int64 在 JS 中读出为 BigInt；整数列按取值范围缩窄为 int32，超出时为 float64
+    n = BLOB_MIN_ROWS + 10
+    data = {
+        "steps": np.arange(n, dtype=np.int64),
+        "trades": [{"step": i, "amount": 2**40 + i, "is_hit": i % 2 == 0} for i in range(n)],
+    }
+    out = encode_bulk(data, "arrow")
+    try:
+        with pa.memory_map(out["steps"]["path"]) as source:
+            assert pa.ipc.open_file(source).schema.field("value").type == pa.int32()
+        with pa.memory_map(out["trades"]["path"]) as source:
+            schema = pa.ipc.open_file(source).schema
+        assert schema.field("step").type == pa.int32() and schema.field("amount").type == pa.float64()
+        assert read_blob(out["steps"]) == list(range(n))
+        assert read_blob(out["trades"]) == data["trades"]
+    finally:
+        for handle in (out["steps"], out["trades"]):
+            os.remove(handle["path"])
+
+
+if __name__ == "__main__":
+    test_bulk_fields_round_trip_through_arrow()
+    test_integer_columns_are_not_int64()
+    print("Verified!")
@@ -0,0 +1,129 @@
+import time
+from concurrent.futures import CancelledError
+
+import numpy as np
+
+from simulator import ENTRY_LEAD, simulate, simulate_batch_totals
+from sweep import ASCENDING_METRICS, apply_params, expand_grid
+
+# 拼接后的样本外资金曲线最多返回的点数
+CURVE_POINTS = 500
+
+
+def fold_windows(n, folds, train_size=None, test_size=None, anchored=False):
+    """
+    把 n 期历史划分为 folds 折滚动的 (训练起点, 训练终点, 测试终点) 下标，均为半开区间，
+    第 k 折的测试段紧接在训练段之后，最后一折的测试段结束于最后一期。
+    - train_size / test_size: 训练 / 测试段的期数；都省略时把历史等分为 folds + 1 段，各取一段
+    - anchored: 训练段的起点固定在第一折的起点 (扩展窗口)，否则随测试段一起滚动
+    """
+    folds = int(folds)
+    if folds < 1:
+        raise ValueError("Walk-forward needs at least 1 fold")
+    if train_size is None and test_size is None:
+        test_size = train_size = n // (folds + 1)
+    elif test_size is None:
+        test_size = (n - int(train_size)) // folds
+    elif train_size is None:
+        train_size = n - folds * int(test_size)
+    train_size, test_size = int(train_size), int(test_size)
+    if train_size < 2 or test_size < 1 or train_size + folds * test_size > n:
+        raise ValueError(f"Cannot fit {folds} folds of {train_size} train + {test_size} test periods "
+                         f"into {n} periods")
+
+    first = n - train_size - folds * test_size
+    windows = []
+    for k in range(folds):
+        train_end = first + train_size + k * test_size
+        train_start = first if anchored else train_end - train_size
+        windows.append((train_start, train_end, train_end + test_size))
+    return windows
+
+
+def _pick_best(metrics, sort_by):
+    """按 sort_by 选出最好的组合下标 (并列时取网格中靠前的)，没有可用组合时返回 None。"""
+    valid = [m for m, row in enumerate(metrics) if row is not None]
+    if not valid:
+        return None
+    pick = min if sort_by in ASCENDING_METRICS else max
+    return pick(valid, key=lambda m: metrics[m].get(sort_by, 0))
+
+
+def run_walk_forward(system, base_config, ranges, folds=5, train_size=None, test_size=None, anchored=False,
+                     sort_by='total_profit', initial_capital=10000.0, progress=None, cancel=None):
+    """
+    滚动样本外评估：每一折在训练段上扫描参数网格 (与 run_sweep 相同的 ranges)，把按 sort_by 最好的组合
+    用到紧随其后的测试段，各测试段首尾相接 (资金从上一折的期末资金继续) 得到拼接的样本外资金曲线。
+
+    统计数组只依赖此前的开奖，因此直接切片已加载的数组即可，不按折重建 BacktestSystem：
+    所有组合的入场信号和命中向量在全部历史上只计算一次 (_batch_inputs)，每折的训练段用
+    simulate_batch_totals 一次推进所有组合，测试段只模拟选中的一个组合。
+    测试段的模拟从训练段最后 ENTRY_LEAD 期开始，训练段最后一期收盘后的信号即可在测试段第一期下注；
+    结束时仍未结算的注单不再跟进。
+    - progress(done, total, detail): 每完成一折调用一次，detail() 返回该折选中的参数
+    - cancel: threading.Event，被置位后在下一折开始前抛出 CancelledError
+    """
+    start_time = time.time()
+    grid = expand_grid(ranges)
+    configs = [apply_params(base_config, params) for params in grid]
+    windows = fold_windows(system.n, folds, train_size, test_size, anchored)
+    signals, hits, money, _, errors = system._batch_inputs(configs)
+    if len(errors) == len(configs):
+        raise ValueError(errors[0])
+    periods = system.periods
+
+    fold_rows, curve_periods, curve_capital = [], [], []
+    capital = float(initial_capital)
+    trades = wins = 0
+    max_single_bet = max_streak_cost = 0.0
+    for k, (train_start, train_end, test_end) in enumerate(windows):
+        if cancel is not None and cancel.is_set():
+            raise CancelledError()
+
+        rows = slice(train_start, train_end)
+        totals = simulate_batch_totals(signals[rows], hits[rows], money, initial_capital=initial_capital)
+        metrics = [None if m in errors else system._metrics(initial_capital, *(float(totals[name][m]) for name in (
+                       'final_capital', 'total_trades', 'wins', 'max_single_bet', 'max_streak_cost')))
+                   for m in range(len(configs))]
+        best = _pick_best(metrics, sort_by)
+
+        a = max(train_end - ENTRY_LEAD, 0)
+        rows = slice(a, test_end)
+        result = simulate(signals[rows, best], hits[rows, best], initial_capital=capital, **money[best])
+        test_metrics = system._summary_metrics(result)
+        capital = float(result.capital[-1])
+        trades += test_metrics["total_trades"]
+        wins += int(result.win_count[-1])
+        max_single_bet = max(max_single_bet, result.max_single_bet)
+        max_streak_cost = max(max_streak_cost, result.max_streak_cost)
+        curve_periods.append(periods[train_end:test_end])
+        curve_capital.append(result.capital[train_end - a:])
+
+        fold_rows.append({
+            "fold": k + 1,
+            "train": {"start": str(periods[train_start]), "end": str(periods[train_end - 1]),
+                      "periods": train_end - train_start},
+            "test": {"start": str(periods[train_end]), "end": str(periods[test_end - 1]),
+                     "periods": test_end - train_end},
+            "params": grid[best],
+            "train_metrics": metrics[best],
+            "test_metrics": test_metrics,
+        })
+        if progress:
+            progress(k + 1, len(windows), lambda: {"fold": k + 1, "params": grid[best]})
+
+    curve_periods = np.concatenate(curve_periods)
+    curve_capital = np.concatenate(curve_capital)
+    idx = np.unique(np.linspace(0, len(curve_capital) - 1, min(len(curve_capital), CURVE_POINTS)).astype(np.int64))
+    return {
+        "folds": fold_rows,
+        "grid_size": len(grid),
+        "errors": len(errors),
+        "sort_by": sort_by,
+        "anchored": bool(anchored),
+        "out_of_sample": system._metrics(float(initial_capital), capital, trades, wins,
+                                         max_single_bet, max_streak_cost),
+        "curve": [{"period": p, "capital": round(c, 2)}
+                  for p, c in zip(curve_periods[idx].tolist(), curve_capital[idx].tolist())],
+        "elapsed": round(time.time() - start_time, 3),
+    }
@@ -0,0 +1,135 @@
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# 响应中的大数组 (期号 / 日期列表、资金曲线、交易记录) 以 Arrow IPC 文件传递，stdout 上只发送句柄：
+#   {"$blob": "arrow", "path": "...", "rows": 4000, "kind": "values" | "records"}
+# values:  单列 "value" 的表，对应一维数组 / 标量列表
+# records: 每个字段一列，对应 [{...}, {...}] 形式的记录列表
+# 整数列写成 int32 / float64 而不是 int64 (JS 中读出为 BigInt)，见 _js_number
+# 前端在请求中带 "accept": "arrow" 时启用；否则 (以及小于 BLOB_MIN_ROWS 的字段) 仍然是普通 JSON。
+
+BLOB_FORMAT = 'arrow'
+# 元素数少于该值的字段直接内联在 JSON 中 (写临时文件的开销比序列化还大)
+BLOB_MIN_ROWS = 512
+# 句柄文件所在目录；前端读取后删除，残留文件在引擎启动时清理
+BLOB_DIR = os.path.join(tempfile.gettempdir(), 'mark-six-blobs')
+BLOB_MAX_AGE = 3600
+
+
+def _is_scalar(v):
+    return v is None or isinstance(v, (str, bool, int, float, np.generic))
+
+
+def _js_number(column):
+    """
+    64 位 (及无符号 32 位) 整数列在 JS 中读出为 BigInt，与 JSON 响应中的 number 不同：
+    取值都在 int32 范围内时转为 int32，否则转为 float64 (与 JSON.parse 的精度相同)。
+    """
+    t = column.type
+    if not pa.types.is_integer(t) or t.bit_width < 32 or t == pa.int32():
+        return column
+    lo, hi = pc.min_max(column).values()
+    if lo.as_py() is None or (lo.as_py() >= -2**31 and hi.as_py() < 2**31):
+        return column.cast(pa.int32())
+    return column.cast(pa.float64(), safe=False)
+
+
+def _to_table(value):
+    """大数组字段 -> (Arrow 表, kind)；不是可转换的数组时返回 None。"""
+    converted = _to_arrow(value)
+    if converted is None:
+        return None
+    table, kind = converted
+    return pa.table([_js_number(c) for c in table.columns], names=table.column_names), kind
+
+
+def _to_arrow(value):
+    if isinstance(value, np.ndarray):
+        if value.ndim != 1 or len(value) < BLOB_MIN_ROWS:
+            return None
+        if value.dtype.kind == 'M':
+            value = np.datetime_as_string(value, unit='D')
+        return pa.table({'value': pa.array(value)}), 'values'
+    if not isinstance(value, list) or len(value) < BLOB_MIN_ROWS:
+        return None
+    first = value[0]
+    if _is_scalar(first):
+        if not all(_is_scalar(v) for v in value):
+            return None
+        return pa.table({'value': pa.array(value)}), 'values'
+    if isinstance(first, dict) and all(_is_scalar(v) for v in first.values()):
+        # pa.Table.from_pylist 按第一条记录推断列；字段不一致或嵌套时保持 JSON
+        keys = list(first)
+        if not all(isinstance(r, dict) and list(r) == keys and all(_is_scalar(v) for v in r.values())
+                   for r in value):
+            return None
+        return pa.Table.from_pylist(value), 'records'
+    return None
+
+
+def write_blob(table, kind):
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    path = os.path.join(BLOB_DIR, f"{os.getpid()}-{uuid.uuid4().hex}.arrow")
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return {"$blob": BLOB_FORMAT, "path": path, "rows": table.num_rows, "kind": kind}
+
+
+def encode_bulk(data, accept=None):
+    """
+    把 data 中 (第一层或嵌套字典中的) 大数组字段替换为 Arrow 句柄，其余字段原样返回。
+    accept 不是 'arrow' 或写文件失败时原样返回，由 JSON 兜底。
+    """
+    if accept != BLOB_FORMAT or not isinstance(data, dict):
+        return data
+    out = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            out[key] = encode_bulk(value, accept)
+            continue
+        converted = _to_table(value)
+        out[key] = value if converted is None else write_blob(*converted)
+    return out
+
+
+def read_blob(handle):
+    """句柄 -> Python 值 (values 为列表，records 为字典列表)，用于测试和调试。"""
+    with pa.memory_map(handle["path"], 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    if handle["kind"] == 'values':
+        return table.column('value').to_pylist()
+    return table.to_pylist()
+
+
+def remove_stale_blobs(max_age=BLOB_MAX_AGE):
+    """删除前端没有取走的旧句柄文件 (例如请求超时后)。"""
+    try:
+        names = os.listdir(BLOB_DIR)
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - max_age
+    for name in names:
+        path = os.path.join(BLOB_DIR, name)
+        try:
+            if name.endswith('.arrow') and os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def blob_bytes(data):
+    """data 中 (第一层或嵌套字典中的) Arrow 句柄指向的文件的总字节数。"""
+    if not isinstance(data, dict):
+        return 0
+    if data.get("$blob") == BLOB_FORMAT:
+        try:
+            return os.path.getsize(data["path"])
+        except OSError:
+            return 0
+    return sum(blob_bytes(v) for v in data.values() if isinstance(v, dict))
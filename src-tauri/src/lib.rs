@@ -68,9 +68,16 @@ async fn load_data_source(
              }
         };
 
+        // 区间加载：只读取与日期 / 年份范围相交的年份文件 (见 python/dataset.py)
+        let mut params = serde_json::json!({ "file_path": final_path });
+        for key in ["start_date", "end_date", "start_year", "end_year"] {
+            if let Some(v) = payload.get(key) {
+                params[key] = v.clone();
+            }
+        }
         let cmd = serde_json::json!({
             "cmd": "load_data",
-            "params": { "file_path": final_path },
+            "params": params,
             "request_id": req_id
         });
         let cmd_str = cmd.to_string() + "\n";
@@ -96,7 +103,9 @@ async fn get_replay_state(
             "cmd": "get_replay_state",
             "params": { 
                 "period": period,
-                "strategy_config": strategy_config
+                "strategy_config": strategy_config,
+                "orders_limit": payload.get("orders_limit").cloned(),
+                "index": payload.get("index").cloned()
             },
             "request_id": req_id
         });
@@ -118,6 +127,57 @@ async fn get_data_stats(
         let req_id = payload.get("request_id").cloned();
         let cmd = serde_json::json!({
             "cmd": "get_data_stats",
+            "params": { "include_periods": payload.get("include_periods").cloned() },
+            "request_id": req_id,
+            "accept": payload.get("accept").cloned()
+        });
+        let cmd_str = cmd.to_string() + "\n";
+        child.write(cmd_str.as_bytes()).map_err(|e| e.to_string())?;
+        Ok(serde_json::json!({ "status": "sent" }))
+    } else {
+        Err("Python 引擎未就绪".into())
+    }
+}
+
+/// 参数扫描: { strategy_config, ranges, workers, sort_by, top }
+#[tauri::command]
+async fn run_sweep(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "run_sweep", payload).await
+}
+
+/// 蒙特卡洛模拟: { strategy_config, model, periods, initial_capital, paths, seed, workers }
+#[tauri::command]
+async fn run_monte_carlo(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "run_monte_carlo", payload).await
+}
+
+/// 追加新开奖记录 (增量更新统计): { draws }
+#[tauri::command]
+async fn append_draws(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "append_draws", payload).await
+}
+
+/// 把前端 payload 原样作为 params 转发给 Python 的通用命令
+async fn forward_command(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    cmd_name: &str,
+    payload: Value,
+) -> Result<Value, String> {
+    let mut state = state.lock().await;
+    if let Some(child) = state.child.as_mut() {
+        let req_id = payload.get("request_id").cloned();
+        let cmd = serde_json::json!({
+            "cmd": cmd_name,
+            "params": payload,
             "request_id": req_id
         });
         let cmd_str = cmd.to_string() + "\n";
@@ -128,6 +188,106 @@ async fn get_data_stats(
     }
 }
 
+/// 一次回测多个策略: { configs: [...], metrics_only }
+#[tauri::command]
+async fn run_backtest_batch(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "run_backtest_batch", payload).await
+}
+
+/// 滚动样本外评估: { strategy_config, ranges, folds, train_size, test_size, anchored, sort_by }
+#[tauri::command]
+async fn run_walk_forward(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "run_walk_forward", payload).await
+}
+
+/// 从 period (或下标 start_index) 开始连续 count 期的回放状态 (自动播放预取): { period, start_index, count, strategy_config, orders_limit }
+#[tauri::command]
+async fn get_replay_states(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "get_replay_states", payload).await
+}
+
+/// 分页查询期号 / 日期: { start_date, end_date, offset, limit }
+#[tauri::command]
+async fn query_periods(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "query_periods", payload).await
+}
+
+/// 完整交易记录的第 [start, end) 笔: { strategy_config, start, end }
+#[tauri::command]
+async fn query_trades(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "query_trades", payload).await
+}
+
+/// 指定日期范围和点数的资金曲线: { strategy_config, start_date, end_date, points }
+#[tauri::command]
+async fn query_equity_curve(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "query_equity_curve", payload).await
+}
+
+/// 最近请求的各阶段耗时和响应大小 (性能诊断): { cmd, limit, reset }
+#[tauri::command]
+async fn get_metrics(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    forward_command(state, "get_metrics", payload).await
+}
+
+#[tauri::command]
+async fn cancel_request(
+    state: tauri::State<'_, Arc<Mutex<PythonState>>>,
+    payload: Value,
+) -> Result<Value, String> {
+    // payload: { "target": 要取消的 request_id, "request_id": 本条命令的 id }
+    let mut state = state.lock().await;
+    if let Some(child) = state.child.as_mut() {
+        let req_id = payload.get("request_id").cloned();
+        let target = payload.get("target").cloned();
+        let cmd = serde_json::json!({
+            "cmd": "cancel",
+            "params": { "request_id": target },
+            "request_id": req_id
+        });
+        let cmd_str = cmd.to_string() + "\n";
+        child.write(cmd_str.as_bytes()).map_err(|e| e.to_string())?;
+        Ok(serde_json::json!({ "status": "sent" }))
+    } else {
+        Err("Python 引擎未就绪".into())
+    }
+}
+
+/// 读取 Python 引擎写出的 Arrow IPC 句柄文件 (见 python/wire.py)，以二进制返回给前端后删除
+#[tauri::command]
+async fn read_blob(path: String) -> Result<tauri::ipc::Response, String> {
+    // 只允许读取系统临时目录下 mark-six-blobs 中的文件
+    let blob_dir = std::env::temp_dir().join("mark-six-blobs").canonicalize().map_err(|e| e.to_string())?;
+    let file = PathBuf::from(&path).canonicalize().map_err(|e| e.to_string())?;
+    if !file.starts_with(&blob_dir) {
+        return Err("非法的数据句柄路径".into());
+    }
+    let bytes = std::fs::read(&file).map_err(|e| e.to_string())?;
+    let _ = std::fs::remove_file(&file);
+    Ok(tauri::ipc::Response::new(bytes))
+}
+
 #[cfg_attr(mobile, tauri::mobile_entry_point)]
 pub fn run() {
     let python_state = Arc::new(Mutex::new(PythonState { child: None }));
@@ -246,7 +406,19 @@ pub fn run() {
             run_backtest_simulation,
             load_data_source,
             get_replay_state,
+            get_replay_states,
             get_data_stats,
+            run_backtest_batch,
+            run_sweep,
+            run_walk_forward,
+            run_monte_carlo,
+            append_draws,
+            cancel_request,
+            read_blob,
+            query_periods,
+            query_trades,
+            query_equity_curve,
+            get_metrics,
             data_manager::fetch_historical_data
         ])
         .run(tauri::generate_context!())
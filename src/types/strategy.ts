@@ -12,6 +12,7 @@ export interface Condition {
     operator: Operator;
     threshold: number;
     window?: number; // Only for window_stat
+    streak?: 'hit' | 'miss'; // Only for streak, defaults to 'hit'
 }
 
 export interface EntryRuleConfig {
@@ -1,15 +1,50 @@
 import { invoke } from '@tauri-apps/api/core';
 import { listen } from '@tauri-apps/api/event';
+import { tableFromIPC } from 'apache-arrow';
 
 export interface PythonResponse {
-    status: 'ok' | 'error' | 'warn';
+    status: 'ok' | 'error' | 'warn' | 'progress';
     data?: any;
     message?: string;
     request_id?: string;
 }
 
+// Python 端把大数组写成 Arrow IPC 文件，响应中只带句柄 (见 python/wire.py)
+interface BlobHandle {
+    $blob: 'arrow';
+    path: string;
+    rows: number;
+    kind: 'values' | 'records';
+}
+
+async function readBlob(handle: BlobHandle): Promise<any[]> {
+    const buf = await invoke<ArrayBuffer>('read_blob', { path: handle.path });
+    const table = tableFromIPC(new Uint8Array(buf));
+    if (handle.kind === 'values') {
+        return Array.from(table.getChild('value')!.toArray());
+    }
+    return table.toArray().map(row => row.toJSON());
+}
+
+// 把响应中的句柄替换为实际数组，调用方拿到的结构与 JSON 响应一致
+async function decodeBlobs(data: any): Promise<any> {
+    if (!data || typeof data !== 'object' || Array.isArray(data)) return data;
+    if (data.$blob === 'arrow') return readBlob(data as BlobHandle);
+    for (const key of Object.keys(data)) {
+        data[key] = await decodeBlobs(data[key]);
+    }
+    return data;
+}
+
 // 简单的请求追踪器
-const pendingRequests = new Map<string, { resolve: (val: any) => void; reject: (reason: any) => void; timer: any }>();
+interface PendingRequest {
+    resolve: (val: any) => void;
+    reject: (reason: any) => void;
+    timer: any;
+    onProgress?: (data: any) => void;
+    restartTimer: () => any;
+}
+const pendingRequests = new Map<string, PendingRequest>();
 
 // 初始化监听器
 let isInitialized = false;
@@ -26,11 +61,21 @@ export async function initPythonListener() {
 
                 try {
                     const resp = JSON.parse(trimmed) as PythonResponse;
+                    if (resp.status === 'progress' && resp.request_id && pendingRequests.has(resp.request_id)) {
+                        // 进度消息：重新计时 (仍在运行的任务不算超时)，最终响应稍后到达
+                        const pending = pendingRequests.get(resp.request_id)!;
+                        clearTimeout(pending.timer);
+                        pending.timer = pending.restartTimer();
+                        pending.onProgress?.(resp.data);
+                        continue;
+                    }
                     if (resp.request_id && pendingRequests.has(resp.request_id)) {
-                        const { resolve, timer } = pendingRequests.get(resp.request_id)!;
+                        const { resolve, reject, timer } = pendingRequests.get(resp.request_id)!;
                         clearTimeout(timer);
                         pendingRequests.delete(resp.request_id);
-                        resolve(resp);
+                        decodeBlobs(resp.data)
+                            .then(data => resolve({ ...resp, data }))
+                            .catch(reject);
                     }
                 } catch (jsonErr) {
                     console.warn('忽略非 JSON 输出:', trimmed);
@@ -48,30 +93,54 @@ function generateId() {
     return Math.random().toString(36).substr(2, 9);
 }
 
+/**
+ * 通知 Python 端停止一个进行中的请求 (参数扫描 / 蒙特卡洛会在块之间停止)
+ */
+function cancelRequest(target: string) {
+    invoke('cancel_request', { payload: { target, request_id: generateId() } })
+        .catch(e => console.warn('取消请求失败:', e));
+}
+
 /**
  * 调用 Python 指令并等待其Stdout返回对应的 JSON 结果
+ * Python 端并发执行命令，响应按 request_id 匹配，与发送顺序无关。
+ * signal 被中止或请求超时时，同时通知 Python 端取消该请求。
+ * onProgress 接收长任务 (回测 / 扫描 / 蒙特卡洛) 的进度消息 { percent, done, total, ... }；
+ * 每条进度消息都会重新开始超时计时。
  */
-export async function callPython(cmd: string, params: any = {}): Promise<PythonResponse> {
+export async function callPython(cmd: string, params: any = {}, timeoutMs: number = 15000, signal?: AbortSignal,
+                                 onProgress?: (data: any) => void): Promise<PythonResponse> {
     await initPythonListener();
 
     const requestId = generateId();
 
     return new Promise((resolve, reject) => {
-        const timer = setTimeout(() => {
+        const abort = (reason: Error) => {
             if (pendingRequests.has(requestId)) {
+                clearTimeout(pendingRequests.get(requestId)!.timer);
                 pendingRequests.delete(requestId);
-                reject(new Error(`指令 ${cmd} 请求超时 (15s)`));
+                cancelRequest(requestId);
+                reject(reason);
             }
-        }, 15000);
+        };
+        if (signal?.aborted) {
+            reject(new Error(`指令 ${cmd} 已取消`));
+            return;
+        }
+        signal?.addEventListener('abort', () => abort(new Error(`指令 ${cmd} 已取消`)), { once: true });
+
+        const restartTimer = () => setTimeout(() => abort(new Error(`指令 ${cmd} 请求超时 (${timeoutMs / 1000}s)`)), timeoutMs);
+        const timer = restartTimer();
 
-        pendingRequests.set(requestId, { resolve, reject, timer });
+        pendingRequests.set(requestId, { resolve, reject, timer, onProgress, restartTimer });
 
         // 统一使用 payload 包装器，以匹配 Rust 端的 Value 类型接收
         let invokeCmd = cmd;
         if (cmd === 'load_data') invokeCmd = 'load_data_source';
         else if (cmd === 'run_backtest') invokeCmd = 'run_backtest_simulation';
 
-        const payload = { ...params, request_id: requestId };
+        // accept: 允许 Python 端以 Arrow 句柄返回大数组
+        const payload = { ...params, request_id: requestId, accept: 'arrow' };
 
         invoke(invokeCmd, { payload })
             .catch(e => {